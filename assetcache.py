@@ -0,0 +1,81 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# assetcache.py module
+# Description:
+#   A disk cache for decoded assets.  Entries are keyed by a hash of
+#   the source file's contents plus the parameters used to decode it,
+#   and are stored as plain .npy files in a hidden directory next to
+#   the asset.  Loading an entry memory-maps the arrays, so a cache
+#   hit costs no decoding and almost no copying.
+# ==============================
+import hashlib
+import json
+import os
+import numpy as np
+
+# Bump this whenever the meaning of a cached entry changes
+CACHE_VERSION = 1
+
+
+class AssetCache:
+    """Decoded arrays cached on disk next to the files they came from"""
+
+    def __init__(self, dirName, enabled=True):
+        """A constructor for AssetCache class.
+           dirName is the cache directory created beside each asset.
+        """
+        self.dirName = dirName
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        """Basic string representation of this AssetCache"""
+        return "AssetCache %s (%d hits, %d misses)" % (self.dirName, self.hits, self.misses)
+
+    def directory(self, path):
+        return os.path.join(os.path.dirname(os.path.abspath(path)), self.dirName)
+
+    def key(self, path, *params):
+        """The cache key for path decoded with the given parameters"""
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(repr((CACHE_VERSION,) + params).encode())
+        return "%s-%s" % (os.path.basename(path), digest.hexdigest())
+
+    def load(self, path, key):
+        """The memory-mapped arrays stored under key, or None on a miss"""
+        if not self.enabled:
+            return None
+        base = os.path.join(self.directory(path), key)
+        try:
+            with open(base + ".json") as f:
+                manifest = json.load(f)
+            arrays = [np.load("%s.%d.npy" % (base, i), mmap_mode="r")
+                      for i in range(manifest["count"])]
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return arrays
+
+    def store(self, path, key, arrays, **info):
+        """Save arrays under key.  Failures (read-only directory...) are ignored."""
+        if not self.enabled:
+            return
+        directory = self.directory(path)
+        base = os.path.join(directory, key)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            for i, array in enumerate(arrays):
+                np.save("%s.%d.npy" % (base, i), np.ascontiguousarray(array))
+            # The manifest is written last so a half-written entry is never loaded
+            manifest = dict(info, count=len(arrays))
+            with open(base + ".json.tmp", "w") as f:
+                json.dump(manifest, f)
+            os.replace(base + ".json.tmp", base + ".json")
+        except OSError:
+            pass
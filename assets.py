@@ -0,0 +1,87 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# assets.py module
+# Description:
+#   Loads image textures in the background.  Image files are decoded
+#   (or read from the texture cache) concurrently on a thread pool,
+#   which can start before the GL context exists.  Each texture gets
+#   a GL name right away holding a small placeholder; poll(), called
+#   on the GL thread, uploads the real pixels into that same name as
+#   each decode finishes.  Anything that already refers to the name
+#   (including recorded display lists) picks up the real image
+#   without changes.
+# ==============================
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from OpenGL.GL import *
+import textures
+
+# Shown until an image has finished decoding: a single mid-grey texel
+PLACEHOLDER = np.full((1, 1, 3), 128, dtype=np.uint8)
+
+
+class AssetLoader:
+    """Decodes textures on worker threads and uploads them on the GL thread"""
+
+    def __init__(self, workers=None):
+        """A constructor for AssetLoader class.
+           workers is the thread pool size (None lets Python choose).
+        """
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets")
+        self.requests = {}   # (filename, decode options) -> Future
+        self.pending = []    # [texture name, Future, upload options] awaiting upload
+
+    def __str__(self):
+        """Basic string representation of this AssetLoader"""
+        return "AssetLoader (%d requested, %d waiting to upload)" % (len(self.requests), len(self.pending))
+
+    def request(self, filename, mode="RGB", powerOfTwo=False, maxSize=None, mipmaps=textures.MIP_BOX):
+        """Start decoding an image in the background (no GL context needed)"""
+        key = (filename, mode, powerOfTwo, maxSize, mipmaps)
+        if key not in self.requests:
+            self.requests[key] = self.pool.submit(textures.decodeImage, filename, mode,
+                                                  powerOfTwo, maxSize, mipmaps)
+        return self.requests[key]
+
+    def loadTexture(self, filename, wrap=GL_REPEAT, anisotropy=textures.DEFAULT_ANISOTROPY, **decodeOptions):
+        """A texture name for the image, showing a placeholder until it is ready.
+           decodeOptions are the same keywords as request().
+        """
+        future = self.request(filename, **decodeOptions)
+        textureName = textures.uploadTexture([PLACEHOLDER], wrap, label=filename)
+        gpuMipmaps = decodeOptions.get("mipmaps", textures.MIP_BOX) == textures.MIP_GPU
+        self.pending.append([textureName, future, (filename, wrap, anisotropy, gpuMipmaps)])
+        return textureName
+
+    def busy(self):
+        """True while some textures are still showing their placeholder"""
+        return len(self.pending) > 0
+
+    def poll(self):
+        """Upload every texture whose decode has finished.  Must run on the GL thread.
+           Returns how many textures were replaced.
+        """
+        uploaded = 0
+        for item in list(self.pending):
+            textureName, future, (filename, wrap, anisotropy, gpuMipmaps) = item
+            if not future.done():
+                continue
+            self.pending.remove(item)
+            try:
+                levels = future.result()
+            except Exception as e:
+                print("Could not load texture {0}: {1}".format(filename, e))
+                continue
+            textures.uploadTexture(levels, wrap, textureName, gpuMipmaps, anisotropy, label=filename)
+            uploaded += 1
+        return uploaded
+
+    def wait(self):
+        """Block until every requested texture is decoded and uploaded"""
+        for _, future, _ in self.pending:
+            future.exception()
+        return self.poll()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
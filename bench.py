@@ -0,0 +1,358 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# bench.py module
+# Description:
+#   A reproducible rendering benchmark for the light.py scene.  Each
+#   case is a scenario (the scene as is, or a stress variant with N
+#   extra cubes, balls or lights) rendered for a fixed number of
+#   frames while the Camera follows one of the scripted paths in
+#   PATHS; nothing else animates, so every run draws the same frames.
+#
+#   Every case runs in a fresh Python process (so peak memory and
+#   caches from one case do not leak into the next) and reports fps,
+#   frame time percentiles, GL state calls, light uploads and sphere
+#   triangles (see lod.py) per frame (and, with --trace, every GL call; see gltrace.py) and peak
+#   resident memory.  Results can be saved as a baseline JSON
+#   file and later runs compared against it: anything more than the
+#   threshold slower (or any increase in GL calls) is a regression and
+#   makes the run exit with status 1.  A baseline taken with other
+#   settings (frames, size, windowed, per-pixel lighting or tracing) is
+#   refused, with status 2, before anything runs.
+#
+#   Run it from this folder (the scene loads its files from here), e.g.:
+#     python bench.py --save baseline.json
+#     python bench.py --baseline baseline.json --threshold 0.15
+#     python bench.py --cases cubes:2000 lights:8 --paths orbit --frames 500
+#     python bench.py --windowed
+# ==============================
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from utils import translate, scale
+
+DEFAULT_CASES = ["scene", "cubes:1000", "lights:16"]
+DEFAULT_PATHS = ["orbit", "walk"]
+DEFAULT_THRESHOLD = 0.10
+
+# Metrics where bigger is worse, compared with the threshold
+TIMING_METRICS = ["mean_ms", "p95_ms", "p99_ms", "peak_rss_mb"]
+# Deterministic counts: any increase is a regression
+COUNT_METRICS = ["gl_state_calls", "light_uploads", "gl_calls", "sphere_triangles"]
+
+
+# Camera paths: t in [0, 1) -> (eye x, y, z, lookAngle).  The room is
+# 30x30 and centered on the origin; the desk sits in the middle.
+
+def orbitPath(t):
+    """Circle the room at radius 12, always facing the desk"""
+    angle = 360.0 * t
+    rad = math.radians(angle)
+    return 12 * math.sin(rad), 3.0, 12 * math.cos(rad), angle
+
+def walkPath(t):
+    """Walk from one end of the room to the other beside the desk"""
+    return 3.0, 2.0, 14.0 - 26.0 * t, 0.0
+
+def turnPath(t):
+    """Stand in front of the desk and turn all the way around"""
+    return 0.0, 2.0, 8.0, 360.0 * t
+
+def staticPath(t):
+    """The scene's initial view"""
+    return 0.0, 2.0, 15.0, 0.0
+
+PATHS = {"orbit": orbitPath, "walk": walkPath, "turn": turnPath, "static": staticPath}
+
+
+def stressCubes(count):
+    """Transforms for count half-size cubes in a grid over the floor"""
+    side = max(1, math.ceil(math.sqrt(count)))
+    coords = np.linspace(-13, 13, side)
+    return [translate(coords[i % side], 0.25, coords[i // side]) @ scale(0.5, 0.5, 0.5)
+            for i in range(count)]
+
+def stressBalls(count):
+    """Positions for count balls in a grid over the floor, most of them far from
+       the camera paths (for level of detail)
+    """
+    side = max(1, math.ceil(math.sqrt(count)))
+    coords = np.linspace(-14, 14, side)
+    return [(coords[i % side], 1.0, coords[i // side]) for i in range(count)]
+
+def stressLights(count):
+    """count colored point lights in a ring above the room"""
+    from lights import Light
+    result = []
+    for i in range(count):
+        rad = 2 * math.pi * i / max(count, 1)
+        color = (0.5 + 0.5 * math.cos(rad), 0.5 + 0.5 * math.cos(rad + 2.1), 0.5 + 0.5 * math.cos(rad + 4.2), 1)
+        result.append(Light("stress%d" % i, position=(10 * math.cos(rad), 6.0, 10 * math.sin(rad), 1.0),
+                            diffuse=color, specular=color, attenuation=(1.0, 0.1, 0.0)))
+    return result
+
+def applyScenario(light, scenario):
+    """Turn light.py's scene into one of the scenarios: scene, cubes:N, balls:N or lights:N"""
+    kind, _, count = scenario.partition(":")
+    count = int(count or 0)
+    if kind == "cubes":
+        light.furniture.extend(stressCubes(count))
+    elif kind == "balls":
+        from scenegraph import Node
+        for i, position in enumerate(stressBalls(count)):
+            node = Node("stress%d" % i, translate(*position), bounds=light.tanBallNode.bounds,
+                        shape=light.tanBallNode.shape)
+            node.drawable = lambda shader=None, node=node: light.draw_ball("copper", node)
+            light.worldNode.add(node)
+    elif kind == "lights":
+        for stress in stressLights(count):
+            light.lights.add(stress)
+    elif kind != "scene":
+        raise ValueError("Unknown benchmark scenario: {0}".format(scenario))
+
+
+def peakRSS():
+    """Peak resident memory of this process in MB (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def measure(light, drawFrame, path, frames, warmup):
+    """Render warmup + frames frames along path; the metrics of the last frames.
+       Each frame is timed until the GL has finished it (glFinish).
+    """
+    from OpenGL.GL import glFinish, glGetString, GL_RENDERER
+    from glstate import state
+    from gltrace import tracer
+    times = np.empty(frames)
+    stateCalls = elided = uploads = glCalls = drawn = culled = triangles = 0
+    camera = light.camera
+    for frame in range(-warmup, frames):
+        x, y, z, angle = path((frame % frames) / frames)
+        camera.eye.set(x, y, z)
+        camera.lookAngle = angle
+        start = time.perf_counter()
+        drawFrame()
+        glFinish()
+        elapsed = time.perf_counter() - start
+        if frame >= 0:
+            times[frame] = elapsed * 1000.0
+            stateCalls += state.lastFrame[0]
+            elided += state.lastFrame[1]
+            uploads += light.lights.lastFrameUploads
+            glCalls += sum(entry[0] for entry in tracer.lastFrame.values())
+            drawn += light.sceneGraph.drawn
+            culled += light.sceneGraph.culled
+            triangles += light.ballLOD.triangles() + sum(lod.triangles() for lod in light.marker_lods.values())
+    p50, p95, p99 = np.percentile(times, (50, 95, 99))
+    return {
+        "frames": frames,
+        "fps": frames / (times.sum() / 1000.0),
+        "mean_ms": float(times.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(times.max()),
+        "gl_state_calls": stateCalls / frames,
+        "gl_state_elided": elided / frames,
+        "light_uploads": uploads / frames,
+        "gl_calls": glCalls / frames if tracer.installed else None,
+        "nodes_drawn": drawn / frames,
+        "nodes_culled": culled / frames,
+        "sphere_triangles": triangles / frames,
+        "dropped_lights": light.lights.dropped,
+        "peak_rss_mb": peakRSS(),
+        "renderer": glGetString(GL_RENDERER).decode(),
+    }
+
+
+def runHeadless(scenario, path, args, settings):
+    import headless
+    renderer = headless.HeadlessRenderer(args.width, args.height, **settings)
+    applyScenario(renderer.light, scenario)
+    result = measure(renderer.light, renderer.light.render_frame, path, args.frames, args.warmup)
+    renderer.release()
+    return result
+
+def runWindowed(scenario, path, args, settings):
+    from OpenGL.GLUT import (glutInit, glutInitDisplayMode, glutInitWindowSize, glutCreateWindow,
+                             glutDisplayFunc, glutMainLoop, glutLeaveMainLoop, glutSwapBuffers, glutSetOption,
+                             GLUT_DOUBLE, GLUT_RGB, GLUT_DEPTH, GLUT_ACTION_ON_WINDOW_CLOSE,
+                             GLUT_ACTION_CONTINUE_EXECUTION)
+    import light
+    for filename in light.IMAGE_FILES:
+        light.assetLoader.request(filename, **light.IMAGE_OPTIONS)
+    glutInit(sys.argv)
+    glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH)
+    glutInitWindowSize(args.width, args.height)
+    glutCreateWindow(b"bench")
+    # Return from glutMainLoop instead of exiting the process
+    glutSetOption(GLUT_ACTION_ON_WINDOW_CLOSE, GLUT_ACTION_CONTINUE_EXECUTION)
+    light.win_width, light.win_height = args.width, args.height
+    light.camera.aspRatio = args.width / args.height
+    light.init()
+    light.assetLoader.wait()
+    for name, value in settings.items():
+        setattr(light, name, value)
+    applyScenario(light, scenario)
+    result = {}
+
+    def drawFrame():
+        light.render_frame()
+        glutSwapBuffers()
+
+    def display():
+        # The whole run happens in the first redraw; vsync may cap the frame rate
+        if not result:
+            result.update(measure(light, drawFrame, path, args.frames, args.warmup))
+        glutLeaveMainLoop()
+
+    glutDisplayFunc(display)
+    glutMainLoop()
+    light.assetLoader.shutdown()
+    return result
+
+
+def caseName(scenario, path):
+    return "%s/%s" % (scenario, path)
+
+def runCase(scenario, pathName, args):
+    """Run one case in a child process and return its metrics"""
+    with tempfile.TemporaryDirectory() as folder:
+        resultFile = os.path.join(folder, "result.json")
+        command = [sys.executable, os.path.abspath(__file__), "--run", scenario, pathName,
+                   "--result", resultFile, "--frames", str(args.frames), "--warmup", str(args.warmup),
+                   "--size", "%dx%d" % (args.width, args.height)]
+        if args.windowed:
+            command.append("--windowed")
+        if args.pixel_lighting:
+            command.append("--pixel-lighting")
+        environment = dict(os.environ)
+        if args.trace:
+            # Timings include the tracer's overhead
+            environment["GLTRACE"] = "1"
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, env=environment)
+        with open(resultFile) as f:
+            return json.load(f)
+
+
+def compare(results, baseline, threshold):
+    """Regressions of results against baseline, as readable lines"""
+    regressions = []
+    for name, metrics in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for metric in TIMING_METRICS:
+            if metrics.get(metric) is None or old.get(metric) is None:
+                continue
+            if metrics[metric] > old[metric] * (1 + threshold):
+                regressions.append("%s: %s %.3f -> %.3f (+%.0f%%)" % (
+                    name, metric, old[metric], metrics[metric], 100 * (metrics[metric] / old[metric] - 1)))
+        for metric in COUNT_METRICS:
+            if metrics.get(metric) is None or old.get(metric) is None:
+                continue
+            if metrics[metric] > old[metric]:
+                regressions.append("%s: %s %g -> %g" % (name, metric, old[metric], metrics[metric]))
+    return regressions
+
+def settingsDiffer(args, baseline):
+    """The run settings (frame count, size...) that differ from the baseline's,
+       as readable lines: timings taken under other settings do not compare
+    """
+    current = {"frames": args.frames, "size": "%dx%d" % (args.width, args.height), "windowed": args.windowed,
+               "pixel_lighting": args.pixel_lighting, "trace": args.trace}
+    return ["%s: %s in the baseline, %s now" % (name, baseline.get(name), value)
+            for name, value in current.items()
+            if str(baseline.get(name)).lower() != str(value).lower()]
+
+def report(results):
+    """A table of the main metrics, one line per case"""
+    lines = ["%-24s %8s %8s %8s %8s %8s %8s %8s %8s" % (
+        "case", "fps", "mean", "p50", "p95", "p99", "state", "glcalls", "rss MB")]
+    for name, m in results.items():
+        glCalls = "-" if m.get("gl_calls") is None else "%.1f" % m["gl_calls"]
+        lines.append("%-24s %8.1f %8.3f %8.3f %8.3f %8.3f %8.1f %8s %8.1f" % (
+            name, m["fps"], m["mean_ms"], m["p50_ms"], m["p95_ms"], m["p99_ms"],
+            m["gl_state_calls"], glCalls, m["peak_rss_mb"] or 0))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the light.py scene along scripted camera paths.")
+    parser.add_argument("--cases", nargs="+", default=DEFAULT_CASES, metavar="SCENARIO",
+                        help="scene, cubes:N (N extra cubes), balls:N (N extra balls) or lights:N (N extra lights)")
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS, choices=sorted(PATHS),
+                        help="camera paths to run every scenario along")
+    parser.add_argument("--frames", type=int, default=300, help="measured frames per case")
+    parser.add_argument("--warmup", type=int, default=30, help="unmeasured frames first")
+    parser.add_argument("--size", default="800x800", help="WIDTHxHEIGHT (default 800x800)")
+    parser.add_argument("--windowed", action="store_true", help="render in a GLUT window instead of offscreen")
+    parser.add_argument("--pixel-lighting", action="store_true", help="use the per-pixel lighting shader")
+    parser.add_argument("--trace", action="store_true",
+                        help="count every GL call (slower; see gltrace.py)")
+    parser.add_argument("--save", metavar="FILE", help="write the results as a baseline JSON file")
+    parser.add_argument("--baseline", metavar="FILE", help="compare the results against this baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown before a regression (default 0.10 = 10%%)")
+    # Used by the child processes running one case each
+    parser.add_argument("--run", nargs=2, metavar=("SCENARIO", "PATH"), help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    args.width, args.height = (int(n) for n in args.size.lower().split("x"))
+
+    if args.run:
+        scenario, pathName = args.run
+        settings = {"pixel_lighting": True} if args.pixel_lighting else {}
+        run = runWindowed if args.windowed else runHeadless
+        result = run(scenario, PATHS[pathName], args, settings)
+        with open(args.result, "w") as f:
+            json.dump(result, f)
+        return 0
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        differences = settingsDiffer(args, baseline)
+        if differences:
+            print("Cannot compare against %s, it was run with other settings:" % args.baseline)
+            print("\n".join("  " + line for line in differences))
+            return 2
+
+    results = {}
+    for scenario in args.cases:
+        for pathName in args.paths:
+            name = caseName(scenario, pathName)
+            print("Running %s..." % name, flush=True)
+            results[name] = runCase(scenario, pathName, args)
+    print(report(results))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"frames": args.frames, "size": args.size, "windowed": args.windowed,
+                       "pixel_lighting": args.pixel_lighting, "trace": args.trace, "cases": results}, f, indent=2)
+        print("Baseline saved to %s" % args.save)
+    if baseline is not None:
+        regressions = compare(results, baseline["cases"], args.threshold)
+        if regressions:
+            print("Regressions against %s:" % args.baseline)
+            print("\n".join("  " + line for line in regressions))
+            return 1
+        print("No regressions against %s (threshold %.0f%%)" % (args.baseline, 100 * args.threshold))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
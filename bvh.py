@@ -0,0 +1,227 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# bvh.py module
+# Description:
+#   A bounding volume hierarchy: a binary tree of axis-aligned boxes
+#   over a set of objects' boxes, so frustum, ray and box-overlap
+#   queries visit only the branches that can matter (logarithmic in
+#   the number of objects rather than linear).
+#
+#   The tree is stored in flat NumPy arrays (node boxes, children,
+#   parents and the range of objects under each node) and built top
+#   down by splitting the objects at the median of their centers along
+#   the widest axis.  When objects move, refit() updates their boxes
+#   and the boxes of the nodes above them, without rebuilding.
+# ==============================
+import numpy as np
+
+LEAF_SIZE = 4
+
+# Stands in for a ray direction's zero components in slab tests
+PARALLEL = 1e-30
+
+
+def worldBoxes(matrices, lows, highs):
+    """Axis-aligned (lows, highs) around N local boxes placed by N 4x4 matrices"""
+    lows = np.asarray(lows, dtype=np.float64)
+    highs = np.asarray(highs, dtype=np.float64)
+    matrices = np.asarray(matrices, dtype=np.float64)
+    centers = (lows + highs) / 2
+    extents = (highs - lows) / 2
+    linear = matrices[:, :3, :3]
+    worldCenters = np.einsum("nij,nj->ni", linear, centers) + matrices[:, :3, 3]
+    worldExtents = np.einsum("nij,nj->ni", np.abs(linear), extents)
+    return worldCenters - worldExtents, worldCenters + worldExtents
+
+
+def rayBoxes(origin, direction, lows, highs, maxDistance=np.inf):
+    """Slab test: where the ray from origin along direction enters each of N
+       boxes ((N,3) lows and highs; 0 if it starts inside), inf where it
+       misses or enters beyond maxDistance
+    """
+    near, far = _slabs(np.stack((lows, highs), axis=1), origin, _inverse(direction))
+    np.maximum(near, 0.0, out=near)
+    return np.where((near <= far) & (near <= maxDistance), near, np.inf)
+
+
+def _inverse(direction):
+    # A tiny stand-in for zero components keeps every slab distance a number
+    direction = np.asarray(direction, dtype=np.float64)
+    return 1.0 / np.where(direction == 0, PARALLEL, direction)
+
+
+def _slabs(boxes, origin, inverse):
+    """Where a ray enters and leaves the slabs of (N,2,3) boxes: (near, far)"""
+    t = (boxes - origin) * inverse
+    return np.minimum(t[:, 0], t[:, 1]).max(axis=1), np.maximum(t[:, 0], t[:, 1]).min(axis=1)
+
+
+class BVH:
+    """A bounding volume hierarchy over N axis-aligned boxes"""
+
+    def __init__(self, lows, highs, leafSize=LEAF_SIZE):
+        """A constructor for BVH class from the objects' (N,3) min and max corners.
+           Queries return indices into these arrays.
+        """
+        # Each box is its two corners, kept together: (N,2,3)
+        self.boxes = np.stack((np.reshape(lows, (-1, 3)), np.reshape(highs, (-1, 3))), axis=1).astype(np.float64)
+        self.lows = self.boxes[:, 0]
+        self.highs = self.boxes[:, 1]
+        self.leafSize = leafSize
+        count = len(self.boxes)
+        capacity = max(1, 2 * count)
+        self.nodeBoxes = np.zeros((capacity, 2, 3))
+        self.nodeLows = self.nodeBoxes[:, 0]
+        self.nodeHighs = self.nodeBoxes[:, 1]
+        self.left = np.full(capacity, -1)     # children (-1 for leaves)
+        self.right = np.full(capacity, -1)
+        self.parent = np.full(capacity, -1)
+        self.first = np.zeros(capacity, dtype=int)   # the node's objects are order[first:first+size]
+        self.size = np.zeros(capacity, dtype=int)
+        self.order = np.arange(count)
+        self.leafOf = np.zeros(count, dtype=int)
+        self.nodeCount = 0
+        self.visited = 0     # nodes visited by the last query
+        if count:
+            self._build()
+        self.isLeaf = self.left < 0
+
+    def __str__(self):
+        """Basic string representation of this BVH"""
+        return "BVH over %d objects (%d nodes, %d visited by the last query)" % (
+            len(self.lows), self.nodeCount, self.visited)
+
+    def __len__(self):
+        return len(self.lows)
+
+    def _build(self):
+        centers = (self.lows + self.highs) / 2
+        self.nodeCount = 1
+        stack = [(0, 0, len(self.lows), -1)]   # (node, first, end, parent)
+        while stack:
+            node, first, end, parent = stack.pop()
+            objects = self.order[first:end]
+            self.nodeLows[node] = self.lows[objects].min(axis=0)
+            self.nodeHighs[node] = self.highs[objects].max(axis=0)
+            self.parent[node] = parent
+            self.first[node] = first
+            self.size[node] = end - first
+            if end - first <= self.leafSize:
+                self.leafOf[objects] = node
+                continue
+            # Split at the median center along the axis the centers spread widest
+            spread = centers[objects]
+            axis = np.argmax(spread.max(axis=0) - spread.min(axis=0))
+            half = (end - first) // 2
+            self.order[first:end] = objects[np.argpartition(spread[:, axis], half)]
+            left, right = self.nodeCount, self.nodeCount + 1
+            self.nodeCount += 2
+            self.left[node] = left
+            self.right[node] = right
+            stack.append((left, first, first + half, node))
+            stack.append((right, first + half, end, node))
+
+    def refit(self, indices, lows, highs):
+        """Move some objects' boxes (e.g. objects that moved) and update the
+           boxes above them.  The tree shape is kept, so refit many large
+           moves and queries slow down: then build a new BVH.
+        """
+        indices = np.asarray(indices, dtype=int).ravel()
+        if len(indices) == 0:
+            return
+        self.lows[indices] = lows
+        self.highs[indices] = highs
+        frontier = set()
+        for leaf in np.unique(self.leafOf[indices]):
+            objects = self.order[self.first[leaf]:self.first[leaf] + self.size[leaf]]
+            self.nodeLows[leaf] = self.lows[objects].min(axis=0)
+            self.nodeHighs[leaf] = self.highs[objects].max(axis=0)
+            frontier.add(self.parent[leaf])
+        # Walk up a level at a time; a node reached again later is simply redone
+        frontier.discard(-1)
+        while frontier:
+            above = set()
+            for node in frontier:
+                left, right = self.left[node], self.right[node]
+                np.minimum(self.nodeLows[left], self.nodeLows[right], out=self.nodeLows[node])
+                np.maximum(self.nodeHighs[left], self.nodeHighs[right], out=self.nodeHighs[node])
+                above.add(self.parent[node])
+            above.discard(-1)
+            frontier = above
+
+    def _objects(self, nodes):
+        """The objects under the given nodes, all in one array"""
+        sizes = self.size[nodes]
+        offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        return self.order[np.repeat(self.first[nodes], sizes) + offsets]
+
+    def _query(self, test):
+        """Descend the tree a level at a time, testing all the nodes of a level
+           at once.  test(boxes) returns which of (K,2,3) boxes overlap the query
+           and which are entirely within it (or None when that cannot be told);
+           the objects under the latter are taken without further tests.
+        """
+        found = []
+        self.visited = 0
+        nodes = np.zeros(min(self.nodeCount, 1), dtype=int)
+        while len(nodes):
+            self.visited += len(nodes)
+            overlap, within = test(self.nodeBoxes[nodes])
+            if within is not None:
+                found.append(self._objects(nodes[within]))
+                overlap &= ~within
+            nodes = nodes[overlap]
+            leaf = self.isLeaf[nodes]
+            if leaf.any():
+                objects = self._objects(nodes[leaf])
+                found.append(objects[test(self.boxes[objects])[0]])
+                nodes = nodes[~leaf]
+            nodes = np.concatenate((self.left[nodes], self.right[nodes]))
+        return np.concatenate(found) if found else np.zeros(0, dtype=int)
+
+    def queryFrustum(self, frustum):
+        """Indices of the objects whose boxes are at least partly inside frustum
+           (see frustum.Frustum)
+        """
+        normals = frustum.planes[:, :3].T
+        offsets = frustum.planes[:, 3]
+        reachNormals = np.abs(normals)
+
+        def test(boxes):
+            distances = (boxes[:, 0] + boxes[:, 1]) / 2 @ normals + offsets
+            reach = (boxes[:, 1] - boxes[:, 0]) / 2 @ reachNormals
+            return np.all(distances + reach >= 0, axis=1), np.all(distances - reach >= 0, axis=1)
+
+        return self._query(test)
+
+    def queryBox(self, low, high):
+        """Indices of the objects whose boxes overlap the box from low to high"""
+        low = np.asarray(low, dtype=np.float64)
+        high = np.asarray(high, dtype=np.float64)
+
+        def test(boxes):
+            lows, highs = boxes[:, 0], boxes[:, 1]
+            return (np.all((lows <= high) & (highs >= low), axis=1),
+                    np.all((lows >= low) & (highs <= high), axis=1))
+
+        return self._query(test)
+
+    def queryRay(self, origin, direction, maxDistance=np.inf):
+        """The objects whose boxes the ray from origin along direction enters
+           within maxDistance, nearest first: (indices, distances along the ray,
+           in units of direction's length)
+        """
+        inverse = _inverse(direction)
+
+        def test(boxes):
+            near, far = _slabs(boxes, origin, inverse)
+            hit = np.maximum(near, 0.0) <= far
+            if maxDistance < np.inf:
+                hit &= near <= maxDistance
+            return hit, None
+
+        indices = self._query(test)
+        distances = rayBoxes(origin, direction, self.lows[indices], self.highs[indices], maxDistance)
+        nearest = np.argsort(distances, kind="stable")
+        return indices[nearest], distances[nearest]
@@ -8,10 +8,12 @@
 #   Defines a simple camera class for navigation
 # ==============================
 import math
+import numpy as np
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
 from OpenGL.GL import *
 from utils import *
+from frustum import Frustum
 
 
 class Camera:
@@ -33,6 +35,65 @@ class Camera:
         """Basic string representation of this Camera"""
         return "Camera Eye at %s with angle (%f)" % (self.eye, self.lookAngle)
 
+    def viewKey(self):
+        """A value that changes whenever placeCamera would build a different view"""
+        return (self.eye.x, self.eye.y, self.eye.z, self.lookAngle)
+
+    def viewMatrix(self):
+        """The 4x4 matrix placeCamera builds (same as gluLookAt), as a NumPy array"""
+        eye = np.array([self.eye.x, self.eye.y, self.eye.z])
+        rad = math.radians(self.lookAngle)
+        forward = np.array([-math.sin(rad), 0.0, -math.cos(rad)])
+        # Always upright, so the right and up axes are simple
+        right = np.array([math.cos(rad), 0.0, -math.sin(rad)])
+        up = np.array([0.0, 1.0, 0.0])
+        view = np.identity(4)
+        view[0, :3] = right
+        view[1, :3] = up
+        view[2, :3] = -forward
+        view[:3, 3] = -view[:3, :3] @ eye
+        return view
+
+    def projectionMatrix(self):
+        """The 4x4 matrix setProjection builds (same as gluPerspective), as a NumPy array"""
+        f = 1.0 / math.tan(math.radians(self.camAngle) / 2)
+        projection = np.zeros((4, 4))
+        projection[0, 0] = f / self.aspRatio
+        projection[1, 1] = f
+        projection[2, 2] = (self.far + self.near) / (self.near - self.far)
+        projection[2, 3] = 2 * self.far * self.near / (self.near - self.far)
+        projection[3, 2] = -1.0
+        return projection
+
+    def frustum(self):
+        """The camera's view volume in world coordinates, for culling"""
+        return Frustum(self.projectionMatrix() @ self.viewMatrix())
+
+    def pixelSize(self, center, radius, viewportHeight):
+        """About how many pixels across a sphere of radius at world point center
+           appears in a viewport viewportHeight pixels high (see lod.py)
+        """
+        distance = math.dist((self.eye.x, self.eye.y, self.eye.z), center)
+        if distance <= radius:
+            return math.inf
+        # Pixels per unit at distance 1, from the vertical field of view
+        scale = viewportHeight / (2 * math.tan(math.radians(self.camAngle) / 2))
+        return 2 * radius * scale / distance
+
+    def unproject(self, x, y, width, height):
+        """The world-space ray through window pixel (x, y) of a width x height
+           viewport, with y counted down from the top as GLUT reports it:
+           (origin on the near plane, unit direction)
+        """
+        ndcX = 2.0 * (x + 0.5) / width - 1.0
+        ndcY = 1.0 - 2.0 * (y + 0.5) / height
+        inverse = np.linalg.inv(self.projectionMatrix() @ self.viewMatrix())
+        near = inverse @ (ndcX, ndcY, -1.0, 1.0)
+        far = inverse @ (ndcX, ndcY, 1.0, 1.0)
+        near = near[:3] / near[3]
+        direction = far[:3] / far[3] - near
+        return near, direction / np.linalg.norm(direction)
+
     def setProjection(self):
         glMatrixMode(GL_PROJECTION);
         glLoadIdentity();
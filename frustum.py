@@ -0,0 +1,78 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# frustum.py module
+# Description:
+#   View-frustum culling.  A Frustum holds the six planes of the
+#   camera's view volume (extracted from projection x view, see
+#   Camera.frustum) and tests many bounding spheres or axis-aligned
+#   boxes against them at once with NumPy, so objects entirely out
+#   of view can be skipped before any GL call is made.
+#
+#   Boxes are given as centers and half-extents (boxFromCorners
+#   converts the (min corner, max corner) bounds of meshes).  Boxes
+#   that are turned in the world, like the bounds of a rotated scene
+#   graph node, are tested in their own coordinates, which stays tight
+#   where an axis-aligned box around them would not.
+# ==============================
+import numpy as np
+
+
+def boxFromCorners(low, high):
+    """(center, half-extent) of the box between two corners"""
+    low = np.asarray(low, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    return (low + high) / 2, (high - low) / 2
+
+
+class Frustum:
+    """The six planes of a view volume, for culling"""
+
+    def __init__(self, matrix):
+        """A constructor for Frustum class from a 4x4 projection x view matrix.
+           Planes face inwards: ax + by + cz + d >= 0 inside.
+        """
+        m = np.asarray(matrix, dtype=np.float64)
+        planes = np.array([m[3] + m[0], m[3] - m[0],     # left, right
+                           m[3] + m[1], m[3] - m[1],     # bottom, top
+                           m[3] + m[2], m[3] - m[2]])    # near, far
+        self.planes = planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+        self.tested = 0
+        self.culled = 0
+
+    def __str__(self):
+        """Basic string representation of this Frustum"""
+        return "Frustum: %d of %d bounds tested were culled" % (self.culled, self.tested)
+
+    def _count(self, visible):
+        self.tested += len(visible)
+        self.culled += len(visible) - int(np.count_nonzero(visible))
+        return visible
+
+    def testSpheres(self, centers, radii):
+        """Which of N spheres ((N,3) centers, (N,) radii) are at least partly inside"""
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+        distances = centers @ self.planes[:, :3].T + self.planes[:, 3]
+        return self._count(np.all(distances >= -np.asarray(radii, dtype=np.float64).reshape(-1, 1), axis=1))
+
+    def testBoxes(self, centers, extents):
+        """Which of N axis-aligned boxes ((N,3) centers and half-extents) are at least
+           partly inside.  Conservative: a box near a corner of the frustum may pass.
+        """
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+        extents = np.asarray(extents, dtype=np.float64).reshape(-1, 3)
+        distances = centers @ self.planes[:, :3].T + self.planes[:, 3]
+        # How far each box reaches towards each plane's inside
+        reach = extents @ np.abs(self.planes[:, :3]).T
+        return self._count(np.all(distances + reach >= 0, axis=1))
+
+    def testOrientedBoxes(self, matrices, centers, extents):
+        """Which of N boxes, each given in its own coordinates ((N,3) centers and
+           half-extents) and placed in the world by a 4x4 matrix ((N,4,4)),
+           are at least partly inside
+        """
+        # Each plane in each box's coordinates: plane . (M x) = (plane M) . x
+        planes = np.einsum("pj,njk->npk", self.planes, np.asarray(matrices, dtype=np.float64))
+        distances = np.einsum("npk,nk->np", planes[:, :, :3], centers) + planes[:, :, 3]
+        reach = np.einsum("npk,nk->np", np.abs(planes[:, :, :3]), extents)
+        return self._count(np.all(distances + reach >= 0, axis=1))
@@ -0,0 +1,176 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# glstate.py module
+# Description:
+#   A shadow copy of the OpenGL state we change most often (enables,
+#   bound textures and shader program, texture environment, hints,
+#   light model, shade model and material, including which named
+#   material is bound).  Each setter compares against the shadow and
+#   only calls into GL when the value actually changes, counting the
+#   calls it issued and the ones it elided for every frame.
+#
+#   Code that changes this state behind the cache's back must call
+#   forget() or invalidate() afterwards.  watch() lets other code
+#   follow changes to a piece of state (see shading).  Display lists are handled
+#   with beginRecording()/endRecording()/replayed() (see scenecache).
+# ==============================
+from OpenGL.GL import *
+
+
+class GLStateCache:
+    """Skips GL state calls that would not change anything"""
+
+    def __init__(self):
+        """A constructor for GLStateCache class (nothing is known yet)"""
+        self.shadow = {}
+        self.watchers = {}        # key -> callbacks run whenever that state is set
+        self.recording = None
+        self.issued = 0
+        self.elided = 0
+        self.lastFrame = (0, 0)   # (issued, elided) for the last finished frame
+        self.frames = 0
+
+    def __str__(self):
+        """Basic string representation of this GLStateCache"""
+        issued, elided = self.lastFrame
+        return "GL state calls last frame: %d issued, %d elided" % (issued, elided)
+
+    def _set(self, key, value, func, *args):
+        """Call func(*args) unless key already holds value"""
+        if self.recording is None and self.shadow.get(key) == value:
+            self.elided += 1
+            return
+        func(*args)
+        self.issued += 1
+        self._remember(key, value)
+        for callback in self.watchers.get(key, ()):
+            callback(value)
+
+    def _remember(self, key, value):
+        self.shadow[key] = value
+        if self.recording is not None:
+            self.recording[key] = value
+
+    def enable(self, cap):
+        self._set(("enable", cap), True, glEnable, cap)
+
+    def disable(self, cap):
+        self._set(("enable", cap), False, glDisable, cap)
+
+    def isEnabled(self, cap):
+        """Whether cap is enabled, asking GL only if the cache does not know"""
+        enabled = self.shadow.get(("enable", cap))
+        if enabled is None:
+            enabled = bool(glIsEnabled(cap))
+            self.shadow[("enable", cap)] = enabled
+        return enabled
+
+    def bindTexture(self, target, texture):
+        self._set(("texture", target), texture, glBindTexture, target, texture)
+
+    def texEnv(self, pname, value):
+        self._set(("texEnv", pname), value, glTexEnvf, GL_TEXTURE_ENV, pname, value)
+
+    def hint(self, target, mode):
+        self._set(("hint", target), mode, glHint, target, mode)
+
+    def useProgram(self, program):
+        self._set(("program",), program, glUseProgram, program)
+
+    def shadeModel(self, mode):
+        self._set(("shadeModel",), mode, glShadeModel, mode)
+
+    def lightModel(self, pname, value):
+        """glLightModeli for single values, glLightModelfv for sequences"""
+        if isinstance(value, (int, float)):
+            self._set(("lightModel", pname), value, glLightModeli, pname, value)
+        else:
+            value = tuple(value)
+            self._set(("lightModel", pname), value, glLightModelfv, pname, value)
+
+    def material(self, face, pname, value):
+        """glMaterialf for single values, glMaterialfv for sequences"""
+        if isinstance(value, (int, float)):
+            func = glMaterialf
+        else:
+            func = glMaterialfv
+            value = tuple(value)
+        # One GL_FRONT_AND_BACK call sets both faces; it is redundant only if both already match
+        faces = (GL_FRONT, GL_BACK) if face == GL_FRONT_AND_BACK else (face,)
+        if self.recording is None and all(self.shadow.get(("material", f, pname)) == value for f in faces):
+            self.elided += 1
+            return
+        func(face, pname, value)
+        self.issued += 1
+        for f in faces:
+            self._remember(("material", f, pname), value)
+            # Whatever named material was bound is no longer entirely current
+            self._remember(("boundMaterial", f), None)
+
+    def useMaterial(self, face, material):
+        """Bind all of a material's parameters (see materials.Material) at once.
+           Skipped when that same material is still bound to the face(s);
+           otherwise only the parameters that differ are sent."""
+        faces = (GL_FRONT, GL_BACK) if face == GL_FRONT_AND_BACK else (face,)
+        if self.recording is None and all(self.shadow.get(("boundMaterial", f)) is material for f in faces):
+            self.elided += 1
+            return
+        for pname, array, value in material.fields:
+            if self.recording is None and all(self.shadow.get(("material", f, pname)) == value for f in faces):
+                self.elided += 1
+                continue
+            if len(value) == 1:
+                glMaterialf(face, pname, value[0])
+            else:
+                glMaterialfv(face, pname, array)
+            self.issued += 1
+            for f in faces:
+                self._remember(("material", f, pname), value)
+        for f in faces:
+            self._remember(("boundMaterial", f), material)
+
+    def watch(self, key, callback):
+        """Call callback(value) after every GL call that sets key (e.g. ("enable", GL_LIGHTING)).
+           Shaders use this to mirror fixed-function state into uniforms."""
+        self.watchers.setdefault(key, []).append(callback)
+
+    def known(self, key, default=None):
+        """The shadowed value for key (default if the cache does not know it)"""
+        value = self.shadow.get(key)
+        return default if value is None else value
+
+    def forget(self, key):
+        """Stop trusting one shadowed value (it was changed elsewhere)"""
+        self.shadow.pop(key, None)
+
+    def invalidate(self):
+        """Stop trusting every shadowed value"""
+        self.shadow.clear()
+
+    def beginRecording(self):
+        """Start compiling a display list: nothing may be elided while recording,
+           since the list can be replayed in any state."""
+        self.recording = {}
+
+    def endRecording(self):
+        """Finish a display list, returning the state it leaves behind"""
+        touched = self.recording
+        self.recording = None
+        return touched
+
+    def replayed(self, touched):
+        """A display list recorded with beginRecording() has just been called"""
+        self.shadow.update(touched)
+
+    def endFrame(self):
+        """Finish counting one frame, returning (issued, elided)"""
+        self.lastFrame = (self.issued, self.elided)
+        self.issued = 0
+        self.elided = 0
+        self.frames += 1
+        return self.lastFrame
+
+
+# The cache for the (single) GL context the programs use
+state = GLStateCache()
@@ -0,0 +1,276 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# gltrace.py module
+# Description:
+#   Opt-in tracing of the GL, GLU and GLUT calls the scene makes.
+#   The scene's modules use "from OpenGL.GL import *", so each one
+#   holds its own references to the GL functions; installing the
+#   tracer swaps those references for counting wrappers and
+#   uninstalling puts the originals back.  Until it is installed
+#   nothing is wrapped, so it costs nothing.
+#
+#   For every function it counts the calls per frame and the time
+#   spent in them, split into PyOpenGL's Python wrapper (argument
+#   conversion, error checks) and the driver's C function where the
+#   two can be told apart.  It can also capture the complete call
+#   stream of one frame to a JSON file, which replay() can issue again.
+#
+#   Install it once a GL context exists: light.py does so in init()
+#   when the GLTRACE environment variable is set (e.g. GLTRACE=1).
+# ==============================
+import ctypes
+import json
+import sys
+import time
+import numpy as np
+from OpenGL.platform import baseplatform
+
+# Modules whose GL calls are traced (those not yet imported are skipped)
+TRACED_MODULES = ("light", "shapes", "camera", "glstate", "lights", "mesh", "primitives",
+                  "instancing", "scenecache", "materials", "shading", "textures", "scenegraph")
+
+
+def isGLFunction(name, value):
+    """True for the gl*, glu* and glut* functions (not the GL_* constants)"""
+    if not callable(value) or not name.startswith("gl") or isinstance(value, type):
+        return False
+    for prefix in ("glut", "glu", "gl"):
+        if name.startswith(prefix):
+            return name[len(prefix):len(prefix) + 1].isupper()
+    return False
+
+
+def encode(value):
+    """A JSON-friendly copy of one call argument"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return {"array": value.tolist(), "dtype": str(value.dtype)}
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    if isinstance(value, bytes):
+        return {"bytes": value.hex()}
+    if isinstance(value, ctypes.c_void_p):
+        return {"pointer": value.value}
+    return {"object": type(value).__name__}
+
+
+class _DriverTimer:
+    """Stands in for the C function inside a PyOpenGL wrapper, timing it
+       when it is called from a traced call"""
+
+    def __init__(self, tracer, function):
+        self.tracer = tracer
+        self.function = function
+
+    def __call__(self, *args):
+        entry = self.tracer.current
+        if entry is None:
+            return self.function(*args)
+        start = time.perf_counter()
+        try:
+            return self.function(*args)
+        finally:
+            entry[2] += time.perf_counter() - start
+
+    def __getattr__(self, name):
+        # PyOpenGL reads the C function's signature through the wrapper
+        return getattr(self.function, name)
+
+
+class GLTracer:
+    """Counts and times the GL calls made by the traced modules, frame by frame"""
+
+    def __init__(self, modules=TRACED_MODULES):
+        """A constructor for GLTracer class.  modules names the modules to trace."""
+        self.modules = modules
+        self.installed = False
+        self.patched = []        # (module, name, original function)
+        self.hooked = []         # (PyOpenGL wrapper, original C function)
+        self.opaque = set()      # functions whose wrapper and driver time cannot be split
+        self.calls = {}          # function name -> [calls, seconds, driver seconds] this frame
+        self.lastFrame = {}
+        self.totals = {}
+        self.frames = 0
+        self.current = None      # the entry of the traced call in progress
+        self.stream = None       # the calls of the frame being captured
+        self.captureFile = None
+
+    def __str__(self):
+        """Basic string representation of this GLTracer"""
+        calls = sum(entry[0] for entry in self.lastFrame.values())
+        return "GLTracer (%s): %d GL calls last frame" % ("on" if self.installed else "off", calls)
+
+    def install(self):
+        """Start tracing (needs a current GL context)"""
+        if self.installed:
+            return
+        wrapped = {}
+        for moduleName in self.modules:
+            module = sys.modules.get(moduleName)
+            if module is None:
+                continue
+            for name, value in list(vars(module).items()):
+                if not isGLFunction(name, value):
+                    continue
+                if name not in wrapped:
+                    wrapped[name] = self._wrap(name, value)
+                self.patched.append((module, name, value))
+                setattr(module, name, wrapped[name])
+        self.installed = True
+
+    def uninstall(self):
+        """Stop tracing and put the original functions back"""
+        for module, name, function in self.patched:
+            setattr(module, name, function)
+        for wrapper, function in self.hooked:
+            wrapper.wrappedOperation = function
+            wrapper.finalise()
+        self.patched = []
+        self.hooked = []
+        self.installed = False
+
+    def _hookDriver(self, function):
+        """Time the C function inside a PyOpenGL wrapper; False if there is none"""
+        if hasattr(function, "finalise") and hasattr(function, "wrappedOperation"):
+            original = function.wrappedOperation
+            function.wrappedOperation = _DriverTimer(self, original)
+            try:
+                # The wrapper builds its call with the C function baked in
+                function.finalise()
+            except Exception:
+                function.wrappedOperation = original
+                return False
+            self.hooked.append((function, original))
+            return True
+        return False
+
+    def _wrap(self, name, function):
+        tracer = self
+        # Plain C functions have no Python wrapper: all their time is the driver's
+        direct = isinstance(function, (ctypes._CFuncPtr, baseplatform._NullFunctionPointer))
+        if not direct and not self._hookDriver(function):
+            self.opaque.add(name)
+
+        def traced(*args, **kwargs):
+            entry = tracer.calls.get(name)
+            if entry is None:
+                entry = tracer.calls[name] = [0, 0.0, 0.0]
+            if tracer.stream is not None:
+                # Encoded now: arrays are often reused and changed later in the frame
+                tracer.stream.append([name, encode(args)])
+            outer = tracer.current
+            tracer.current = entry
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                tracer.current = outer
+                entry[0] += 1
+                entry[1] += elapsed
+                if direct:
+                    entry[2] += elapsed
+        traced.__name__ = name
+        traced.__wrapped__ = function
+        return traced
+
+    def captureFrame(self, filename):
+        """Save every GL call from now to the end of the frame to filename
+           (see replay).  Call it between frames to capture a whole one.
+        """
+        self.stream = []
+        self.captureFile = filename
+
+    def endFrame(self):
+        """Finish one frame: its counts become lastFrame and are added to the totals"""
+        if not self.installed:
+            return
+        self.lastFrame = self.calls
+        self.calls = {}
+        self.frames += 1
+        for name, (calls, seconds, driver) in self.lastFrame.items():
+            total = self.totals.get(name)
+            if total is None:
+                total = self.totals[name] = [0, 0.0, 0.0]
+            total[0] += calls
+            total[1] += seconds
+            total[2] += driver
+        if self.stream is not None:
+            with open(self.captureFile, "w") as f:
+                json.dump({"calls": self.stream}, f)
+            print("GL calls of one frame saved to %s" % self.captureFile)
+            self.stream = None
+
+    def clear(self):
+        self.totals = {}
+        self.frames = 0
+
+    def report(self, top=25):
+        """The most expensive functions, per frame on average since the last clear()"""
+        frames = max(self.frames, 1)
+        lines = ["GL calls over %d frames (per frame; times in microseconds)" % self.frames,
+                 "%-28s %8s %10s %10s %10s" % ("function", "calls", "total", "wrapper", "driver")]
+        ranked = sorted(self.totals.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (calls, seconds, driver) in ranked[:top]:
+            if name in self.opaque:
+                split = "%10s %10s" % ("-", "-")
+            else:
+                split = "%10.1f %10.1f" % (1e6 * (seconds - driver) / frames, 1e6 * driver / frames)
+            lines.append("%-28s %8.1f %10.1f %s" % (name, calls / frames, 1e6 * seconds / frames, split))
+        calls = sum(total[0] for total in self.totals.values())
+        seconds = sum(total[1] for total in self.totals.values())
+        lines.append("%-28s %8.1f %10.1f" % ("all", calls / frames, 1e6 * seconds / frames))
+        return "\n".join(lines)
+
+
+def decode(value, objects):
+    if isinstance(value, list):
+        return [decode(item, objects) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "array" in value:
+        return np.array(value["array"], dtype=value["dtype"])
+    if "bytes" in value:
+        return bytes.fromhex(value["bytes"])
+    if "pointer" in value:
+        return ctypes.c_void_p(value["pointer"])
+    return objects(value["object"])
+
+
+def replay(filename):
+    """Issue the calls saved by captureFrame again in the current context.
+       Textures, buffers and display lists are referred to by their GL
+       names, so they must exist (e.g. replay inside the same program).
+       Returns the number of calls skipped (arguments that could not be saved).
+    """
+    from OpenGL import GL, GLU, GLUT
+    with open(filename) as f:
+        calls = json.load(f)["calls"]
+    quadrics = {}
+
+    def objects(typeName):
+        # Any quadric draws the same shapes with the default settings
+        if "quadric" not in typeName.lower():
+            raise ValueError(typeName)
+        if typeName not in quadrics:
+            quadrics[typeName] = GLU.gluNewQuadric()
+        return quadrics[typeName]
+
+    skipped = 0
+    for name, args in calls:
+        module = GLUT if name.startswith("glut") else GLU if name.startswith("glu") else GL
+        try:
+            args = decode(args, objects)
+        except ValueError:
+            skipped += 1
+            continue
+        getattr(module, name)(*args)
+    return skipped
+
+
+# The tracer used by light.py (and headless.py and bench.py)
+tracer = GLTracer()
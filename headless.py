@@ -0,0 +1,257 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# headless.py module
+# Description:
+#   Renders the light.py scene without a window or display server.
+#   An OffscreenContext creates a GL context with EGL (surfaceless,
+#   e.g. Mesa's llvmpipe) or OSMesa and draws into a framebuffer
+#   object; HeadlessRenderer runs light.py's own frame drawing in it
+#   and returns each frame as a NumPy array or writes it to a file.
+#
+#   PyOpenGL picks its platform when OpenGL is first imported, so
+#   this module must be imported before light.py (or anything else
+#   that imports OpenGL).  Set PYOPENGL_PLATFORM=osmesa to use OSMesa.
+#
+#   Command line, e.g.:
+#     python headless.py -o thumb.png --size 320x240
+#     python headless.py -o frames.npy --frames 60 --animate
+#     python headless.py -o frame%03d.png --frames 10 --set angle_movement=0
+# ==============================
+import os
+os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+
+import argparse
+import ast
+import ctypes
+import sys
+import numpy as np
+from OpenGL.GL import *
+
+EGL_PLATFORM_SURFACELESS_MESA = 0x31DD
+
+
+class OffscreenContext:
+    """A GL context with no window, rendering into a framebuffer object"""
+
+    def __init__(self, width, height, platform=None):
+        """A constructor for OffscreenContext class.
+           platform is "egl" or "osmesa" (default: PYOPENGL_PLATFORM).
+        """
+        self.width = width
+        self.height = height
+        self.platform = platform or os.environ["PYOPENGL_PLATFORM"]
+        if self.platform == "egl":
+            self._createEGL()
+        elif self.platform == "osmesa":
+            self._createOSMesa()
+        else:
+            raise RuntimeError("Unsupported headless platform: {0}".format(self.platform))
+        self._createFramebuffer()
+
+    def __str__(self):
+        """Basic string representation of this OffscreenContext"""
+        return "OffscreenContext %dx%d (%s: %s)" % (self.width, self.height, self.platform,
+                                                     glGetString(GL_RENDERER).decode())
+
+    def _createEGL(self):
+        from OpenGL import EGL
+        self.egl = EGL
+        display = EGL.EGL_NO_DISPLAY
+        if bool(EGL.eglGetPlatformDisplayEXT):
+            # Needs no GPU or display server at all
+            display = EGL.eglGetPlatformDisplayEXT(EGL_PLATFORM_SURFACELESS_MESA, EGL.EGL_DEFAULT_DISPLAY, None)
+        if display == EGL.EGL_NO_DISPLAY:
+            display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise RuntimeError("Could not initialize EGL")
+        attributes = (EGL.EGLint * 5)(EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                                      EGL.EGL_SURFACE_TYPE, 0, EGL.EGL_NONE)
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        if not EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1, ctypes.pointer(count)) \
+                or count.value == 0:
+            raise RuntimeError("No EGL configuration supports desktop OpenGL")
+        # Desktop GL with the compatibility profile: the scene uses fixed-function calls
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        self.context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+        if self.context == EGL.EGL_NO_CONTEXT:
+            raise RuntimeError("Could not create an EGL context")
+        if not EGL.eglMakeCurrent(display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context):
+            raise RuntimeError("Could not make the EGL context current (surfaceless contexts unsupported?)")
+        self.display = display
+
+    def _createOSMesa(self):
+        from OpenGL import osmesa
+        self.osmesa = osmesa
+        self.context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+        if not self.context:
+            raise RuntimeError("Could not create an OSMesa context")
+        # OSMesa needs a buffer to render to even though drawing goes to the framebuffer object
+        self.osmesaBuffer = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+        if not osmesa.OSMesaMakeCurrent(self.context, self.osmesaBuffer, GL_UNSIGNED_BYTE,
+                                        self.width, self.height):
+            raise RuntimeError("Could not make the OSMesa context current")
+
+    def _createFramebuffer(self):
+        self.framebuffer = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        self.renderbuffers = glGenRenderbuffers(2)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.renderbuffers[0])
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, self.width, self.height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.renderbuffers[0])
+        glBindRenderbuffer(GL_RENDERBUFFER, self.renderbuffers[1])
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, self.width, self.height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.renderbuffers[1])
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("Offscreen framebuffer is incomplete")
+        glDrawBuffer(GL_COLOR_ATTACHMENT0)
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+
+    def read(self):
+        """The framebuffer's pixels as a (height, width, 3) uint8 array, top row first"""
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        pixels = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        image = np.frombuffer(pixels, dtype=np.uint8).reshape(self.height, self.width, 3)
+        return image[::-1].copy()
+
+    def release(self):
+        glDeleteFramebuffers(1, [self.framebuffer])
+        glDeleteRenderbuffers(2, self.renderbuffers)
+        if self.platform == "egl":
+            self.egl.eglMakeCurrent(self.display, self.egl.EGL_NO_SURFACE, self.egl.EGL_NO_SURFACE,
+                                    self.egl.EGL_NO_CONTEXT)
+            self.egl.eglDestroyContext(self.display, self.context)
+        else:
+            self.osmesa.OSMesaDestroyContext(self.context)
+
+
+class HeadlessRenderer:
+    """Draws light.py's scene offscreen"""
+
+    def __init__(self, width=800, height=800, platform=None, **settings):
+        """A constructor for HeadlessRenderer class.
+           settings are light.py module variables to set first
+           (e.g. pixel_lighting=True, light_height=2).
+        """
+        import light
+        self.light = light
+        # Start decoding the images while the context comes up, as main() does
+        for filename in light.IMAGE_FILES:
+            light.assetLoader.request(filename, **light.IMAGE_OPTIONS)
+        self.context = OffscreenContext(width, height, platform)
+        light.win_width = width
+        light.win_height = height
+        light.camera.aspRatio = width / height
+        light.init()
+        # Thumbnails should show the real textures, not the placeholders
+        light.assetLoader.wait()
+        self.configure(**settings)
+        self.frameCount = 0
+
+    def __str__(self):
+        """Basic string representation of this HeadlessRenderer"""
+        return "HeadlessRenderer (%d frames) in %s" % (self.frameCount, self.context)
+
+    def configure(self, **settings):
+        """Set light.py module variables (only ones that exist)"""
+        for name, value in settings.items():
+            if not hasattr(self.light, name):
+                raise ValueError("light.py has no setting named {0}".format(name))
+            setattr(self.light, name, value)
+
+    def render(self, animate=False):
+        """Draw one frame and return it as a (height, width, 3) uint8 array.
+           animate advances the scene's animations one step first.
+        """
+        if animate:
+            # One simulation step per frame, so the frames are the same every run
+            self.light.simulation.advance()
+        profiler = self.light.profiler
+        with profiler.section("frame"):
+            self.light.render_frame()
+            with profiler.section("read"):
+                image = self.context.read()
+        profiler.endFrame()
+        self.frameCount += 1
+        return image
+
+    def frames(self, count, animate=False):
+        """Yield count consecutive frames"""
+        for _ in range(count):
+            yield self.render(animate)
+
+    def save(self, filename, image):
+        """Write one frame as .png (or any image type PIL knows) or .npy"""
+        if filename.endswith(".npy"):
+            np.save(filename, image)
+        else:
+            from PIL import Image
+            Image.fromarray(image).save(filename)
+
+    def release(self):
+        self.light.assetLoader.shutdown()
+        self.context.release()
+
+
+def parseSetting(text):
+    """name=value, with value a Python literal (True, 2.5, ...)"""
+    name, _, value = text.partition("=")
+    try:
+        return name, ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        raise argparse.ArgumentTypeError("expected name=literal, got {0!r}".format(text))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the light.py scene without a window.")
+    parser.add_argument("-o", "--output", default="frame.png",
+                        help="a .png/.jpg file (use %%d in the name for several frames) or a .npy file "
+                             "(all frames in one array)")
+    parser.add_argument("--size", default="800x800", help="WIDTHxHEIGHT (default 800x800)")
+    parser.add_argument("--frames", type=int, default=1, help="number of frames to render")
+    parser.add_argument("--animate", action="store_true",
+                        help="advance the animations before each frame (spinning the world by default)")
+    parser.add_argument("--pixel-lighting", action="store_true", help="use the per-pixel lighting shader")
+    parser.add_argument("--profile", metavar="NAME",
+                        help="time each phase of the frames and save NAME.csv and NAME.json")
+    parser.add_argument("--model", action="append", default=[], metavar="FILE",
+                        help="add an OBJ or PLY model to the scene (repeatable)")
+    parser.add_argument("--set", type=parseSetting, action="append", default=[], metavar="NAME=VALUE",
+                        help="set a light.py variable, e.g. --set light_height=2 (repeatable)")
+    args = parser.parse_args(argv)
+
+    width, height = (int(n) for n in args.size.lower().split("x"))
+    if args.frames > 1 and "%" not in args.output and not args.output.endswith(".npy"):
+        parser.error("several frames need a %d in the output name (or a .npy output)")
+    settings = dict(args.set)
+    if args.pixel_lighting:
+        settings["pixel_lighting"] = True
+    if args.animate:
+        # Spin the world unless told otherwise
+        settings.setdefault("animate", True)
+    renderer = HeadlessRenderer(width, height, **settings)
+    for filename in args.model:
+        renderer.light.add_model(filename)
+    if args.profile:
+        renderer.light.profiler.start()
+    frames = renderer.frames(args.frames, args.animate)
+    if args.output.endswith(".npy"):
+        renderer.save(args.output, np.stack(list(frames)))
+    else:
+        for number, image in enumerate(frames):
+            filename = args.output % number if "%" in args.output else args.output
+            renderer.save(filename, image)
+    print(renderer)
+    if args.profile:
+        profiler = renderer.light.profiler
+        profiler.stop()
+        print(profiler.report())
+        profiler.export(args.profile)
+    renderer.release()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
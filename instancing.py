@@ -0,0 +1,375 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# instancing.py module
+# Description:
+#   Draws many copies of one mesh in a single call.  An InstanceBatch
+#   keeps a per-instance 4x4 transform (and optionally a color) in one
+#   NumPy array that is copied into a buffer object whenever it
+#   changes; draw() then issues one glDrawElementsInstanced, whatever
+#   the number of instances.
+#
+#   Instanced drawing needs a vertex shader, so the one below
+#   reproduces the fixed-function per-vertex lighting (lights, light
+#   model and current material).  On GL versions without instancing
+#   or shaders, draw() falls back to one glDrawElements per instance.
+# ==============================
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+from glstate import state
+from bvh import BVH, worldBoxes
+from picking import rayTriangles
+
+# Per-instance layout: the column-major transform, then an RGBA color
+FLOATS_PER_INSTANCE = 20
+INSTANCE_STRIDE = FLOATS_PER_INSTANCE * 4
+COLOR_OFFSET = ctypes.c_void_p(16 * 4)
+
+# Lights the shader looks at (GL guarantees at least this many)
+MAX_LIGHTS = 8
+
+# Set to False to always use the one-call-per-instance fallback
+USE_INSTANCING = True
+
+VERTEX_SHADER = """
+#version 120
+const int MAX_LIGHTS = %d;
+
+attribute mat4 instanceMatrix;
+attribute vec4 instanceColor;
+
+uniform bool lighting;
+uniform bool lightOn[MAX_LIGHTS];
+uniform bool localViewer;
+uniform bool useColors;
+
+// The fixed-function lighting equation for one side of the surface
+vec4 shade(vec3 pos, vec3 n, vec4 ambient, vec4 diffuse, vec4 specular,
+           vec4 emission, float shininess)
+{
+    vec3 view = localViewer ? normalize(-pos) : vec3(0.0, 0.0, 1.0);
+    vec3 color = emission.rgb + ambient.rgb * gl_LightModel.ambient.rgb;
+    for (int i = 0; i < MAX_LIGHTS; i++) {
+        if (!lightOn[i])
+            continue;
+        vec3 l;
+        float attenuation = 1.0;
+        if (gl_LightSource[i].position.w != 0.0) {
+            vec3 d = gl_LightSource[i].position.xyz / gl_LightSource[i].position.w - pos;
+            float dist = length(d);
+            l = d / dist;
+            attenuation = 1.0 / (gl_LightSource[i].constantAttenuation
+                                 + gl_LightSource[i].linearAttenuation * dist
+                                 + gl_LightSource[i].quadraticAttenuation * dist * dist);
+        } else {
+            l = normalize(gl_LightSource[i].position.xyz);
+        }
+        if (gl_LightSource[i].spotCutoff != 180.0) {
+            float spotCos = dot(-l, normalize(gl_LightSource[i].spotDirection));
+            attenuation *= spotCos < gl_LightSource[i].spotCosCutoff
+                ? 0.0 : pow(max(spotCos, 0.0), gl_LightSource[i].spotExponent);
+        }
+        float nDotL = max(dot(n, l), 0.0);
+        vec3 lit = ambient.rgb * gl_LightSource[i].ambient.rgb
+                 + nDotL * diffuse.rgb * gl_LightSource[i].diffuse.rgb;
+        if (nDotL > 0.0) {
+            float nDotH = max(dot(n, normalize(l + view)), 0.0);
+            lit += pow(nDotH, shininess) * specular.rgb * gl_LightSource[i].specular.rgb;
+        }
+        color += attenuation * lit;
+    }
+    return vec4(clamp(color, 0.0, 1.0), diffuse.a);
+}
+
+void main()
+{
+    vec4 vertex = instanceMatrix * gl_Vertex;
+    gl_Position = gl_ModelViewProjectionMatrix * vertex;
+    if (!lighting) {
+        gl_FrontColor = gl_BackColor = useColors ? instanceColor : gl_Color;
+        return;
+    }
+    // Normals transform by the inverse transpose: the cofactor matrix, up to scale
+    mat3 m = mat3(instanceMatrix);
+    mat3 cofactor = mat3(cross(m[1], m[2]), cross(m[2], m[0]), cross(m[0], m[1]));
+    float handedness = sign(dot(m[0], cofactor[0]));
+    vec3 n = normalize(gl_NormalMatrix * (handedness * cofactor * gl_Normal));
+    vec3 pos = vec3(gl_ModelViewMatrix * vertex);
+
+    vec4 frontAmbient = useColors ? instanceColor : gl_FrontMaterial.ambient;
+    vec4 frontDiffuse = useColors ? instanceColor : gl_FrontMaterial.diffuse;
+    vec4 backAmbient = useColors ? instanceColor : gl_BackMaterial.ambient;
+    vec4 backDiffuse = useColors ? instanceColor : gl_BackMaterial.diffuse;
+    gl_FrontColor = shade(pos, n, frontAmbient, frontDiffuse, gl_FrontMaterial.specular,
+                          gl_FrontMaterial.emission, gl_FrontMaterial.shininess);
+    gl_BackColor = shade(pos, -n, backAmbient, backDiffuse, gl_BackMaterial.specular,
+                         gl_BackMaterial.emission, gl_BackMaterial.shininess);
+}
+""" % MAX_LIGHTS
+
+FRAGMENT_SHADER = """
+#version 120
+void main()
+{
+    gl_FragColor = gl_Color;
+}
+"""
+
+# The shader program, built on first use (0 when instancing is unavailable)
+_program = None
+_locations = {}
+
+
+def instancedProgram():
+    """The instancing shader program, or 0 if this GL cannot draw instanced"""
+    global _program
+    if _program is None:
+        _program = 0
+        if USE_INSTANCING and bool(glDrawElementsInstanced) and bool(glVertexAttribDivisor):
+            try:
+                _program = shaders.compileProgram(shaders.compileShader(VERTEX_SHADER, GL_VERTEX_SHADER),
+                                                  shaders.compileShader(FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+                                                  validate=False)
+            except RuntimeError as e:
+                print("Instancing disabled, shader failed to build: {0}".format(e))
+                _program = 0
+        if _program:
+            for name in ("instanceMatrix", "instanceColor"):
+                _locations[name] = glGetAttribLocation(_program, name)
+            for name in ("lighting", "lightOn", "localViewer", "useColors"):
+                _locations[name] = glGetUniformLocation(_program, name)
+    return _program
+
+
+class FixedFunctionShader:
+    """Draws instances with the shader above, lit like the fixed-function pipeline"""
+
+    def beginInstances(self, colored):
+        """Make the program current and match it to the GL state.
+           Returns the (instanceMatrix, instanceColor) attribute locations.
+        """
+        state.useProgram(_program)
+        glUniform1i(_locations["lighting"], state.isEnabled(GL_LIGHTING))
+        glUniform1iv(_locations["lightOn"], MAX_LIGHTS,
+                     [state.isEnabled(GL_LIGHT0 + i) for i in range(MAX_LIGHTS)])
+        glUniform1i(_locations["localViewer"], state.known(("lightModel", GL_LIGHT_MODEL_LOCAL_VIEWER), 0))
+        glUniform1i(_locations["useColors"], colored)
+        # Two-sided lighting picks gl_BackColor for back faces, as fixed-function does
+        if state.known(("lightModel", GL_LIGHT_MODEL_TWO_SIDE), 0):
+            state.enable(GL_VERTEX_PROGRAM_TWO_SIDE)
+        else:
+            state.disable(GL_VERTEX_PROGRAM_TWO_SIDE)
+        return _locations["instanceMatrix"], _locations["instanceColor"]
+
+    def endInstances(self):
+        state.useProgram(0)
+
+
+fixedFunctionShader = FixedFunctionShader()
+
+
+class InstanceBatch:
+    """Many copies of one mesh, each with its own transform and color"""
+
+    def __init__(self, mesh, capacity=16, colored=False):
+        """A constructor for InstanceBatch class.
+           mesh is shared by every instance; capacity is the initial room
+           for instances (it grows as needed).  When colored, each instance's
+           color replaces the material's ambient and diffuse colors (like
+           GL_COLOR_MATERIAL); otherwise the current material is used.
+        """
+        self.mesh = mesh
+        self.colored = colored
+        self.data = np.zeros((capacity, FLOATS_PER_INSTANCE), dtype=np.float32)
+        self.count = 0
+        self.buffer = None
+        self.bufferCapacity = 0
+        self.dirty = True
+        self.box = None          # cached bounds()
+        self.boxes = None        # cached instanceBoxes()
+        self.index = None        # BVH over them, for intersect()
+
+    def __str__(self):
+        """Basic string representation of this InstanceBatch"""
+        return "InstanceBatch of %d instances (%s)" % (
+            self.count, "instanced" if instancedProgram() else "one call each")
+
+    def __len__(self):
+        return self.count
+
+    def _reserve(self, count):
+        if count > len(self.data):
+            grown = np.zeros((max(count, 2 * len(self.data)), FLOATS_PER_INSTANCE), dtype=np.float32)
+            grown[:self.count] = self.data[:self.count]
+            self.data = grown
+
+    def add(self, matrix, color=(1.0, 1.0, 1.0, 1.0)):
+        """Add one instance with a 4x4 transform (see utils.translate, ...); returns its index"""
+        return self.extend(np.asarray(matrix)[None], [color]).start
+
+    def extend(self, matrices, colors=None):
+        """Add an (N,4,4) stack of transforms at once (and optionally (N,4) colors).
+           Returns the range of the new instances' indices.
+        """
+        matrices = np.asarray(matrices, dtype=np.float32)
+        first = self.count
+        self._reserve(first + len(matrices))
+        self.count += len(matrices)
+        new = self.data[first:self.count]
+        # Column-major, as GL expects matrices
+        new[:, :16] = matrices.transpose(0, 2, 1).reshape(-1, 16)
+        new[:, 16:] = 1.0 if colors is None else colors
+        self.dirty = True
+        self.box = None
+        self.boxes = None
+        self.index = None
+        return range(first, self.count)
+
+    def setMatrix(self, index, matrix):
+        self.data[index, :16] = np.asarray(matrix, dtype=np.float32).T.ravel()
+        self.dirty = True
+        self.box = None
+        self.boxes = None
+        self.index = None
+
+    def setColor(self, index, color):
+        self.data[index, 16:] = color
+        self.dirty = True
+
+    def clear(self):
+        self.count = 0
+        self.dirty = True
+        self.box = None
+        self.boxes = None
+        self.index = None
+
+    def matrices(self):
+        """The instances' 4x4 transforms, as an (N,4,4) array"""
+        # Stored column-major: transpose back to row-major matrices
+        return self.data[:self.count, :16].reshape(-1, 4, 4).transpose(0, 2, 1)
+
+    def instanceBoxes(self):
+        """(lows, highs): an axis-aligned box around each instance"""
+        if self.boxes is None:
+            low, high = self.mesh.bounds()
+            lows, highs = np.tile(low, (self.count, 1)), np.tile(high, (self.count, 1))
+            self.boxes = worldBoxes(self.matrices(), lows, highs)
+        return self.boxes
+
+    def bounds(self):
+        """(min corner, max corner) of a box around every instance (None when empty)"""
+        if self.count == 0:
+            return None
+        if self.box is None:
+            lows, highs = self.instanceBoxes()
+            self.box = lows.min(axis=0), highs.max(axis=0)
+        return self.box
+
+    def intersect(self, origin, direction):
+        """The nearest triangle of any instance the ray from origin along
+           direction hits: (distance along the ray, triangle index counting
+           through the instances in order), or (inf, None).  Only instances
+           whose boxes the ray enters are tested (found with a BVH over the
+           boxes), nearest first.
+        """
+        best, bestTriangle = np.inf, None
+        if self.count == 0:
+            return best, bestTriangle
+        if self.index is None:
+            self.index = BVH(*self.instanceBoxes())
+        instances, entries = self.index.queryRay(origin, direction)
+        triangles = self.mesh.triangles()
+        matrices = self.matrices()
+        for instance, entry in zip(instances, entries):
+            if entry >= best:
+                break
+            matrix = matrices[instance]
+            distances = rayTriangles(origin, direction, triangles @ matrix[:3, :3].T + matrix[:3, 3])
+            nearest = int(np.argmin(distances))
+            if distances[nearest] < best:
+                best, bestTriangle = float(distances[nearest]), int(instance) * len(triangles) + nearest
+        return best, bestTriangle
+
+    def upload(self):
+        """Copy the instance array into its buffer object"""
+        if self.buffer is None:
+            self.buffer = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        instances = self.data[:self.count]
+        if len(self.data) > self.bufferCapacity:
+            glBufferData(GL_ARRAY_BUFFER, self.data.nbytes, None, GL_DYNAMIC_DRAW)
+            self.bufferCapacity = len(self.data)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, instances.nbytes, instances)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.dirty = False
+
+    def delete(self):
+        """Release the instance buffer (the mesh is not deleted: it may be shared)"""
+        if self.buffer is not None:
+            glDeleteBuffers(1, [self.buffer])
+            self.buffer = None
+            self.bufferCapacity = 0
+        self.dirty = True
+
+    def draw(self, shader=None):
+        """Draw every instance with the current modelview matrix, material and lights.
+           shader (optional) replaces the built-in fixed-function shader; it must
+           provide beginInstances(colored) and endInstances() (see shading).
+        """
+        if self.count == 0:
+            return
+        if instancedProgram():
+            self.drawInstanced(shader)
+        else:
+            self.drawEach()
+
+    def drawInstanced(self, shader=None):
+        if self.dirty:
+            self.upload()
+        if shader is None:
+            shader = fixedFunctionShader
+        matrixLocation, colorLocation = shader.beginInstances(self.colored)
+
+        self.mesh.bind(texcoords=False)
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        locations = [matrixLocation + column for column in range(4)]
+        for column, location in enumerate(locations):
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, 4, GL_FLOAT, GL_FALSE, INSTANCE_STRIDE,
+                                  ctypes.c_void_p(column * 16))
+            glVertexAttribDivisor(location, 1)
+        if colorLocation >= 0:
+            glEnableVertexAttribArray(colorLocation)
+            glVertexAttribPointer(colorLocation, 4, GL_FLOAT, GL_FALSE, INSTANCE_STRIDE, COLOR_OFFSET)
+            glVertexAttribDivisor(colorLocation, 1)
+            locations.append(colorLocation)
+
+        glDrawElementsInstanced(self.mesh.mode, len(self.mesh.indices), GL_UNSIGNED_INT, None, self.count)
+
+        for location in locations:
+            glVertexAttribDivisor(location, 0)
+            glDisableVertexAttribArray(location)
+        self.mesh.unbind()
+        shader.endInstances()
+
+    def drawEach(self):
+        """The fallback: one glDrawElements per instance, geometry bound only once"""
+        if self.colored:
+            # Colors go through GL_COLOR_MATERIAL; put the material and color back afterwards
+            glPushAttrib(GL_LIGHTING_BIT | GL_CURRENT_BIT)
+            glColorMaterial(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
+            glEnable(GL_COLOR_MATERIAL)
+        self.mesh.bind()
+        glMatrixMode(GL_MODELVIEW)
+        for instance in self.data[:self.count]:
+            glPushMatrix()
+            glMultMatrixf(instance[:16])
+            if self.colored:
+                glColor4fv(instance[16:])
+            glDrawElements(self.mesh.mode, len(self.mesh.indices), GL_UNSIGNED_INT, None)
+            glPopMatrix()
+        self.mesh.unbind()
+        if self.colored:
+            glPopAttrib()
@@ -20,11 +20,31 @@ see the resulting effect.
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
 from OpenGL.GL import *
+import os
 import sys
+import functools
+import numpy as np
 from utils import *
 from camera import *
+import mesh
+import primitives
+import lod
+import models
+import textures
+import proctex
+from assets import AssetLoader
+from scenecache import CompiledScene
+from instancing import InstanceBatch
+from scenegraph import SceneGraph, Node
+from profiler import FrameProfiler
+from gltrace import tracer
+from simloop import FixedStepLoop
+from redraw import RedrawScheduler
+import shading
+from glstate import state
+from lights import Light, LightManager
+from materials import MaterialRegistry
 import math
-from PIL import Image
 
 # These parameters describe window properties
 win_width = 800
@@ -42,6 +62,9 @@ camera = Camera(CAM_ANGLE, win_width/win_height, CAM_NEAR, CAM_FAR, INITIAL_EYE,
 # These parameters define simple animation properties
 FPS = 60.0
 DELAY = int(1000.0 / FPS + 0.5)
+# The animations step at a fixed rate, however fast frames are drawn (see simloop.py)
+SIM_RATE = 60.0
+SIM_PERIODS = (360, None, None)   # for sim_state(): the world angle wraps around
 DEFAULT_STEP = 0.001
 BULLET_SPEED = 0.1
 angle_step = 0.1
@@ -55,6 +78,7 @@ time = 0
 brightness = 1.0
 tanBallX = 2.8
 silverBallX = -4
+BALL_RADIUS = 0.2
 speed = 0.01
 silverSpeed = 0.01
 diceAngle = 0
@@ -64,6 +88,27 @@ counter = 0
 NROWS = 64
 NCOLS = 64
 
+# Largest dimension image textures are scaled down to when loaded
+MAX_TEXTURE_SIZE = 1024
+
+# Image textures are decoded on background threads (see assets.py)
+IMAGE_FILES = ["brick.jpg", "wood.jpg"]
+IMAGE_OPTIONS = dict(powerOfTwo=True, maxSize=MAX_TEXTURE_SIZE)
+assetLoader = AssetLoader()
+
+# Named materials (copper, silver, pewter, ...) defined in a data file
+materials = MaterialRegistry("materials.json")
+
+# The optional per-pixel lighting program (see pixel_lighting)
+pixelLighting = shading.PixelLighting()
+
+# Per-phase frame timings, switched on and off with the 't' key
+profiler = FrameProfiler()
+PROFILE_NAME = "profile"   # exported to profile.csv and profile.json
+
+# Where the 'c' key saves one frame's GL calls (when GLTRACE is set, see gltrace.py)
+TRACE_FILE = "frame_calls.json"
+
 # Plane dimensions (not airplane - just a flat sheet)
 PLANE_WIDTH = 30
 PLANE_HEIGHT = 30
@@ -80,101 +125,279 @@ red_light = True
 blue_light = True
 green_light = True
 use_lv = GL_FALSE
+pixel_lighting = False     # Light per pixel with GLSL (see shading.py) instead of per vertex
 floor_option = 2
 animateTan = False
 animateSilver = False
 animateDice = False
 ANGLE_STEP = 1
 
+# Size the room geometry was last built for (None = not built yet)
+roomSize = None
+
+# Where the four brick walls stand (each is its own scene graph node so
+# the ones out of view are culled)
+WALL_PLACEMENTS = [
+    rotate(90, 0, 1, 0) @ translate(0, 0, 15),
+    rotate(90, 0, 1, 0) @ translate(0, 0, -15),
+    rotate(180, 0, 1, 0) @ translate(0, 0, 15),
+    rotate(180, 0, 1, 0) @ translate(0, 0, -15),
+]
+
+# The camera's view volume this frame (see draw_scene), for culling
+view_frustum = None
+
+# The scene graph node last clicked on (see mouse), outlined in this color
+selected = None
+SELECTION_COLOR = (1.0, 1.0, 0.0)
+
+# Models (OBJ or PLY files, see models.py) stand in a row on the floor in
+# front of the desk, each scaled to MODEL_SIZE across its largest side.
+# Give their files on the command line: python light.py chair.obj lamp.ply
+MODEL_SIZE = 2.0
+MODEL_SPACING = 3.0
+MODEL_ROW_Z = 4.0
+MODEL_MATERIAL = "silver"
+modelNodes = []
+
+# The lights in the scene.  update_lights() copies the switches above
+# into them each frame; the LightManager uploads only what changed.
+lights = LightManager()
+blueLight = lights.add(Light("blue", position=(3.0, light_height, 1.0, 1.0),
+                             ambient=(0.0, 0, 1, 1), diffuse=(0.4, 0.4, 0.6, 1), specular=(0.0, 0, 0.8, 1),
+                             direction=(1.0, -1.0, 1.0), cutoff=45.0, attenuation=(1.0, 0.0, 0.0)))
+redLight = lights.add(Light("red", position=(4.0, light_height, 2.0, 1.0),
+                            ambient=(1.0, 0, 0, 1), diffuse=(0.4, 0.4, 0.6, 1), specular=(0.0, 0, 0.8, 1),
+                            direction=(1.0, -1.0, 1.0), cutoff=45.0, attenuation=(2.0, 0.0, 0.0)))
+greenLight = lights.add(Light("green", position=(5.0, light_height, 3.0, 1.0),
+                              ambient=(0, 1.0, 0, 1), diffuse=(0.4, 0.4, 0.6, 1), specular=(0.0, 0, 0.8, 1),
+                              direction=(1.0, -1.0, 1.0), cutoff=45.0, attenuation=(3.0, 0.0, 0.0)))
+lampLight = lights.add(Light("lamp", position=(-0.7, 2.5, 0.8, 1.0),
+                             ambient=(1, 1, 1, 1), diffuse=(1, 1, 1, 1), specular=(1, 1, 1, 1),
+                             direction=(0.0, -1.0, 0.0), cutoff=45.0, attenuation=(4.0, 0.0, 0.0)))
+headLight = lights.add(Light("headlamp", position=(0.0, 0.0, 0.0, 1.0),
+                             ambient=(1, 1, 1, 1), diffuse=(1, 1, 1, 1), specular=(1, 1, 1, 1),
+                             direction=(1.0, -1.0, 1.0), cutoff=30.0, attenuation=(3.0, 0.0, 0.0),
+                             enabled=headlamp_is_on))
+
 def main():
     """Start the main program running."""
+    # Start decoding the images while the window and GL context come up.
+    for filename in IMAGE_FILES:
+        assetLoader.request(filename, **IMAGE_OPTIONS)
+
     # Create the initial window.
-    glutInit(sys.argv)
+    modelFiles = [arg.decode() for arg in glutInit(sys.argv)[1:]]
     glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH)
     glutInitWindowSize(win_width, win_height)
     glutInitWindowPosition(100,100)
     glutCreateWindow(win_name)
 
     init()
+    for filename in modelFiles:
+        add_model(filename)
 
-    
     # Setup the callback returns for display and keyboard events.
     glutDisplayFunc(display)
     glutKeyboardFunc(keyboard)
     glutSpecialFunc(special_keys)
+    glutMouseFunc(mouse)
     glutReshapeFunc(reshape)
-    glutTimerFunc(DELAY, timer, 0)
+    redraw.update()
     # Enter the main loop, displaying window and waiting for events.
     glutMainLoop()
     return
 
 def init():
     """Perform basic OpenGL initialization."""
-    global tube, ball, faceTextureName, woodTextureName
-    tube = gluNewQuadric()
-    gluQuadricDrawStyle(tube, GLU_FILL)
-    ball = gluNewQuadric()
-    gluQuadricDrawStyle(ball, GLU_FILL)
+    global faceTextureName, woodTextureName, staticScene, furniture, simulation, redraw
+    global sceneGraph, worldNode, tanBallNode, silverBallNode, staticNode, wallNodes, ballLOD
+    # The balls are drawn with fewer triangles the smaller they look (see lod.py)
+    ballLOD = lod.sphere(BALL_RADIUS)
 
     # Set up lighting and depth-test
-    glEnable(GL_LIGHTING)
-    glEnable(GL_NORMALIZE)    # Inefficient...
-    glEnable(GL_DEPTH_TEST)   # For z-buffering!
+    state.enable(GL_LIGHTING)
+    state.enable(GL_NORMALIZE)    # Inefficient...
+    state.enable(GL_DEPTH_TEST)   # For z-buffering!
 
     generateCheckerBoardTexture()
-    faceTextureName = loadImageTexture("brick.jpg")
-    woodTextureName = loadImageTexture("wood.jpg")
+    # Resized to powers of two and mipmapped so distant walls sample small levels.
+    # These show a placeholder until the background decode finishes (see timer).
+    faceTextureName = assetLoader.loadTexture("brick.jpg", wrap=GL_REPEAT, **IMAGE_OPTIONS)
+    woodTextureName = assetLoader.loadTexture("wood.jpg", wrap=GL_REPEAT, **IMAGE_OPTIONS)
+
+    # Everything that never moves is recorded once and replayed each frame.
+    # It is recorded again when any of the values in static_scene_key change.
+    staticScene = CompiledScene(draw_static_objects, static_scene_key)
+
+    # The desk, lamp and dice are all copies of one cube, drawn in one call
+    furniture = InstanceBatch(primitives.cube())
+    furniture.extend([
+        translate(0, .4, 0) @ scale(5, 1, 2.5),                              # desk
+        translate(0, 1, 0),
+        translate(-1, 1, 0),
+        translate(0, 2, 0) @ scale(0.1, 1, 0.1),                             # lamp post
+        translate(-.45, 2.5, 0) @ rotate(90, 0, 0, 1) @ scale(0.1, 1, 0.1),  # lamp arm
+        translate(1, 1.1, 1) @ scale(.1, .1, .1),                            # dice
+        translate(1.1, 1.1, 1.2) @ scale(.1, .1, .1),
+    ])
+
+    # Everything drawn by draw_objects hangs off the spinning world node.
+    # Nodes with bounds are skipped when they are out of view.
+    sceneGraph = SceneGraph()
+    worldNode = sceneGraph.add(Node("world"))
+    # Clicks are tested against each node's shape (see mouse)
+    ballBounds = ((-BALL_RADIUS,) * 3, (BALL_RADIUS,) * 3)
+    ballShape = ballLOD.meshes[0]
+    tanBallNode = worldNode.add(Node("tanBall", drawable=lambda shader=None: draw_ball("copper", tanBallNode),
+                                     bounds=ballBounds, shape=ballShape))
+    silverBallNode = worldNode.add(Node("silverBall", drawable=lambda shader=None: draw_ball("pewter", silverBallNode),
+                                        bounds=ballBounds, shape=ballShape))
+    staticNode = worldNode.add(Node("staticScene", drawable=lambda shader=None: staticScene.draw()))
+    worldNode.add(Node("furniture", drawable=draw_furniture, bounds=furniture.bounds, shape=furniture))
+    # Bounds and shapes of the room are set once it is built (see build_room)
+    wallNodes = [worldNode.add(Node("wall%d" % i, placement, draw_wall)) for i, placement in enumerate(WALL_PLACEMENTS)]
+
+    # Animations run in fixed steps, drawn blended between the last two
+    simulation = FixedStepLoop(1.0 / SIM_RATE, animate_scene, sim_state, SIM_PERIODS)
+    # Frames are drawn only when something changed; the timer stops when nothing moves
+    redraw = RedrawScheduler(DELAY, timer, scene_active, simulation.pause)
+
+    # Count every GL call per frame when asked to (e.g. GLTRACE=1 python light.py)
+    if os.environ.get("GLTRACE"):
+        tracer.install()
+
+def add_model(filename):
+    """Load an OBJ or PLY model (see models.py) and stand it on the floor, next to the ones before it."""
+    modelMesh = models.loadMesh(filename)
+    low, high = (np.asarray(corner, dtype=np.float64) for corner in modelMesh.bounds())
+    size = MODEL_SIZE / max((high - low).max(), 1e-9)
+    center = (low + high) / 2
+    # Alternating either side of the middle: 0, +1, -1, +2, -2... spacings along the row
+    slot = len(modelNodes)
+    x = (slot + 1) // 2 * MODEL_SPACING * (1 if slot % 2 else -1)
+    # Scaled to size with its lowest point on the floor
+    placement = translate(x, 0, MODEL_ROW_Z) @ scale(size, size, size) @ translate(-center[0], -low[1], -center[2])
+    node = worldNode.add(Node(os.path.basename(filename), placement, lambda shader=None: draw_model(modelMesh),
+                              bounds=(low, high), shape=modelMesh))
+    modelNodes.append(node)
+    print("Loaded {0}: {1}".format(filename, modelMesh))
+    return node
+
+def static_scene_key():
+    """The values the recorded static scene depends on."""
+    return (checkerBoardName, woodTextureName, PLANE_WIDTH, PLANE_HEIGHT, pixel_lighting)
+
+def build_room():
+    """Build the static room geometry once so it can be drawn from vertex buffers."""
+    global floorMesh, wallMesh, boardMesh, roomSize
+    if roomSize is not None:
+        floorMesh.delete()
+        wallMesh.delete()
+        boardMesh.delete()
+    roomSize = (PLANE_WIDTH, PLANE_HEIGHT)
+    floorMesh = mesh.floor(PLANE_WIDTH, PLANE_HEIGHT)
+
+    # The four brick walls share one mesh, each placed by its scene graph node
+    wallMesh = mesh.plane(PLANE_WIDTH, PLANE_HEIGHT)
+    for node in wallNodes:
+        node.bounds = wallMesh.bounds()
+        node.shape = wallMesh
+
+    boardMesh = mesh.plane(10, 5).transformed(translate(0, 1, -2.5) @ rotate(90, 1, 0, 0))
+    # Floor and board are drawn from the recorded scene, but clicked on as one mesh
+    staticNode.shape = mesh.Mesh.merge([floorMesh, boardMesh])
+    staticNode.bounds = staticNode.shape.bounds()
 
 def display():
     """Display the current scene."""
+    redraw.drawn()
+    with profiler.section("frame"):
+        render_frame()
+        with profiler.section("swapBuffers"):
+            glutSwapBuffers()
+    profiler.endFrame()
+
+def render_frame():
+    """Draw one frame into the current framebuffer (a window or, see headless.py, offscreen)."""
     # Set the viewport to the full screen.
     glViewport(0, 0, win_width, win_height)
 
-    camera.setProjection()
+    with profiler.section("setProjection"):
+        camera.setProjection()
     
     # Clear the Screen.
-    glClearColor(0.0, 0.0, 0.0, 0.0)
-    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+    with profiler.section("clear"):
+        glClearColor(0.0, 0.0, 0.0, 0.0)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
     # Set the shading model we want to use.
-    glShadeModel(GL_SMOOTH if use_smooth else GL_FLAT)
+    state.shadeModel(GL_SMOOTH if use_smooth else GL_FLAT)
 
     # Draw and show the "Scene".
-    draw_scene()
+    with profiler.section("draw_scene"):
+        draw_scene()
     glFlush()
-    glutSwapBuffers()
+    state.endFrame()
+    lights.endFrame()
+    ballLOD.endFrame()
+    for markerLOD in marker_lods.values():
+        markerLOD.endFrame()
+    tracer.endFrame()
+
+def timer():
+    """Animate for one tick of the redraw timer.  Returns True if the scene needs redrawing."""
+    changed = False
+    if assetLoader.busy() and assetLoader.poll() > 0:
+        # Some textures finished loading - show them
+        changed = True
 
-def timer(alarm):
-    """Set a new alarm after DELAY microsecs and animate if needed."""
-    # Start alarm clock again.
-    glutTimerFunc(DELAY, timer, 0)
     if exiting:
         global brightness
         brightness -= 0.05
         if brightness < 0.01:
             # Enough dimming - terminate!
+            if profiler.enabled:
+                stop_profiling()
             glutLeaveMainLoop()
-        glutPostRedisplay()
-        
+        changed = True
+
+    # Run the animation steps due by now (however long this frame took)
+    if simulation.tick():
+        changed = True
+    return changed
+
+def scene_active():
+    """True while anything animates, fades out or loads (so the timer must keep running)."""
+    return animate or animateTan or animateSilver or animateDice or exiting or assetLoader.busy()
+
+def sim_state():
+    """The animated values drawing uses: world angle and the two balls' positions."""
+    return (angle_movement, tanBallX, silverBallX)
+
+def animate_scene():
+    """Advance whatever is animating by one step.  Returns True if anything moved."""
+    moved = False
     if animate:
         # Advance to the next frame.
         advance()
-        glutPostRedisplay()
+        moved = True
 
     if animateTan:
         # Advance to the next frame
         advanceTan()
-        glutPostRedisplay()
+        moved = True
 
     if animateSilver:
         # Advance to the next frame
         advanceSilver()
-        glutPostRedisplay()
+        moved = True
 
     if animateDice:
         # Advance to the next frame
         advanceDice()
-        glutPostRedisplay()
+        moved = True
+    return moved
         
 # Advance the scene one frame
 def advanceTan():
@@ -245,66 +468,100 @@ def keyboard(key, x, y):
     elif key == b'a':
         # Go left
         camera.turn(1)
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'd':
         # Go right
         camera.turn(-1)
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'w':
         # Go forward
         camera.slide(0, 0, -1)
-        glutPostRedisplay()
+        redraw.request()
     elif key == b's':
         # Go backward
         camera.slide(0, 0, 1)
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'q':
         # Go up
         camera.slide(0, 1, 0)
         #camera.turn(1)
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'e':
         # Go down
         camera.slide(0, -1, 0)
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'f':
         global fire
         fire = True
     elif key == b'l':
         global is_light_on
         is_light_on = not is_light_on
-        glutPostRedisplay()
+        redraw.request()
+    elif key == b'm':
+        # Show how much GPU memory the textures are using
+        print(textures.memoryReport())
+    elif key == b'g':
+        # Show how many redundant GL state and light changes were skipped
+        print(state)
+        print(lights)
+        print(sceneGraph)
+        print(view_frustum)
+        print("Balls:", ballLOD)
+        for (radius, stacks), markerLOD in marker_lods.items():
+            print("Light markers of radius %g:" % radius, markerLOD)
+        if tracer.installed:
+            print(tracer.report())
+    elif key == b'c':
+        # Save every GL call of the next frame (needs GLTRACE, see gltrace.py)
+        if tracer.installed:
+            tracer.captureFrame(TRACE_FILE)
+            redraw.request()
+        else:
+            print("Run with GLTRACE=1 to capture GL calls")
+    elif key == b'p':
+        # Switch between per-vertex (fixed-function) and per-pixel lighting
+        global pixel_lighting
+        pixel_lighting = not pixel_lighting
+        redraw.request()
+    elif key == b't':
+        # Start timing each phase of the frame, or stop and save the timings
+        if profiler.enabled:
+            stop_profiling()
+        else:
+            profiler.clear()
+            profiler.start()
+            redraw.request()
     elif key == b'h':
         print("SOS HELP: Press 0-5 to turn on and off all lights, WASD controls to move around the room")
     elif key == b'1':
         global blue_light
         blue_light = not blue_light
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'2':
         global red_light
         red_light = not red_light
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'3':
         global green_light
         green_light = not green_light
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'4':
         global lamp_light
         lamp_light = not lamp_light
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'5':
         global headlamp_is_on
         headlamp_is_on = not headlamp_is_on
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'-':
         # Move light down
         global light_height
         light_height -= light_height_dy
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'+':
         # Move light up
         light_height += light_height_dy
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'7':
         global animateDice, counter
         counter = 0
@@ -316,549 +573,220 @@ def keyboard(key, x, y):
         global animateSilver
         animateSilver = not animateSilver
 
-def drawPlane(width, height, texture):
-    """ Draw a textured plane of the specified dimension. """
-    glBindTexture(GL_TEXTURE_2D, texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_DECAL)  # try GL_DECAL/GL_REPLACE/GL_MODULATE
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)  # try GL_NICEST/GL_FASTEST
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)  # try GL_CLAMP/GL_REPEAT/GL_CLAMP_TO_EDGE
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)  # try GL_LINEAR/GL_NEAREST
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+    # Start the timer if that key set something going
+    redraw.update()
+
+def drawPlane(plane, texture):
+    """ Draw a textured plane (a Mesh built by mesh.plane). """
+    state.bindTexture(GL_TEXTURE_2D, texture)
+    state.texEnv(GL_TEXTURE_ENV_MODE, GL_DECAL)  # try GL_DECAL/GL_REPLACE/GL_MODULATE
+    state.hint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)  # try GL_NICEST/GL_FASTEST
+    # Wrap and filter modes are set once when the texture is created
 
     # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
-
-    ex = width / 2
-    sx = -ex
-    ey = height
-    sy = 0
-    glBegin(GL_QUADS)
-    glNormal3f(0, 0, 1)
-    glTexCoord2f(0, 0)
-    glVertex3f(sx, sy, 0)
-    glTexCoord2f(2, 0)
-    glVertex3f(ex, sy, 0)
-    glTexCoord2f(2, 2)
-    glVertex3f(ex, ey, 0)
-    glTexCoord2f(0, 2)
-    glVertex3f(sx, ey, 0)
-    glEnd()
-
-    glDisable(GL_TEXTURE_2D)
+    state.enable(GL_TEXTURE_2D)
+    plane.draw()
+    state.disable(GL_TEXTURE_2D)
+
+def mouse(button, button_state, x, y):
+    """Pick the object under the mouse when the left button is clicked."""
+    global selected
+    if button != GLUT_LEFT_BUTTON or button_state != GLUT_DOWN:
+        return
+    # A ray from the eye through the pixel, tested against the scene on the CPU
+    origin, direction = camera.unproject(x, y, win_width, win_height)
+    hit = sceneGraph.pick(origin, direction)
+    selected = hit.node if hit is not None else None
+    print(hit if hit is not None else "Picked nothing")
+    redraw.request()
 
 def reshape(w, h):
     """Handle window reshaping events."""
     global win_width, win_height
     win_width = w
     win_height = h
-    glutPostRedisplay()  # May need to call a redraw...
+    redraw.request()  # May need to call a redraw...
 
 def draw_scene():
     """Draws a simple scene with a few shapes."""
     # Place the camera
-    camera.placeCamera()
+    global view_frustum
+    with profiler.section("placeCamera"):
+        camera.placeCamera()
+        view_frustum = camera.frustum()
     
     
     # Set up the global ambient light.  (Try commenting out.)
     amb = [ 0*brightness, 0*brightness, 0*brightness, 1.0 ]
-    glLightModelfv(GL_LIGHT_MODEL_AMBIENT, amb)
-
-    # Set up the main light (LIGHT0)... or not.
-    if is_light_on:
-        place_blue_light()
-        place_red_light()
-        place_green_light()
-        place_lamp_light()
-    else:
-        glDisable(GL_LIGHT0)
-        glDisable(GL_LIGHT1)
-        glDisable(GL_LIGHT2)
-        glDisable(GL_LIGHT3)
-
-    if lamp_light:
-        place_lamp_light()
-    else:
-        glDisable(GL_LIGHT3)
-
-    if headlamp_is_on:
-        place_headlamp_light()
-    else:
-        glDisable(GL_LIGHT4)
-
-    # Now spin the world around the y-axis (for effect).
-    glRotated(angle_movement, 0, 1, 0)
-    draw_objects()
+    state.lightModel(GL_LIGHT_MODEL_AMBIENT, amb)
 
+    # Set up the lights (see lights.py).
+    with profiler.section("place_lights"):
+        place_lights()
 
-def draw_objects():
-    """Draw the objects in the scene: cylinders, spheres, and floor."""
+    # The shader takes the lights in eye coordinates, as glLight does
+    shader = None
+    if pixel_lighting:
+        lightData = shading.packLights(lights.lights, camera.viewMatrix())
+        if pixelLighting.begin(lightData):
+            shader = pixelLighting
 
-    glPushMatrix()
-
-    glPushMatrix()
-    glTranslate(tanBallX, 3.2, 0)
-    set_copper(GL_FRONT_AND_BACK) # tan texture
-    gluSphere(ball, 0.2, 20, 20) # draw the tan ball
-    glPopMatrix()
-
-    glPushMatrix()
-    glTranslate(silverBallX, 3.2, 1.5)
-    set_pewter(GL_FRONT_AND_BACK) # white texture
-    gluSphere(ball, 0.2, 20, 20) # draw the white ball
-    glPopMatrix()
-
-    glPushMatrix()
-    drawFloor(PLANE_WIDTH, PLANE_HEIGHT, checkerBoardName)
-    glPopMatrix()
+    # Where the animations are at this instant, between their last two steps
+    angle, tanX, silverX = simulation.interpolated()
 
-    glPushMatrix()
-    glRotated(90, 0, 1, 0)
-    glTranslated(0, 0, 15)
-    drawPlane(PLANE_WIDTH, PLANE_HEIGHT, faceTextureName)
-    glPopMatrix()
-
-    glPushMatrix()
-    glRotated(90, 0, 1, 0)
-    glTranslated(0, 0, -15)
-    drawPlane(PLANE_WIDTH, PLANE_HEIGHT, faceTextureName)
-    glPopMatrix()
-
-    glPushMatrix()
-    glRotated(180, 0, 1, 0)
-    glTranslated(0, 0, 15)
-    drawPlane(PLANE_WIDTH, PLANE_HEIGHT, faceTextureName)
-    glPopMatrix()
-
-    glPushMatrix()
-    glRotated(180, 0, 1, 0)
-    glTranslated(0, 0, -15)
-    drawPlane(PLANE_WIDTH, PLANE_HEIGHT, faceTextureName)
-    glPopMatrix()
-
-    glPushMatrix()
-    glTranslated(0, 1, -2.5)
-    glRotated(90,1,0,0)
-    drawPlane(10, 5, woodTextureName)
-    glPopMatrix()
-
-    glPushMatrix()
-    glTranslated(0,.4,0)
-    glScale(5,1,2.5)
-    glutSolidCube(1.0)
-    glPopMatrix()
-
-    
-    glPushMatrix()
-    glTranslated(0,1,0)
-    glutSolidCube(1.0)
-    glPopMatrix()
-
-    glPushMatrix()
-    glTranslated(-1,1,0)
-    glutSolidCube(1.0)
-    glPopMatrix()
-
-    glPushMatrix()
-    glTranslated(0,2,0)
-    glScale(0.1,1,0.1)
-    glutSolidCube(1.0)
-    glPopMatrix()
+    # Now spin the world around the y-axis (for effect).
+    worldNode.setTransform(rotate(angle, 0, 1, 0))
+    tanBallNode.setTransform(translate(tanX, 3.2, 0))
+    silverBallNode.setTransform(translate(silverX, 3.2, 1.5))
+    with profiler.section("draw_objects"):
+        draw_objects(shader)
+    draw_selection()
 
-    glPushMatrix()
-    glTranslated(-.45,2.5,0)
-    glRotated(90,0,0,1)
-    glScale(0.1,1,0.1)
-    glutSolidCube(1.0)
-    glPopMatrix()
+    if shader is not None:
+        shader.end()
 
-    glPushMatrix()
-    glTranslated(1, 1.1, 1)
-    glScale(.1, .1, .1)
-    glutSolidCube(1.0)
-    glPopMatrix()
 
+def draw_objects(shader=None):
+    """Draw the objects in the scene graph: moving balls, the recorded static scene and the furniture.
+    shader is the lighting program in use, if any (see draw_scene).
+    """
+    sceneGraph.draw(camera.viewMatrix(), shader, frustum=view_frustum,
+                    profiler=profiler if profiler.enabled else None)
+
+def draw_selection():
+    """Outline the bounds of the node last clicked on (see mouse)."""
+    box = selected.localBox() if selected is not None else None
+    if box is None:
+        return
+    low, high = np.asarray(box[0]), np.asarray(box[1])
     glPushMatrix()
-    glTranslated(1.1, 1.1, 1.2)
-    glScale(.1, .1, .1)
-    glutSolidCube(1.0)
+    glMultMatrixd(selected.world.T)
+    glTranslatef(*(low + high) / 2)
+    glScalef(*(high - low))
+    state.disable(GL_LIGHTING)
+    glColor3f(*SELECTION_COLOR)
+    primitives.wireCube().draw()
+    state.enable(GL_LIGHTING)
     glPopMatrix()
 
-    glPopMatrix()
-
-
-
-def drawFloor(width, height, texture):
-    """ Draw a textured floor of the specified dimension. """
-    glBindTexture(GL_TEXTURE_2D, texture)
-    glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_REPLACE)  # try GL_DECAL/GL_REPLACE/GL_MODULATE
-    glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)  # try GL_NICEST/GL_FASTEST
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)  # try GL_CLAMP/GL_REPEAT/GL_CLAMP_TO_EDGE
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)  # try GL_LINEAR/GL_NEAREST
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-
-    sx = width / 2
-    ex = -sx
-    sz = height / 2
-    ez = -sz
+def draw_ball(material, node):
+    """Draw a ball (placed by its scene graph node) in the named material."""
+    materials.bind(material) # copper is the tan ball, pewter the white one
+    size = camera.pixelSize(node.world[:3, 3], BALL_RADIUS, win_height)
+    ballLOD.draw(size, node.name)
+
+def draw_furniture(shader=None):
+    """Draw the desk, lamp and dice (one instanced batch, see init)."""
+    materials.bind("pewter")
+    furniture.draw(shader)
+
+def draw_model(modelMesh):
+    """Draw a loaded model (placed by its scene graph node, see add_model)."""
+    materials.bind(MODEL_MATERIAL)
+    modelMesh.draw()
+
+def draw_static_objects():
+    """Draw the parts of the scene that never move: floor and board.
+    This is recorded into a display list by staticScene, not called every frame.
+    Its scene graph node (staticNode) has their bounds, so it is culled when
+    out of view and can be picked like any other node.
+    """
+    if roomSize != (PLANE_WIDTH, PLANE_HEIGHT):
+        build_room()
+
+    # Floor and board are prebuilt in build_room() (already placed)
+    drawFloor(floorMesh, checkerBoardName)
+    drawPlane(boardMesh, woodTextureName)
+
+def draw_wall(shader=None):
+    """Draw one brick wall (placed by its scene graph node)."""
+    if roomSize != (PLANE_WIDTH, PLANE_HEIGHT):
+        build_room()
+    drawPlane(wallMesh, faceTextureName)
+
+def drawFloor(floor, texture):
+    """ Draw a textured floor (a Mesh built by mesh.floor). """
+    state.bindTexture(GL_TEXTURE_2D, texture)
+    state.texEnv(GL_TEXTURE_ENV_MODE, GL_REPLACE)  # try GL_DECAL/GL_REPLACE/GL_MODULATE
+    state.hint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)  # try GL_NICEST/GL_FASTEST
+    # Wrap and filter modes are set once when the texture is created
 
     # Enable/Disable each time or OpenGL ALWAYS expects texturing!
-    glEnable(GL_TEXTURE_2D)
-
-    glBegin(GL_QUADS)
-    glTexCoord2f(0, 0)
-    glVertex3f(sx, 0, sz)
-    glTexCoord2f(0, 1)
-    glVertex3f(sx, 0, ez)
-    glTexCoord2f(1, 1)
-    glVertex3f(ex, 0, ez)
-    glTexCoord2f(1, 0)
-    glVertex3f(ex, 0, sz)
-    glEnd()
-
-    glDisable(GL_TEXTURE_2D)
-    
-def set_copper(face):
-    """Set the material properties of the given face to "copper"-esque.
-
-    Keyword arguments:
-    face -- which face (GL_FRONT, GL_BACK, or GL_FRONT_AND_BACK)
+    state.enable(GL_TEXTURE_2D)
+    floor.draw()
+    state.disable(GL_TEXTURE_2D)
+
+# The spheres drawn for lights, by (radius, stacks), each at several levels of detail
+marker_lods = {}
+
+def marker_lod(radius, stacks):
+    """The spheres drawn for a light (built once per size, in place of glutSolidSphere)"""
+    if (radius, stacks) not in marker_lods:
+        marker_lods[radius, stacks] = lod.sphere(radius, stacks=stacks)
+    return marker_lods[radius, stacks]
+
+def draw_light_marker(name, position, color, radius=0.5, stacks=None):
+    """Draw a SELF-COLORED sphere (in spot where a light is!)
+    stacks fixes the number of stacks (by default they follow the level of detail).
     """
-    ambient = [ 0.19125, 0.0735, 0.0225, 1.0 ]
-    diffuse = [ 0.7038, 0.27048, 0.0828, 1.0 ]
-    specular = [ 0.256777, 0.137622, 0.086014, 1.0 ]
-    shininess = 128.0
-    glMaterialfv(face, GL_AMBIENT, ambient);
-    glMaterialfv(face, GL_DIFFUSE, diffuse);
-    glMaterialfv(face, GL_SPECULAR, specular);
-    glMaterialf(face, GL_SHININESS, shininess);
-
-def set_silver(face):
-    """Set the material properties of the given face to "silver"-esque.
-
-    Keyword arguments:
-    face -- which face (GL_FRONT, GL_BACK, or GL_FRONT_AND_BACK)
-    """
-    
-    ambient = [ 0.19225, 0.19225, 0.19225, 1.0 ]
-    diffuse = [ 0.50754, 0.50754, 0.50754, 1.0 ]
-    specular = [ 0.508273, 0.508273, 0.508273, 1.0 ]
-    shininess = 10
-    glMaterialfv(face, GL_AMBIENT, ambient);
-    glMaterialfv(face, GL_DIFFUSE, diffuse);
-    glMaterialfv(face, GL_SPECULAR, specular);
-    glMaterialf(face, GL_SHININESS, shininess);
-
-# only used for testing silver texture
-
-def set_pewter(face):
-    """Set the material properties of the given face to "pewter"-esque.
-
-    Keyword arguments:
-    face -- which face (GL_FRONT, GL_BACK, or GL_FRONT_AND_BACK)
-    """
-    ambient = [ 0.10588, 0.058824, 0.113725, 1.0 ]
-    diffuse = [ 0.427451, 0.470588, 0.541176, 1.0 ]
-    specular = [ 0.3333, 0.3333, 0.521569, 1.0 ]
-    shininess = 9.84615
-    glMaterialfv(face, GL_AMBIENT, ambient);
-    glMaterialfv(face, GL_DIFFUSE, diffuse);
-    glMaterialfv(face, GL_SPECULAR, specular);
-    glMaterialf(face, GL_SHININESS, shininess);
-def place_blue_light():
-    """Set up the main light."""
-    glMatrixMode(GL_MODELVIEW)
-    lx = 3.0
-    ly = light_height
-    lz = 1.0
-    light_position = [ lx, ly, lz, 1.0 ]
-
-    lightb_ambient = [0.0, 0, 1, 1] #blue
-    lightb_diffuse = [0.4, 0.4, 0.6, 1] #blue
-    lightb_specular = [0.0, 0, 0.8, 1] #blue
-    light_direction = [ 1.0, -1.0, 1.0, 0.0 ]  # Light points down
-
-
-    # For Light 0 (blue), set position, ambient, diffuse, and specular values
-    glLightfv(GL_LIGHT0, GL_POSITION, light_position)
-    glLightfv(GL_LIGHT0, GL_AMBIENT, lightb_ambient)
-    glLightfv(GL_LIGHT0, GL_DIFFUSE, lightb_diffuse)
-    glLightfv(GL_LIGHT0, GL_SPECULAR, lightb_specular)
-
-
-
-    # Constant attenuation (for distance, etc.)
-    # Only works for fixed light locations!  Otherwise disabled
-    glLightf(GL_LIGHT0, GL_CONSTANT_ATTENUATION, 1.0)
-    glLightf(GL_LIGHT0, GL_LINEAR_ATTENUATION, 0.0)
-    glLightf(GL_LIGHT0, GL_QUADRATIC_ATTENUATION, 0.0)
-
-    # Create a spotlight effect (none at the moment)
-    if blue_light:
-        glLightf(GL_LIGHT0, GL_SPOT_CUTOFF, 45.0)
-        glLightf(GL_LIGHT0, GL_SPOT_EXPONENT, 0.0)
-        glLightfv(GL_LIGHT0, GL_SPOT_DIRECTION, light_direction)
-    else:
-        glLightf(GL_LIGHT0, GL_SPOT_CUTOFF,180.0)
-        glLightf(GL_LIGHT0, GL_SPOT_EXPONENT, 0.0)
-    
-    glLightModeli(GL_LIGHT_MODEL_LOCAL_VIEWER, use_lv)
-    glLightModeli(GL_LIGHT_MODEL_TWO_SIDE, GL_TRUE)
-    #  Try GL_TRUE - but then watch what happens when light is low
-    
-    glEnable(GL_LIGHT0)
-
-
-    # This part draws a SELF-COLORED sphere (in spot where light is!)
-    glPushMatrix()
-    glTranslatef(lx,ly,lz)
-    glDisable(GL_LIGHTING)
-    glColor3f(0, 0, brightness)
-    glutSolidSphere(0.5, 20, 20)
-    glEnable(GL_LIGHTING)
-    glPopMatrix()
-
-def place_red_light():
-    """Set up the main light."""
-    glMatrixMode(GL_MODELVIEW)
-    lx = 4.0
-    ly = light_height
-    lz = 2.0
-    light_position = [lx, ly, lz, 1.0]
-    lightr_ambient = [1.0, 0, 0, 1]  # red
-    lightb_diffuse = [0.4, 0.4, 0.6, 1]  # blue
-    lightb_specular = [0.0, 0, 0.8, 1]  # blue
-    light_direction = [1.0, -1.0, 1.0, 0.0]  # Light points down
-
-
-    # For Light 1 (red), set position, ambient, diffuse, and specular values
-    glLightfv(GL_LIGHT1, GL_POSITION, light_position)
-    glLightfv(GL_LIGHT1, GL_AMBIENT, lightr_ambient)
-    glLightfv(GL_LIGHT1, GL_DIFFUSE, lightb_diffuse)
-    glLightfv(GL_LIGHT1, GL_SPECULAR, lightb_specular)
-
-    # Constant attenuation (for distance, etc.)
-    # Only works for fixed light locations!  Otherwise disabled
-    glLightf(GL_LIGHT1, GL_CONSTANT_ATTENUATION, 2.0)
-    glLightf(GL_LIGHT1, GL_LINEAR_ATTENUATION, 0.0)
-    glLightf(GL_LIGHT1, GL_QUADRATIC_ATTENUATION, 0.0)
-
-    # Create a spotlight effect (none at the moment)
-    if red_light:
-        glLightf(GL_LIGHT1, GL_SPOT_CUTOFF, 45.0)
-        glLightf(GL_LIGHT1, GL_SPOT_EXPONENT, 0.0)
-        glLightfv(GL_LIGHT1, GL_SPOT_DIRECTION, light_direction)
-    else:
-        glLightf(GL_LIGHT1, GL_SPOT_CUTOFF, 180.0)
-        glLightf(GL_LIGHT1, GL_SPOT_EXPONENT, 0.0)
-
-    glLightModeli(GL_LIGHT_MODEL_LOCAL_VIEWER, use_lv)
-    glLightModeli(GL_LIGHT_MODEL_TWO_SIDE, GL_TRUE)
-    #  Try GL_TRUE - but then watch what happens when light is low
-
-    glEnable(GL_LIGHT1)
-
-    # This part draws a SELF-COLORED sphere (in spot where light is!)
     glPushMatrix()
-    glTranslatef(lx, ly, lz)
-    glDisable(GL_LIGHTING)
-    glColor3f(brightness, 0, 0)
-    glutSolidSphere(0.5, 20, 20)
-    glEnable(GL_LIGHTING)
+    glTranslatef(*position)
+    state.disable(GL_LIGHTING)
+    glColor3f(*color)
+    marker_lod(radius, stacks).draw(camera.pixelSize(position, radius, win_height), name)
+    state.enable(GL_LIGHTING)
     glPopMatrix()
 
-def place_green_light():
-    """Set up the main light."""
-    glMatrixMode(GL_MODELVIEW)
-    lx = 5.0
-    ly = light_height
-    lz = 3.0
-    light_position = [lx, ly, lz, 1.0]
-    lightg_ambient = [0, 1.0, 0, 1]  # green
-    lightb_diffuse = [0.4, 0.4, 0.6, 1]  # blue
-    lightb_specular = [0.0, 0, 0.8, 1]  # blue
-    light_direction = [1.0, -1.0, 1.0, 0.0]  # Light points down
-
-    # For Light 2 (green), set position, ambient, diffuse, and specular values
-    glLightfv(GL_LIGHT2, GL_POSITION, light_position)
-    glLightfv(GL_LIGHT2, GL_AMBIENT, lightg_ambient)
-    glLightfv(GL_LIGHT2, GL_DIFFUSE, lightb_diffuse)
-    glLightfv(GL_LIGHT2, GL_SPECULAR, lightb_specular)
-
-    glLightf(GL_LIGHT2, GL_CONSTANT_ATTENUATION, 3.0)
-    glLightf(GL_LIGHT2, GL_LINEAR_ATTENUATION, 0.0)
-    glLightf(GL_LIGHT2, GL_QUADRATIC_ATTENUATION, 0.0)
-
-    # Create a spotlight effect (none at the moment)
-    if green_light:
-        glLightf(GL_LIGHT2, GL_SPOT_CUTOFF, 45.0)
-        glLightf(GL_LIGHT2, GL_SPOT_EXPONENT, 0.0)
-        glLightfv(GL_LIGHT2, GL_SPOT_DIRECTION, light_direction)
-    else:
-        glLightf(GL_LIGHT2, GL_SPOT_CUTOFF, 180.0)
-        glLightf(GL_LIGHT2, GL_SPOT_EXPONENT, 0.0)
-
-    glLightModeli(GL_LIGHT_MODEL_LOCAL_VIEWER, use_lv)
-    glLightModeli(GL_LIGHT_MODEL_TWO_SIDE, GL_TRUE)
-    #  Try GL_TRUE - but then watch what happens when light is low
+def update_lights():
+    """Copy the light switches, light height and brightness into the scene's lights."""
+    for light, spot_on in ((blueLight, blue_light), (redLight, red_light), (greenLight, green_light)):
+        light.enabled = is_light_on
+        light.position[1] = light_height
+        # Create a spotlight effect... or not.
+        light.cutoff = 45.0 if spot_on else 180.0
 
+    lampLight.enabled = lamp_light
 
-    glEnable(GL_LIGHT2)
+    headLight.enabled = headlamp_is_on
+    headLight.ambient[:3] = brightness
+    headLight.diffuse[:3] = brightness
+    headLight.specular[:3] = brightness
 
-    # This part draws a SELF-COLORED sphere (in spot where light is!)
-    glPushMatrix()
-    glTranslatef(lx, ly, lz)
-    glDisable(GL_LIGHTING)
-    glColor3f(0, brightness, 0)
-    glutSolidSphere(0.5, 20, 20)
-    glEnable(GL_LIGHTING)
-    glPopMatrix()
-
-def place_lamp_light():
+def place_lights():
+    """Upload the lights (only what changed) and draw their markers."""
     glMatrixMode(GL_MODELVIEW)
-    lx = -0.7
-    ly = 2.5
-    lz = 0.8
-    light_position = [ lx, ly, lz, 1.0]
-    lightb_ambient = [1, 1, 1, 1]  # blue
-
-    lightb_diffuse = [1, 1, 1, 1]  # blue
-    lightb_specular = [1, 1, 1, 1]  # blue
-    light_direction = [0.0, -1.0, 0.0, 1.0]  # Light points down
-
-
-    # For Light 0 (blue), set position, ambient, diffuse, and specular values
-    glLightfv(GL_LIGHT3, GL_POSITION, light_position)
-    glLightfv(GL_LIGHT3, GL_AMBIENT, lightb_ambient)
-    glLightfv(GL_LIGHT3, GL_DIFFUSE, lightb_diffuse)
-    glLightfv(GL_LIGHT3, GL_SPECULAR, lightb_specular)
-
-
-
-    # Constant attenuation (for distance, etc.)
-    # Only works for fixed light locations!  Otherwise disabled
-    glLightf(GL_LIGHT3, GL_CONSTANT_ATTENUATION, 4.0)
-    glLightf(GL_LIGHT3, GL_LINEAR_ATTENUATION, 0.0)
-    glLightf(GL_LIGHT3, GL_QUADRATIC_ATTENUATION, 0.0)
-
-    # Create a spotlight effect (none at the moment)
-    if lamp_light:
-        glLightf(GL_LIGHT3, GL_SPOT_CUTOFF, 45.0)
-        glLightf(GL_LIGHT3, GL_SPOT_EXPONENT, 0.0)
-        glLightfv(GL_LIGHT3, GL_SPOT_DIRECTION, light_direction)
-    else:
-        glLightf(GL_LIGHT3, GL_SPOT_CUTOFF,180.0)
-        glLightf(GL_LIGHT3, GL_SPOT_EXPONENT, 0.0)
-    
-    glLightModeli(GL_LIGHT_MODEL_LOCAL_VIEWER, use_lv)
-    glLightModeli(GL_LIGHT_MODEL_TWO_SIDE, GL_TRUE)
-    #  Try GL_TRUE - but then watch what happens when light is low
-    
-    glEnable(GL_LIGHT3)
+    with profiler.section("upload"):
+        update_lights()
+        lights.upload(camera.viewKey())
 
-
-    # This part draws a SELF-COLORED sphere (in spot where light is!)
-    glPushMatrix()
-    glTranslatef(lx,ly,lz)
-    glDisable(GL_LIGHTING)
-    glColor3f(brightness, brightness, brightness)
-    glutSolidSphere(0.17, 20, 2)
-    glEnable(GL_LIGHTING)
-    glPopMatrix()
-    
-def place_headlamp_light():
-    """Set up the main light."""
-
-    lx = 1.0
-    ly = light_height
-    lz = 2.0
-    #light_position = [lx, ly, lz, 1.0]
-    light_position =  [0.0, 0.0, 0.0, 1]
-    light_ambient = [ 1*brightness, 1*brightness, 1*brightness, 1.0 ]
-    light_diffuse = [ 1*brightness, 1*brightness, 1*brightness, 1.0 ]
-    light_specular = [ 1*brightness, 1*brightness, 1*brightness, 1.0 ]
-    light_direction = [1.0, -1.0, 1.0, 0.0]  # Light points down
-    # glViewport(0, 0, win_width, win_height)
-    # glMatrixMode(GL_PROJECTION)
-    # glLoadIdentity()
-    # gluPerspective(40.0, float(win_width) / float(win_height), 0.01, 100.0)
-    #
-    # glMatrixMode(GL_MODELVIEW)
-    # glLoadIdentity()
-   # glPushMatrix()
-    glLightfv(GL_LIGHT4, GL_POSITION, light_position)
-
-
-
-    #glLightfv(GL_LIGHT4, GL_POSITION, (GLfloat * 4)(0.0, 0.0, 0.0, 1))
-    glLightfv(GL_LIGHT4, GL_AMBIENT, light_ambient)
-    glLightfv(GL_LIGHT4, GL_DIFFUSE, light_diffuse)
-    glLightfv(GL_LIGHT4, GL_SPECULAR, light_specular)
-
-    # Constant attenuation (for distance, etc.)
-    # Only works for fixed light locations!  Otherwise disabled
-    # glLightf(GL_LIGHT1, GL_CONSTANT_ATTENUATION, 2.0)
-    # glLightf(GL_LIGHT1, GL_LINEAR_ATTENUATION, 0.0)
-    # glLightf(GL_LIGHT1, GL_QUADRATIC_ATTENUATION, 0.0)
-
-    glLightf(GL_LIGHT4, GL_CONSTANT_ATTENUATION, 3.0)
-    glLightf(GL_LIGHT4, GL_LINEAR_ATTENUATION, 0.0)
-    glLightf(GL_LIGHT4, GL_QUADRATIC_ATTENUATION, 0.0)
-
-    # Create a spotlight effect (none at the moment)
-    if headlamp_is_on:
-        glLightf(GL_LIGHT4, GL_SPOT_CUTOFF, 30.0)
-        glLightf(GL_LIGHT4, GL_SPOT_EXPONENT, 0.0)
-        glLightfv(GL_LIGHT4, GL_SPOT_DIRECTION, light_direction)
-    else:
-        glLightf(GL_LIGHT4, GL_SPOT_CUTOFF, 180.0)
-        glLightf(GL_LIGHT4, GL_SPOT_EXPONENT, 0.0)
-
-    glLightModeli(GL_LIGHT_MODEL_LOCAL_VIEWER, use_lv)
-    glLightModeli(GL_LIGHT_MODEL_TWO_SIDE, GL_TRUE)
+    state.lightModel(GL_LIGHT_MODEL_LOCAL_VIEWER, use_lv)
+    state.lightModel(GL_LIGHT_MODEL_TWO_SIDE, GL_TRUE)
     #  Try GL_TRUE - but then watch what happens when light is low
 
-    glEnable(GL_LIGHT4)
-
-    # This part draws a SELF-COLORED sphere (in spot where light is!)
-    glPushMatrix()
-    glTranslatef(lx, ly, lz)
-    glDisable(GL_LIGHTING)
-    glColor3f(brightness, brightness, brightness)
-    glutSolidSphere(0.5, 20, 20)
-    glEnable(GL_LIGHTING)
-    glPopMatrix()
-    
-def set_copper(face):
-    """Set the material properties of the given face to "copper"-esque.
-
-    Keyword arguments:
-    face -- which face (GL_FRONT, GL_BACK, or GL_FRONT_AND_BACK)
-    """
-    ambient = [ 0.19125, 0.0735, 0.0225, 1.0 ]
-    diffuse = [ 0.7038, 0.27048, 0.0828, 1.0 ]
-    specular = [ 0.256777, 0.137622, 0.086014, 1.0 ]
-    shininess = 128.0
-    glMaterialfv(face, GL_AMBIENT, ambient);
-    glMaterialfv(face, GL_DIFFUSE, diffuse);
-    glMaterialfv(face, GL_SPECULAR, specular);
-    glMaterialf(face, GL_SHININESS, shininess);
-    
-def set_pewter(face):
-    """Set the material properties of the given face to "pewter"-esque.
-
-    Keyword arguments:
-    face -- which face (GL_FRONT, GL_BACK, or GL_FRONT_AND_BACK)
-    """
-    ambient = [ 0.10588, 0.058824, 0.113725, 1.0 ]
-    diffuse = [ 0.427451, 0.470588, 0.541176, 1.0 ]
-    specular = [ 0.3333, 0.3333, 0.521569, 1.0 ]
-    shininess = 9.84615
-    glMaterialfv(face, GL_AMBIENT, ambient);
-    glMaterialfv(face, GL_DIFFUSE, diffuse);
-    glMaterialfv(face, GL_SPECULAR, specular);
-    glMaterialf(face, GL_SHININESS, shininess);
+    with profiler.section("markers"):
+        # (name, position, color, radius, stacks) of each marker to show
+        markers = []
+        if is_light_on:
+            markers.append(("blue", (3.0, light_height, 1.0), (0, 0, brightness), 0.5, None))
+            markers.append(("red", (4.0, light_height, 2.0), (brightness, 0, 0), 0.5, None))
+            markers.append(("green", (5.0, light_height, 3.0), (0, brightness, 0), 0.5, None))
+        if is_light_on or lamp_light:
+            markers.append(("lamp", (-0.7, 2.5, 0.8), (brightness, brightness, brightness), 0.17, 2))
+        if headlamp_is_on:
+            markers.append(("headlamp", (1.0, light_height, 2.0), (brightness, brightness, brightness), 0.5, None))
+        if markers:
+            # Skip the ones out of view, all tested at once
+            inView = view_frustum.testSpheres([m[1] for m in markers], [m[3] for m in markers])
+            for marker, shown in zip(markers, inView):
+                if shown:
+                    draw_light_marker(*marker)
+
+
+def stop_profiling():
+    """Stop timing frames, print the timings and save them (see PROFILE_NAME)."""
+    profiler.stop()
+    print(profiler.report())
+    print("Frame timings saved to %s and %s" % profiler.export(PROFILE_NAME))
 
 def generateCheckerBoardTexture():
     """
@@ -866,40 +794,9 @@ def generateCheckerBoardTexture():
     * Why?  Simple to do...
     """
     global checkerBoardName
-    texture = [0] * (NROWS * NCOLS * 4)
-    for i in range(NROWS):
-        for j in range(NCOLS):
-            c = 135 if ((i & 8) ^ (j & 8)) else 255
-            idx = (i * NCOLS + j) * 4
-            texture[idx] = c  # Red
-            texture[idx + 1] = c  # Green
-            texture[idx + 2] = c  # Blue
-            texture[idx + 3] = 150  # Alpha (transparency)
-
-    # Generate a "name" for the texture.
-    # Bind this texture as current active texture
-    # and sets the parameters for this texture.
-    checkerBoardName = glGenTextures(1)
-    glBindTexture(GL_TEXTURE_2D, checkerBoardName)
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, NCOLS, NROWS, 0, GL_RGBA,
-                 GL_UNSIGNED_BYTE, texture)
-
-def loadImageTexture(filename):
-    # Load the image from the file and return as a texture
-    im = Image.open(filename)
-    print("Concrete dimensions: {0}".format(im.size))  # If you want to see the image's original dimensions
-    # dim = 128
-    # size = (0,0,dim,dim)
-    # texture = im.crop(size).tobytes("raw")   # The cropped texture
-    texture = im.tobytes("raw")  # The cropped texture
-    dimX = im.size[0]
-    dimY = im.size[1]
-
-    returnTextureName = glGenTextures(1)
-    glBindTexture(GL_TEXTURE_2D, returnTextureName)
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, dimX, dimY, 0, GL_RGB,
-                 GL_UNSIGNED_BYTE, texture)
-    return returnTextureName
+    # Built as a NumPy array (see proctex) and handed to GL without a copy
+    texture = proctex.checkerboard(NCOLS, NROWS, 8)
+    checkerBoardName = textures.uploadTexture([texture], wrap=GL_CLAMP_TO_EDGE, label="checkerboard")
 
 
 if __name__ == '__main__': main()
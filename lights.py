@@ -0,0 +1,189 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# lights.py module
+# Description:
+#   Data-driven OpenGL lights.  A Light keeps all of its parameters
+#   in one preallocated float32 block; a LightManager maps the
+#   enabled lights onto the available GL_LIGHTi slots and, each
+#   frame, uploads only the parameters that changed since the last
+#   upload to that slot.
+#
+#   GL stores light positions and spot directions in eye coordinates
+#   (transformed by the modelview matrix at upload time), so those
+#   two are re-sent whenever the view changes.
+# ==============================
+import numpy as np
+from OpenGL.GL import *
+from glstate import state
+
+# Layout of a light's parameter block: (GL parameter, first index, size)
+FIELDS = [
+    (GL_POSITION, 0, 4),
+    (GL_AMBIENT, 4, 4),
+    (GL_DIFFUSE, 8, 4),
+    (GL_SPECULAR, 12, 4),
+    (GL_SPOT_DIRECTION, 16, 3),
+    (GL_SPOT_CUTOFF, 19, 1),
+    (GL_SPOT_EXPONENT, 20, 1),
+    (GL_CONSTANT_ATTENUATION, 21, 1),
+    (GL_LINEAR_ATTENUATION, 22, 1),
+    (GL_QUADRATIC_ATTENUATION, 23, 1),
+]
+BLOCK_SIZE = 24
+FIELD_STARTS = np.array([start for _, start, _ in FIELDS])
+VIEW_DEPENDENT = np.array([pname in (GL_POSITION, GL_SPOT_DIRECTION) for pname, _, _ in FIELDS])
+
+
+class Light:
+    """A point light or spotlight, stored as one float32 parameter block"""
+
+    def __init__(self, name, position=(0, 0, 1, 0), ambient=(0, 0, 0, 1), diffuse=(1, 1, 1, 1),
+                 specular=(1, 1, 1, 1), direction=(0, 0, -1), cutoff=180.0, exponent=0.0,
+                 attenuation=(1.0, 0.0, 0.0), enabled=True):
+        """A constructor for Light class.  A cutoff of 180 means no spotlight."""
+        self.name = name
+        self.params = np.zeros(BLOCK_SIZE, dtype=np.float32)
+        # Views into params: writing through them is all it takes to change the light
+        self.position = self.params[0:4]
+        self.ambient = self.params[4:8]
+        self.diffuse = self.params[8:12]
+        self.specular = self.params[12:16]
+        self.direction = self.params[16:19]
+        self.attenuation = self.params[21:24]
+        self.position[:] = position
+        self.ambient[:] = ambient
+        self.diffuse[:] = diffuse
+        self.specular[:] = specular
+        self.direction[:] = direction[:3]
+        self.cutoff = cutoff
+        self.exponent = exponent
+        self.attenuation[:] = attenuation
+        self.enabled = enabled
+
+    def __str__(self):
+        """Basic string representation of this Light"""
+        return "Light %s at (%g,%g,%g) %s" % (self.name, self.position[0], self.position[1],
+                                              self.position[2], "on" if self.enabled else "off")
+
+    @property
+    def cutoff(self):
+        return float(self.params[19])
+
+    @cutoff.setter
+    def cutoff(self, value):
+        self.params[19] = value
+
+    @property
+    def exponent(self):
+        return float(self.params[20])
+
+    @exponent.setter
+    def exponent(self, value):
+        self.params[20] = value
+
+    def isSpot(self):
+        return self.cutoff < 180.0
+
+
+class LightManager:
+    """Maps Lights onto GL light slots and uploads only what changed"""
+
+    def __init__(self, maxSlots=None):
+        """A constructor for LightManager class.
+           maxSlots defaults to GL_MAX_LIGHTS (queried on the first upload).
+        """
+        self.lights = []
+        self.maxSlots = maxSlots
+        self.slotOwner = []      # slot -> Light using it (or None)
+        self.uploaded = None     # (slots, BLOCK_SIZE) copy of what each slot holds
+        self.valid = None        # slot -> True once uploaded is trustworthy
+        self.viewKey = None
+        self.uploads = 0
+        self.lastFrameUploads = 0
+        self.dropped = 0         # enabled lights that found no free slot
+
+    def __str__(self):
+        """Basic string representation of this LightManager"""
+        return "LightManager: %d lights, %d GL parameter uploads last frame" % (
+            len(self.lights), self.lastFrameUploads)
+
+    def add(self, light):
+        self.lights.append(light)
+        return light
+
+    def _allocate(self):
+        if self.maxSlots is None:
+            self.maxSlots = int(glGetIntegerv(GL_MAX_LIGHTS))
+        self.slotOwner = [None] * self.maxSlots
+        self.uploaded = np.zeros((self.maxSlots, BLOCK_SIZE), dtype=np.float32)
+        self.valid = [False] * self.maxSlots
+        self._changed = np.empty(BLOCK_SIZE, dtype=bool)
+
+    def slotOf(self, light):
+        """The GL light slot index a light is using (None if not placed)"""
+        return self.slotOwner.index(light) if light in self.slotOwner else None
+
+    def assignSlots(self):
+        """Keep enabled lights in their slots, free the slots of disabled
+           ones and give newly enabled lights the free slots in order."""
+        for slot, owner in enumerate(self.slotOwner):
+            if owner is not None and not owner.enabled:
+                self.slotOwner[slot] = None
+                state.disable(GL_LIGHT0 + slot)
+        self.dropped = 0
+        for light in self.lights:
+            if light.enabled and light not in self.slotOwner:
+                if None not in self.slotOwner:
+                    self.dropped += 1
+                    continue
+                slot = self.slotOwner.index(None)
+                self.slotOwner[slot] = light
+                self.valid[slot] = False   # it held some other light's values
+
+    def upload(self, viewKey=None):
+        """Send changed light parameters to GL with the current modelview.
+           viewKey identifies the view (e.g. the camera pose); when it
+           differs from the last upload, positions and directions are re-sent.
+        """
+        if self.uploaded is None:
+            self._allocate()
+        viewChanged = viewKey != self.viewKey or viewKey is None
+        self.viewKey = viewKey
+        self.assignSlots()
+
+        for slot, light in enumerate(self.slotOwner):
+            if light is None:
+                continue
+            glLight = GL_LIGHT0 + slot
+            if self.valid[slot]:
+                # One vectorized compare, then one flag per field
+                np.not_equal(light.params, self.uploaded[slot], out=self._changed)
+                changed = np.logical_or.reduceat(self._changed, FIELD_STARTS)
+                if viewChanged:
+                    changed |= VIEW_DEPENDENT
+            else:
+                changed = np.ones(len(FIELDS), dtype=bool)
+            for (pname, start, size), dirty in zip(FIELDS, changed):
+                if not dirty:
+                    continue
+                if size == 1:
+                    glLightf(glLight, pname, float(light.params[start]))
+                else:
+                    glLightfv(glLight, pname, light.params[start:start + size])
+                self.uploads += 1
+            self.uploaded[slot] = light.params
+            self.valid[slot] = True
+            state.enable(glLight)
+
+    def invalidate(self):
+        """Re-send everything on the next upload (GL state was changed elsewhere)"""
+        if self.valid is not None:
+            self.valid = [False] * self.maxSlots
+        self.viewKey = None
+
+    def endFrame(self):
+        """Finish counting one frame, returning the number of parameter uploads"""
+        self.lastFrameUploads = self.uploads
+        self.uploads = 0
+        return self.lastFrameUploads
@@ -0,0 +1,106 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# lod.py module
+# Description:
+#   Level of detail for round shapes.  A sphere 2 pixels across needs
+#   no more triangles than an octahedron, but one filling half the
+#   window needs many.  A LevelOfDetail holds meshes of one shape at
+#   several tessellations, built once up front, and picks one for
+#   each draw from how many pixels the shape covers on screen (see
+#   Camera.pixelSize).
+#
+#   The levels of the sphere below are chosen so that the
+#   silhouette, a polygon standing in for a circle, never strays
+#   more than about a pixel from the true outline.  Each object
+#   remembers its level and only changes it once its size is well
+#   past a threshold (hysteresis), so objects hovering near one do not
+#   flicker between levels.
+# ==============================
+import math
+import primitives
+
+# How far (as a fraction) past a threshold a size must go to change level
+HYSTERESIS = 0.15
+
+# Most pixels the silhouette may stray from the true outline
+MAX_ERROR = 1.0
+
+# Slices around the axis at each level, finest first (the finest matches
+# the 20 slices the scene used to draw everything with)
+SLICES = (20, 14, 10, 6)
+
+
+def silhouetteSize(slices, maxError=MAX_ERROR):
+    """The diameter in pixels above which a circle drawn as a polygon with
+       this many sides strays more than maxError pixels from the true one
+    """
+    return 2 * maxError / (1 - math.cos(math.pi / slices))
+
+
+class LevelOfDetail:
+    """Meshes of one shape at several tessellations, picked by size on screen"""
+
+    def __init__(self, meshes, sizes, hysteresis=HYSTERESIS):
+        """A constructor for LevelOfDetail class.
+           meshes are the levels, finest first; sizes[i] is the smallest size
+           in pixels level i is used for (one fewer than meshes: the last
+           level takes everything smaller).
+        """
+        self.meshes = list(meshes)
+        self.sizes = list(sizes)
+        self.hysteresis = hysteresis
+        self.levels = {}                        # level each object last drew with
+        self.frame = [0] * len(self.meshes)     # draws per level this frame
+        self.lastFrame = list(self.frame)
+
+    def __str__(self):
+        """Basic string representation of this LevelOfDetail"""
+        return "LevelOfDetail: last frame drew %s (%d triangles)" % (
+            ", ".join("%d at level %d" % (count, level) for level, count in enumerate(self.lastFrame) if count)
+            or "nothing", self.triangles())
+
+    def triangles(self):
+        """How many triangles the last frame drew with this shape"""
+        return sum(count * len(mesh.indices) // 3 for count, mesh in zip(self.lastFrame, self.meshes))
+
+    def level(self, size, key=None):
+        """The level to draw an object size pixels across with.  key names the
+           object, so its level can be kept until the size is well past a
+           threshold (None: no memory, no hysteresis).
+        """
+        level = self.levels.get(key)
+        if level is None:
+            level = sum(1 for threshold in self.sizes if size < threshold)
+        else:
+            while level > 0 and size >= self.sizes[level - 1] * (1 + self.hysteresis):
+                level -= 1
+            while level < len(self.sizes) and size < self.sizes[level] * (1 - self.hysteresis):
+                level += 1
+        if key is not None:
+            self.levels[key] = level
+        return level
+
+    def mesh(self, size, key=None):
+        """The mesh to draw an object size pixels across with (see level)"""
+        level = self.level(size, key)
+        self.frame[level] += 1
+        return self.meshes[level]
+
+    def draw(self, size, key=None):
+        """Draw the shape at the level that suits size pixels across"""
+        self.mesh(size, key).draw()
+
+    def endFrame(self):
+        """Call once per frame: keeps its draw counts for __str__"""
+        self.lastFrame = self.frame
+        self.frame = [0] * len(self.meshes)
+
+
+def sphere(radius=1.0, slices=SLICES, stacks=None, maxError=MAX_ERROR):
+    """A sphere (see primitives.sphere) with a level for each number of slices.
+       Stacks follow slices unless a fixed number is given.
+    """
+    return LevelOfDetail([primitives.sphere(radius, n, stacks or n) for n in slices],
+                         [silhouetteSize(n, maxError) for n in slices[1:]])
+
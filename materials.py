@@ -0,0 +1,119 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# materials.py module
+# Description:
+#   Named OpenGL materials.  Each Material is defined once with its
+#   parameters in one preallocated float32 block; a MaterialRegistry
+#   holds them by name, loads them from a JSON data file and binds
+#   them through the GL state cache, which skips the glMaterial calls
+#   entirely when the same material is already bound.
+#
+#   Materials are not meant to change once defined: the state cache
+#   recognizes a bound material by the Material object itself.
+# ==============================
+import json
+import numpy as np
+from OpenGL.GL import *
+from glstate import state
+
+# Layout of a material's parameter block: (GL parameter, first index, size)
+FIELDS = [
+    (GL_AMBIENT, 0, 4),
+    (GL_DIFFUSE, 4, 4),
+    (GL_SPECULAR, 8, 4),
+    (GL_EMISSION, 12, 4),
+    (GL_SHININESS, 16, 1),
+]
+BLOCK_SIZE = 17
+
+
+class Material:
+    """A fixed-function material, stored as one float32 parameter block"""
+
+    def __init__(self, name, ambient=(0.2, 0.2, 0.2, 1.0), diffuse=(0.8, 0.8, 0.8, 1.0),
+                 specular=(0, 0, 0, 1), shininess=0.0, emission=(0, 0, 0, 1)):
+        """A constructor for Material class.  The defaults are OpenGL's."""
+        self.name = name
+        self.params = np.zeros(BLOCK_SIZE, dtype=np.float32)
+        self.params[0:4] = ambient
+        self.params[4:8] = diffuse
+        self.params[8:12] = specular
+        self.params[12:16] = emission
+        self.params[16] = shininess
+        self.params.flags.writeable = False
+        # (GL parameter, slice of params for glMaterialfv, same values as a tuple
+        # for the state cache to compare), made once instead of on every bind
+        self.fields = [(pname, self.params[start:start + size],
+                        tuple(float(v) for v in self.params[start:start + size]))
+                       for pname, start, size in FIELDS]
+
+    def __str__(self):
+        """Basic string representation of this Material"""
+        return "Material %s (shininess %g)" % (self.name, self.shininess)
+
+    @property
+    def ambient(self):
+        return self.params[0:4]
+
+    @property
+    def diffuse(self):
+        return self.params[4:8]
+
+    @property
+    def specular(self):
+        return self.params[8:12]
+
+    @property
+    def emission(self):
+        return self.params[12:16]
+
+    @property
+    def shininess(self):
+        return float(self.params[16])
+
+
+class MaterialRegistry:
+    """Materials by name"""
+
+    def __init__(self, filename=None):
+        """A constructor for MaterialRegistry class.
+           filename (optional) is a JSON data file to load (see load).
+        """
+        self.materials = {}
+        if filename is not None:
+            self.load(filename)
+
+    def __str__(self):
+        """Basic string representation of this MaterialRegistry"""
+        return "MaterialRegistry (%s)" % ", ".join(self.materials)
+
+    def __contains__(self, name):
+        return name in self.materials
+
+    def __getitem__(self, name):
+        return self.materials[name]
+
+    def define(self, name, **params):
+        """Create (or replace) a material; params are Material's keywords"""
+        material = Material(name, **params)
+        self.materials[name] = material
+        return material
+
+    def load(self, filename):
+        """Define every material in a JSON file of the form
+           {"copper": {"ambient": [r, g, b, a], "diffuse": ..., "shininess": 128}, ...}
+           Returns the names defined.
+        """
+        with open(filename) as f:
+            definitions = json.load(f)
+        for name, params in definitions.items():
+            try:
+                self.define(name, **params)
+            except (TypeError, ValueError) as e:
+                raise ValueError("Bad material {0} in {1}: {2}".format(name, filename, e))
+        return list(definitions)
+
+    def bind(self, name, face=GL_FRONT_AND_BACK):
+        """Make a material current for the given face(s); free if it already is"""
+        state.useMaterial(face, self.materials[name])
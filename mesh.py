@@ -0,0 +1,192 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# mesh.py module
+# Description:
+#   Retained-mode geometry.  A Mesh is built once on the CPU as
+#   NumPy arrays, uploaded into vertex buffer objects the first time
+#   it is drawn, and from then on drawn with a single
+#   glDrawElements call instead of one glTexCoord/glVertex call
+#   per vertex per frame.
+# ==============================
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+from picking import rayTriangles
+
+# Interleaved layout: 3 position, 3 normal, 2 texture coordinate floats
+FLOATS_PER_VERTEX = 8
+STRIDE = FLOATS_PER_VERTEX * 4
+NORMAL_OFFSET = ctypes.c_void_p(3 * 4)
+TEXCOORD_OFFSET = ctypes.c_void_p(6 * 4)
+
+
+class Mesh:
+    """Indexed triangle geometry stored in a vertex buffer object"""
+
+    def __init__(self, vertices, normals, texcoords, indices, mode=GL_TRIANGLES):
+        """A constructor for Mesh class from per-vertex arrays.
+           vertices and normals are (N,3), texcoords is (N,2),
+           indices is a flat array of triangle corners (or, when mode is
+           GL_LINES, of line ends).
+        """
+        vertices = np.asarray(vertices, dtype=np.float32)
+        self.data = np.empty((len(vertices), FLOATS_PER_VERTEX), dtype=np.float32)
+        self.data[:, 0:3] = vertices
+        self.data[:, 3:6] = normals
+        self.data[:, 6:8] = texcoords
+        self.indices = np.ascontiguousarray(indices, dtype=np.uint32).ravel()
+        self.mode = mode
+        self.box = None          # cached bounds()
+        self.vbo = None
+        self.ibo = None
+
+    def __str__(self):
+        """Basic string representation of this Mesh"""
+        if self.mode == GL_LINES:
+            return "Mesh with %d vertices, %d lines" % (len(self.data), len(self.indices) // 2)
+        return "Mesh with %d vertices, %d triangles" % (len(self.data), len(self.indices) // 3)
+
+    @property
+    def vertices(self):
+        return self.data[:, 0:3]
+
+    @property
+    def normals(self):
+        return self.data[:, 3:6]
+
+    @property
+    def texcoords(self):
+        return self.data[:, 6:8]
+
+    def bounds(self):
+        """(min corner, max corner) of the vertices: the mesh's bounding box"""
+        if self.box is None:
+            self.box = self.vertices.min(axis=0), self.vertices.max(axis=0)
+        return self.box
+
+    def boundingSphere(self):
+        """(center, radius) of a sphere around the vertices (centered on the box)"""
+        low, high = self.bounds()
+        center = (low + high) / 2
+        return center, float(np.linalg.norm(self.vertices - center, axis=1).max())
+
+    def triangles(self):
+        """The corners of every triangle, as a (T,3,3) array (none for lines)"""
+        if self.mode != GL_TRIANGLES:
+            return np.zeros((0, 3, 3), dtype=np.float32)
+        return self.vertices[self.indices].reshape(-1, 3, 3)
+
+    def intersect(self, origin, direction):
+        """The nearest triangle the ray from origin along direction hits:
+           (distance along the ray, triangle index), or (inf, None)
+        """
+        distances = rayTriangles(origin, direction, self.triangles())
+        if len(distances) == 0 or distances.min() == np.inf:
+            return np.inf, None
+        nearest = int(np.argmin(distances))
+        return float(distances[nearest]), nearest
+
+    def transformed(self, matrix):
+        """Return a copy of this mesh with the 4x4 matrix applied to it"""
+        matrix = np.asarray(matrix, dtype=np.float64)
+        linear = matrix[:3, :3]
+        vertices = self.vertices @ linear.T + matrix[:3, 3]
+        # Normals use the inverse transpose so non-uniform scales stay correct
+        normals = self.normals @ np.linalg.inv(linear)
+        normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+        return Mesh(vertices, normals, self.texcoords, self.indices, self.mode)
+
+    @staticmethod
+    def merge(meshes):
+        """Combine several meshes into one so they share a single draw call"""
+        offsets = np.cumsum([0] + [len(m.data) for m in meshes[:-1]])
+        return Mesh.fromArrays(np.concatenate([m.data for m in meshes]),
+                               np.concatenate([m.indices + offset for m, offset in zip(meshes, offsets)]).astype(np.uint32),
+                               meshes[0].mode)
+
+    @staticmethod
+    def fromArrays(data, indices, mode=GL_TRIANGLES):
+        """A mesh over already interleaved (N,8) float32 vertex data and uint32
+           indices, used as they are (e.g. memory-mapped, see models.py)
+        """
+        mesh = Mesh.__new__(Mesh)
+        mesh.data = data
+        mesh.indices = indices
+        mesh.mode = mode
+        mesh.box = None
+        mesh.vbo = None
+        mesh.ibo = None
+        return mesh
+
+    def upload(self):
+        """Copy the vertex and index arrays into GPU buffers"""
+        self.vbo, self.ibo = glGenBuffers(2)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.data.nbytes, self.data, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def delete(self):
+        """Release the GPU buffers (they are re-created on the next draw)"""
+        if self.vbo is not None:
+            glDeleteBuffers(2, [self.vbo, self.ibo])
+            self.vbo = None
+            self.ibo = None
+
+    def bind(self, texcoords=True):
+        """Point the vertex arrays at this mesh's buffers (see draw)"""
+        if self.vbo is None:
+            self.upload()
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glVertexPointer(3, GL_FLOAT, STRIDE, None)
+        glNormalPointer(GL_FLOAT, STRIDE, NORMAL_OFFSET)
+        if texcoords:
+            glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+            glTexCoordPointer(2, GL_FLOAT, STRIDE, TEXCOORD_OFFSET)
+
+    def unbind(self):
+        """Undo bind()"""
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self):
+        """Draw the whole mesh with the current material and texture"""
+        self.bind()
+        glDrawElements(self.mode, len(self.indices), GL_UNSIGNED_INT, None)
+        self.unbind()
+
+def quad(corners, normal, texcoords):
+    """A single quad (two triangles) from four corners in counter-clockwise order"""
+    return Mesh(corners, [normal] * 4, texcoords, [0, 1, 2, 0, 2, 3])
+
+
+def plane(width, height, repeat=2):
+    """An upright plane standing on the x-axis in the z=0 plane, facing +z.
+       Matches the quad that drawPlane used to issue in immediate mode.
+    """
+    ex = width / 2
+    sx = -ex
+    return quad([(sx, 0, 0), (ex, 0, 0), (ex, height, 0), (sx, height, 0)],
+                (0, 0, 1),
+                [(0, 0), (repeat, 0), (repeat, repeat), (0, repeat)])
+
+
+def floor(width, height):
+    """A flat plane in the y=0 plane, centered on the origin, facing +y"""
+    sx = width / 2
+    ex = -sx
+    sz = height / 2
+    ez = -sz
+    return quad([(sx, 0, sz), (sx, 0, ez), (ex, 0, ez), (ex, 0, sz)],
+                (0, 1, 0),
+                [(0, 0), (0, 1), (1, 1), (1, 0)])
+
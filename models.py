@@ -0,0 +1,536 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# models.py module
+# Description:
+#   Loads OBJ and PLY models into Meshes.  Files are read a chunk at a
+#   time and each chunk is parsed by NumPy as a whole: lines are told
+#   apart by their first bytes and all the numbers on one kind of line
+#   are converted in a single call, so no Python object is made per
+#   vertex or face.
+#
+#   Faces are split into triangle fans as they are read, and corners
+#   sharing a position, texture coordinate and normal become one
+#   vertex (see MeshBuilder).  Only each chunk's distinct corners and
+#   its triangles are kept, so importing a model of hundreds of
+#   thousands of triangles needs little more memory than the arrays
+#   it produces.  Those arrays are kept in an AssetCache (.meshcache/
+#   next to the model); later loads memory-map them straight into a
+#   Mesh without parsing anything.
+# ==============================
+import os
+import numpy as np
+from assetcache import AssetCache
+from mesh import Mesh, FLOATS_PER_VERTEX
+
+cache = AssetCache(".meshcache")
+
+# Bytes read and parsed at a time
+CHUNK_SIZE = 1 << 20
+
+NEWLINE = ord("\n")
+SPACE = ord(" ")     # this and anything below it separates words
+SLASH = ord("/")
+COMMENT = ord("#")
+UTF8_BOM = b"\xef\xbb\xbf"
+
+# What each OBJ line holds, told by its keyword
+OBJ_OTHER, OBJ_POSITION, OBJ_TEXCOORD, OBJ_NORMAL, OBJ_FACE = range(5)
+
+# Corner formats of OBJ faces (v, v/vt, v//vn, v/vt/vn): the attributes
+# each gives (0 position, 1 texcoord, 2 normal) and its slashes
+OBJ_CORNERS = {(0, False): (0,), (1, False): (0, 1), (2, True): (0, 2), (2, False): (0, 1, 2)}
+
+# PLY property types
+PLY_TYPES = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4", "double": "f8", "float64": "f8",
+}
+PLY_ORDERS = {"ascii": None, "binary_little_endian": "<", "binary_big_endian": ">"}
+
+# The PLY vertex properties read
+PLY_POSITION = ("x", "y", "z")
+PLY_NORMAL = ("nx", "ny", "nz")
+PLY_TEXCOORDS = (("u", "v"), ("s", "t"), ("texture_u", "texture_v"))
+
+
+def loadMesh(filename):
+    """A Mesh of an OBJ or PLY file.  The first load parses the file and caches
+       the result; after that the mesh is memory-mapped from the cache.
+    """
+    reader = READERS.get(os.path.splitext(filename)[1].lower())
+    if reader is None:
+        raise ValueError("Can only load .obj and .ply models, not {0}".format(filename))
+    key = cache.key(filename)
+    arrays = cache.load(filename, key)
+    if arrays is None:
+        arrays = reader(filename)
+        cache.store(filename, key, arrays, vertices=len(arrays[0]), triangles=len(arrays[1]) // 3)
+    return Mesh.fromArrays(*arrays)
+
+
+class MeshBuilder:
+    """Turns faces, added a chunk at a time, into a Mesh's vertex and index arrays"""
+
+    def __init__(self):
+        """A constructor for MeshBuilder class (with no faces yet)"""
+        self.corners = []      # each chunk's distinct corners
+        self.triangles = []    # ...and its triangles, as indices into those
+
+    def __str__(self):
+        """Basic string representation of this MeshBuilder"""
+        return "MeshBuilder with %d triangles" % sum(len(triangles) for triangles in self.triangles)
+
+    def addFaces(self, corners, sizes):
+        """Add faces given as their corners ((C,3) position, texcoord and normal
+           indices, -1 for none) and how many corners each face has.  Faces
+           are split into triangle fans: corners (0, i+1, i+2) for i < size-2.
+        """
+        sizes = np.asarray(sizes, dtype=np.int64)
+        fans = np.maximum(sizes - 2, 0)
+        first = np.repeat(np.cumsum(sizes) - sizes, fans)
+        step = np.arange(fans.sum()) - np.repeat(np.cumsum(fans) - fans, fans)
+        distinct, cornerOf = _distinct(corners)
+        self.corners.append(distinct)
+        self.triangles.append(np.stack((cornerOf[first], cornerOf[first + step + 1], cornerOf[first + step + 2]),
+                                       axis=1).astype(np.uint32))
+
+    def finish(self, positions, texcoords, normals):
+        """The interleaved vertex data and triangle indices (see Mesh.fromArrays)
+           of the faces added, whose corners index these (N,3), (N,2) and (N,3)
+           arrays.  Normals are smoothed from the faces around each position
+           where the file gives none.
+        """
+        corners = np.concatenate(self.corners) if self.corners else np.zeros((0, 3), dtype=np.int32)
+        for column, (attribute, name) in enumerate(((positions, "vertex"), (texcoords, "texture coordinate"),
+                                                    (normals, "normal"))):
+            if len(corners) and (corners[:, column].max() >= len(attribute) or
+                                 corners[:, column].min() < (0 if column == 0 else -1)):
+                raise ValueError("A face of the model refers to a {0} it does not have".format(name))
+        # Chunks share corners where they meet: keep each once
+        used, vertexOf = _distinct(corners)
+        del corners
+
+        indices = np.empty((sum(len(triangles) for triangles in self.triangles), 3), dtype=np.uint32)
+        row = offset = 0
+        # Each chunk's triangles are let go of once copied in
+        for chunk, distinct in enumerate(self.corners):
+            triangles, self.triangles[chunk] = self.triangles[chunk], None
+            indices[row:row + len(triangles)] = vertexOf[offset + triangles]
+            row += len(triangles)
+            offset += len(distinct)
+        self.corners, self.triangles = [], []
+
+        data = np.zeros((len(used), FLOATS_PER_VERTEX), dtype=np.float32)
+        data[:, 0:3] = positions[used[:, 0]]
+        if len(normals):
+            data[:, 3:6] = normals[used[:, 2]]
+        if len(texcoords):
+            data[:, 6:8] = np.where(used[:, 1:2] >= 0, texcoords[used[:, 1]], 0)
+        smooth = used[:, 2] < 0
+        if smooth.any():
+            data[smooth, 3:6] = smoothNormals(positions, used[:, 0][indices])[used[smooth, 0]]
+        return data, indices.ravel()
+
+
+def _distinct(corners):
+    """The distinct rows of (C,3) corners, and which of them each corner is"""
+    corners = np.asarray(corners, dtype=np.int32).reshape(-1, 3)
+    if len(corners) == 0:
+        return corners, np.zeros(0, dtype=np.int64)
+    # One number per (position, texcoord, normal), from 0
+    texcoords, normals = corners[:, 1].max() + 2, corners[:, 2].max() + 2
+    keys = (corners[:, 0].astype(np.int64) * texcoords + corners[:, 1] + 1) * normals + corners[:, 2] + 1
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return corners[first], inverse.ravel()
+
+
+def smoothNormals(positions, triangles):
+    """Normals for (N,3) positions: the area-weighted average of the normals of
+       the (T,3) triangles around each
+    """
+    corners = positions[triangles]
+    faceNormals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    normals = np.stack([np.bincount(triangles.ravel(), np.repeat(faceNormals[:, axis], 3), len(positions))
+                        for axis in range(3)], axis=1)
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.tile(np.float64([0, 1, 0]), (len(normals), 1)), where=lengths > 0)
+
+
+def readChunks(f, chunkSize=CHUNK_SIZE):
+    """The rest of a binary file in pieces of about chunkSize bytes, each ending
+       at the end of a line
+    """
+    rest = b""
+    for chunk in iter(lambda: f.read(chunkSize), b""):
+        chunk = rest + chunk
+        end = chunk.rfind(b"\n") + 1
+        rest = chunk[end:]
+        if end:
+            yield chunk[:end]
+    if rest:
+        yield rest + b"\n"
+
+
+def _lines(chunk):
+    """A chunk of whole lines as a writable byte array (padded, so the first
+       bytes of every line can be looked at) and where its lines start and end
+    """
+    data = np.frombuffer(bytearray(chunk + b"\0\0"), dtype=np.uint8)
+    ends = np.flatnonzero(data[:len(chunk)] == NEWLINE)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    return data, starts, ends
+
+
+def _wordCounts(text, lengths):
+    """How many words there are on each of the lines (of these lengths) that
+       text is made of
+    """
+    if len(lengths) == 0:
+        return np.zeros(0, dtype=np.int64)
+    separator = text <= SPACE
+    wordStarts = ~separator
+    wordStarts[1:] &= separator[:-1]
+    return np.add.reduceat(wordStarts.view(np.uint8), np.cumsum(lengths) - lengths, dtype=np.int64)
+
+
+def _numbers(text, dtype, expected, filename):
+    """The numbers in text, checking there are as many as expected"""
+    try:
+        values = np.fromstring(text.tobytes(), dtype=dtype, sep=" ") if len(text) else np.zeros(0, dtype=dtype)
+    except ValueError:
+        values = None
+    if values is None or len(values) != expected:
+        raise ValueError("Could not read the numbers in {0}".format(filename))
+    return values
+
+
+def _columns(values, counts, width):
+    """The first width numbers of each line, given how many each line has"""
+    if len(counts) and counts.min() < width:
+        raise ValueError("Expected at least {0} numbers on each line of the model".format(width))
+    return values[(np.cumsum(counts) - counts)[:, None] + np.arange(width)]
+
+
+def _stripComments(data, starts, ends):
+    """Blank out everything from a # to the end of its line"""
+    hashes = np.flatnonzero(data[:len(data) - 2] == COMMENT)
+    if len(hashes) == 0:
+        return
+    # The first # on each line, if any
+    first = hashes[np.minimum(np.searchsorted(hashes, starts), len(hashes) - 1)]
+    commented = (first >= starts) & (first < ends)
+    # +1 where a comment starts, -1 at its line's end: inside one, the sum is 1
+    inside = np.cumsum(np.bincount(first[commented], minlength=len(data)) -
+                       np.bincount(ends[commented], minlength=len(data)))
+    data[inside > 0] = SPACE
+
+
+def _keywords(data, starts, ends):
+    """Where each line's first word starts (its end, for blank lines)"""
+    words = np.flatnonzero(data[:len(data) - 2] > SPACE)
+    if len(words) == 0:
+        return ends.copy()
+    first = words[np.minimum(np.searchsorted(words, starts), len(words) - 1)]
+    return np.where((first >= starts) & (first < ends), first, ends)
+
+
+def _objKinds(data, starts):
+    """What each line holds (OBJ_POSITION...), from its keyword (starts are
+       where the keywords start, see _keywords)
+    """
+    first, second, third = data[starts], data[starts + 1], data[starts + 2]
+    vertex = first == ord("v")
+    kinds = np.full(len(starts), OBJ_OTHER, dtype=np.int8)
+    kinds[vertex & (second <= SPACE)] = OBJ_POSITION
+    kinds[vertex & (second == ord("t")) & (third <= SPACE)] = OBJ_TEXCOORD
+    kinds[vertex & (second == ord("n")) & (third <= SPACE)] = OBJ_NORMAL
+    kinds[(first == ord("f")) & (second <= SPACE)] = OBJ_FACE
+    return kinds
+
+
+def readOBJ(filename, chunkSize=CHUNK_SIZE):
+    """The interleaved vertex data and triangle indices of an OBJ file (see
+       Mesh.fromArrays).  Positions, texture coordinates, normals and faces
+       are read; groups, objects and materials are ignored.
+    """
+    attributes = ([], [], [])                   # positions, texcoords, normals
+    widths = (3, 2, 3)
+    counts = np.zeros(3, dtype=np.int64)        # how many of each were read so far
+    builder = MeshBuilder()
+    fields = None                               # the attributes face corners give
+    with open(filename, "rb") as f:
+        if f.read(len(UTF8_BOM)) != UTF8_BOM:
+            f.seek(0)
+        for chunk in readChunks(f, chunkSize):
+            data, starts, ends = _lines(chunk)
+            _stripComments(data, starts, ends)
+            keywords = _keywords(data, starts, ends)
+            kinds = _objKinds(data, keywords)
+            # Blank out the keywords, leaving only numbers on the lines kept
+            data[keywords[kinds != OBJ_OTHER]] = SPACE
+            data[keywords[(kinds == OBJ_TEXCOORD) | (kinds == OBJ_NORMAL)] + 1] = SPACE
+            lengths = ends - starts + 1
+            byteKinds = np.repeat(kinds, lengths)
+            data = data[:len(chunk)]
+
+            lines = []
+            for kind, attribute, width in zip((OBJ_POSITION, OBJ_TEXCOORD, OBJ_NORMAL), attributes, widths):
+                lines.append(np.flatnonzero(kinds == kind))
+                if len(lines[-1]):
+                    text = data[byteKinds == kind]
+                    perLine = _wordCounts(text, lengths[lines[-1]])
+                    attribute.append(_columns(_numbers(text, np.float32, perLine.sum(), filename), perLine, width))
+
+            faces = np.flatnonzero(kinds == OBJ_FACE)
+            if len(faces):
+                text = data[byteKinds == OBJ_FACE]
+                perFace = _wordCounts(text, lengths[faces])
+                slash = text == SLASH
+                if fields is None:
+                    # The first corner says which of v, v/vt, v//vn or v/vt/vn all use
+                    first = np.argmax(text > SPACE)
+                    word = text[first:first + np.argmax(text[first:] <= SPACE)].tobytes()
+                    fields = OBJ_CORNERS.get((word.count(b"/"), b"//" in word))
+                if fields is None or slash.sum() != perFace.sum() * (2 if fields == (0, 2) else len(fields) - 1):
+                    raise ValueError("Faces of {0} mix corner formats".format(filename))
+                text[slash] = SPACE
+                values = _numbers(text, np.int64, perFace.sum() * len(fields), filename).reshape(-1, len(fields))
+                corners = np.full((len(values), 3), -1, dtype=np.int32)
+                for column, attribute in enumerate(fields):
+                    # Negative indices count back from the last one read before the face
+                    before = np.repeat(counts[attribute] + np.searchsorted(lines[attribute], faces), perFace)
+                    index = values[:, column]
+                    corners[:, attribute] = np.where(index < 0, before + index, index - 1)
+                builder.addFaces(corners, perFace)
+            counts += [len(where) for where in lines]
+
+    return builder.finish(*(_join(parts, width) for parts, width in zip(attributes, widths)))
+
+
+def _join(parts, width):
+    """The (N,width) arrays in the list parts as one, emptying the list"""
+    joined = np.concatenate(parts) if parts else np.zeros((0, width), dtype=np.float32)
+    parts.clear()
+    return joined
+
+
+def readPLY(filename, chunkSize=CHUNK_SIZE):
+    """The interleaved vertex data and triangle indices of a PLY file, ASCII or
+       binary (see Mesh.fromArrays).  Vertex positions, normals and texture
+       coordinates and the face element's vertex lists are read.
+    """
+    builder = MeshBuilder()
+    with open(filename, "rb") as f:
+        order, elements = _plyHeader(f, filename)
+        names = {prop[0] for name, _, properties in elements if name == "vertex" for prop in properties}
+        if not set(PLY_POSITION) <= names:
+            raise ValueError("{0} has no vertex positions".format(filename))
+        texcoordNames = next((pair for pair in PLY_TEXCOORDS if set(pair) <= names), None)
+        hasNormals = set(PLY_NORMAL) <= names
+
+        def addFaces(vertices, sizes):
+            # Every attribute is per vertex: a corner takes them all from its vertex
+            corners = np.full((len(vertices), 3), -1, dtype=np.int32)
+            corners[:, 0] = vertices
+            if texcoordNames:
+                corners[:, 1] = vertices
+            if hasNormals:
+                corners[:, 2] = vertices
+            builder.addFaces(corners, sizes)
+
+        if order is None:
+            vertices = _plyText(f, elements, addFaces, chunkSize, filename)
+        else:
+            vertices = _plyBinary(f, order, elements, addFaces, chunkSize, filename)
+
+    columns = lambda properties: np.stack([vertices[name] for name in properties], axis=1).astype(np.float32)
+    return builder.finish(columns(PLY_POSITION),
+                          columns(texcoordNames) if texcoordNames else np.zeros((0, 2), dtype=np.float32),
+                          columns(PLY_NORMAL) if hasNormals else np.zeros((0, 3), dtype=np.float32))
+
+
+def _plyHeader(f, filename):
+    """The byte order (None for ASCII) and elements of a PLY file:
+       [(name, count, [(property, type) or (property, count type, item type)])]
+    """
+    if f.readline().strip() != b"ply":
+        raise ValueError("{0} is not a PLY file".format(filename))
+    order = None
+    elements = []
+    for line in iter(f.readline, b""):
+        words = line.decode("ascii").split()
+        if not words or words[0] in ("comment", "obj_info"):
+            continue
+        if words[0] == "end_header":
+            return order, elements
+        if words[0] == "format":
+            if words[1] not in PLY_ORDERS:
+                raise ValueError("{0} has an unknown PLY format {1}".format(filename, words[1]))
+            order = PLY_ORDERS[words[1]]
+        elif words[0] == "element":
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == "property" and words[1] == "list":
+            elements[-1][2].append((words[4], PLY_TYPES[words[2]], PLY_TYPES[words[3]]))
+        elif words[0] == "property":
+            elements[-1][2].append((words[2], PLY_TYPES[words[1]]))
+    raise ValueError("{0} ends inside its PLY header".format(filename))
+
+
+def _plyListColumn(properties):
+    """Where the face element's vertex list is among its properties"""
+    lists = [column for column, prop in enumerate(properties) if len(prop) == 3]
+    if len(lists) != 1:
+        raise ValueError("Expected one vertex list property for PLY faces")
+    return lists[0]
+
+
+def _plyRecord(properties, order, size=None):
+    """The NumPy record type of an element with these properties, its list (if
+       any) holding size items
+    """
+    fields = []
+    for prop in properties:
+        if len(prop) == 2:
+            fields.append((prop[0], order + prop[1]))
+        else:
+            fields.append(("count", order + prop[1]))
+            fields.append((prop[0], order + prop[2], (size,)))
+    return np.dtype(fields)
+
+
+def _plyText(f, elements, addFaces, chunkSize, filename):
+    """Read an ASCII PLY file's body, passing faces on to addFaces.  Returns
+       the vertex records.
+    """
+    vertices = None
+    ranges = np.cumsum([0] + [count for _, count, _ in elements])
+    lineNumber = 0
+    for chunk in readChunks(f, chunkSize):
+        data, starts, ends = _lines(chunk)
+        for (name, count, properties), first, end in zip(elements, ranges[:-1], ranges[1:]):
+            # Each element is a run of lines: take the part of it in this chunk
+            begin, stop = max(first - lineNumber, 0), min(end - lineNumber, len(starts))
+            if name not in ("vertex", "face") or begin >= stop:
+                continue
+            text = data[starts[begin]:ends[stop - 1] + 1]
+            perLine = _wordCounts(text, ends[begin:stop] - starts[begin:stop] + 1)
+            values = _numbers(text, np.float64, perLine.sum(), filename)
+            offsets = np.cumsum(perLine) - perLine
+            if name == "vertex":
+                if vertices is None:
+                    vertices = np.zeros(count, dtype=[(prop[0], "f4") for prop in properties])
+                for column, prop in enumerate(properties):
+                    vertices[prop[0]][lineNumber + begin - first:lineNumber + stop - first] = values[offsets + column]
+            else:
+                column = _plyListColumn(properties)
+                sizes = values[offsets + column].astype(np.int64)
+                within = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+                addFaces(values[np.repeat(offsets + column + 1, sizes) + within], sizes)
+        lineNumber += len(starts)
+    return vertices
+
+
+def _plyBinary(f, order, elements, addFaces, chunkSize, filename):
+    """Read a binary PLY file's body, passing faces on to addFaces.  Returns
+       the vertex records.
+    """
+    vertices = None
+    for name, count, properties in elements:
+        if name == "face":
+            _plyFaces(f, order, count, properties, addFaces, chunkSize, filename)
+            continue
+        if any(len(prop) == 3 for prop in properties):
+            raise ValueError("{0}: cannot skip PLY element {1} with a list property".format(filename, name))
+        record = _plyRecord(properties, order)
+        if name != "vertex":
+            f.seek(count * record.itemsize, os.SEEK_CUR)
+            continue
+        vertices = np.empty(count, dtype=record.newbyteorder("="))
+        step = max(1, chunkSize // record.itemsize)
+        for first in range(0, count, step):
+            part = f.read(min(step, count - first) * record.itemsize)
+            if len(part) != min(step, count - first) * record.itemsize:
+                raise ValueError("{0} ends inside its vertices".format(filename))
+            vertices[first:first + len(part) // record.itemsize] = np.frombuffer(part, dtype=record)
+    return vertices
+
+
+def _plyFaces(f, order, count, properties, addFaces, chunkSize, filename):
+    """Read binary PLY faces, passing them on to addFaces a chunk at a time.
+       The faces are records of different sizes (a count, then that many
+       vertex indices), found in each chunk by _recordStarts; a record cut
+       off by the end of a chunk is carried over to the next.
+    """
+    column = _plyListColumn(properties)
+    countType = np.dtype(order + properties[column][1])
+    indexType = np.dtype(order + properties[column][2])
+    head = _plyRecord(properties[:column], order).itemsize + countType.itemsize    # bytes before the indices
+    tail = _plyRecord(properties[column + 1:], order).itemsize                     # ...and after them
+    rest = b""
+    read = 0
+    while read < count:
+        part = f.read(chunkSize)
+        buffer = rest + part
+        starts, sizes, end = _recordStarts(buffer, head, countType, indexType.itemsize, tail, count - read)
+        if len(starts) == 0 and not part:
+            raise ValueError("{0} ends inside its faces".format(filename))
+        if len(starts):
+            within = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            indices = np.ndarray((len(buffer) - indexType.itemsize + 1,), indexType, buffer, 0, (1,))
+            addFaces(indices[np.repeat(starts + head, sizes) + within * indexType.itemsize].astype(np.int64), sizes)
+        rest = buffer[end:]
+        read += len(starts)
+    # Whatever was read past the faces belongs to the next element
+    f.seek(-len(rest), os.SEEK_CUR)
+
+
+def _recordStarts(buffer, head, countType, itemSize, tail, limit):
+    """Where the first (up to limit) whole records in buffer start, how many
+       items each holds, and where the last of them ends.  A record is head
+       bytes ending in its item count, the items and tail bytes.
+
+       Each record's start follows from the one before, but rather than
+       stepping through them one at a time, every byte is treated as a
+       possible start with a jump to the record after it; composing the
+       jumps with themselves (1, 2, 4... records ahead) reaches all the
+       records from the first in a logarithmic number of array operations.
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    positions = len(buffer) - head + 1      # possible starts with a whole count
+    if positions <= 0 or limit <= 0:
+        return empty, empty, 0
+    counts = np.ndarray((positions,), countType, buffer, head - countType.itemsize, (1,))
+
+    size = int(counts[0])
+    recordSize = head + max(size, 0) * itemSize + tail
+    uniform = np.arange(0, min(positions, limit * recordSize), recordSize)
+    if size >= 0 and (counts[uniform] == size).all():
+        # All the same size (most often all triangles): no need to follow the jumps
+        chain = uniform
+    else:
+        ends = np.arange(positions) + head + counts.astype(np.int64) * itemSize + tail
+        # Records that are corrupt or run past the buffer lead to a final "nowhere"
+        jump = np.append(np.where((counts >= 0) & (ends < positions), ends, positions), positions)
+        del ends
+        chain = np.zeros(1, dtype=np.int64)    # the first 1, 2, 4... record starts
+        while len(chain) < limit:
+            following = jump[chain]
+            following = following[following < positions]
+            chain = np.concatenate((chain, following))
+            if len(following) < len(chain) - len(following):
+                break                             # reached the end
+            jump = jump[jump]
+    chain = chain[:limit]
+    sizes = counts[chain].astype(np.int64)
+    if (sizes < 0).any():
+        raise ValueError("A PLY face has a negative number of vertices")
+    ends = chain + head + sizes * itemSize + tail
+    whole = ends <= len(buffer)
+    chain, sizes, ends = chain[whole], sizes[whole], ends[whole]
+    return chain, sizes, int(ends[-1]) if len(chain) else 0
+
+
+READERS = {".obj": readOBJ, ".ply": readPLY}
@@ -0,0 +1,62 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# picking.py module
+# Description:
+#   Ray intersection tests for picking objects with the mouse on the
+#   CPU, without an extra render pass or reading pixels back from GL.
+#   A click is turned into a world-space ray (Camera.unproject), the
+#   scene graph's BVH finds the objects whose boxes it passes through,
+#   nearest first, and those are tested exactly here: against their
+#   triangles, all at once (Moller-Trumbore), or against their boxes
+#   (bvh.rayBoxes) when they have no triangles to offer.
+# ==============================
+import numpy as np
+
+# Rays closer to parallel with a triangle than this miss it
+EPSILON = 1e-9
+
+
+class Pick:
+    """What a ray hit: the node, how far along the ray and where"""
+
+    def __init__(self, node, distance, point, triangle=None):
+        """A constructor for Pick class.
+           distance is along the ray in units of its direction's length,
+           point is the world-space hit point and triangle the index of the
+           triangle hit (None when a box was hit).
+        """
+        self.node = node
+        self.distance = distance
+        self.point = point
+        self.triangle = triangle
+
+    def __str__(self):
+        """Basic string representation of this Pick"""
+        return "Picked %s at (%.3f, %.3f, %.3f), %.3f along the ray" % (
+            self.node.name, self.point[0], self.point[1], self.point[2], self.distance)
+
+
+def rayTriangles(origin, direction, triangles):
+    """Where the ray from origin along direction hits each of T triangles
+       ((T,3,3) corners): distances along the ray, inf where it misses.
+       Both sides of a triangle count.
+    """
+    triangles = np.asarray(triangles, dtype=np.float64)
+    origin = np.asarray(origin, dtype=np.float64)
+    direction = np.asarray(direction, dtype=np.float64)
+    a = triangles[:, 0]
+    edge1 = triangles[:, 1] - a
+    edge2 = triangles[:, 2] - a
+    p = np.cross(direction, edge2)
+    determinant = np.einsum("ij,ij->i", edge1, p)
+    hit = np.abs(determinant) > EPSILON
+    inverse = np.divide(1.0, determinant, out=np.zeros_like(determinant), where=hit)
+    offset = origin - a
+    u = np.einsum("ij,ij->i", offset, p) * inverse
+    q = np.cross(offset, edge1)
+    v = (q @ direction) * inverse
+    t = np.einsum("ij,ij->i", edge2, q) * inverse
+    hit &= (u >= 0) & (v >= 0) & (u + v <= 1) & (t >= 0)
+    return np.where(hit, t, np.inf)
+
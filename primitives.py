@@ -0,0 +1,231 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# primitives.py module
+# Description:
+#   Meshes for the standard solids (cube, sphere, cylinder, cone,
+#   plane and torus, plus wire cubes and cylinders) built with NumPy,
+#   so their geometry can be uploaded once and drawn many times (see
+#   instancing) instead of being regenerated by GLUT/GLU on every
+#   call.  Sizes and orientations follow glutSolidCube, gluSphere,
+#   gluCylinder and glutSolidTorus.
+#
+#   Each generator is memoized: asking again for the same parameters
+#   returns the same Mesh, with its buffers already uploaded once it
+#   has been drawn.  The meshes are shared, so their arrays are
+#   read-only (Mesh.transformed makes a copy to change).
+# ==============================
+import functools
+import inspect
+import numbers
+import numpy as np
+from OpenGL.GL import GL_LINES
+from mesh import Mesh
+
+# The six faces of a cube: (normal, first edge, second edge), edge1 x edge2 = normal
+CUBE_FACES = [
+    ((1, 0, 0), (0, 1, 0), (0, 0, 1)),
+    ((-1, 0, 0), (0, 0, 1), (0, 1, 0)),
+    ((0, 1, 0), (0, 0, 1), (1, 0, 0)),
+    ((0, -1, 0), (1, 0, 0), (0, 0, 1)),
+    ((0, 0, 1), (1, 0, 0), (0, 1, 0)),
+    ((0, 0, -1), (0, 1, 0), (1, 0, 0)),
+]
+
+
+def memoized(build):
+    """Decorator for the generators below: each mesh is built once per set of
+       parameter values and then shared.  Arguments are matched to the
+       signature and converted to the types of their defaults first, so
+       sphere() and sphere(1, 20, 20) are the same mesh (see normalized).
+       Shared meshes are made read-only.
+    """
+    signature = inspect.signature(build)
+    parameters = list(signature.parameters.values())
+
+    @functools.lru_cache(maxsize=None)
+    def cached(*values):
+        mesh = build(*values)
+        mesh.data.flags.writeable = False
+        mesh.indices.flags.writeable = False
+        return mesh
+
+    @functools.wraps(build)
+    def generator(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return cached(*(normalized(parameter, value) for parameter, value in zip(parameters, bound.args)))
+
+    return generator
+
+
+def normalized(parameter, value):
+    """value as the type of parameter's default, when that changes nothing but
+       the type (20.0 for a count becomes 20).  Anything that would be
+       rounded or reinterpreted on the way raises instead.
+    """
+    kind = type(parameter.default)
+    if kind is bool:
+        if not isinstance(value, (bool, np.bool_)):
+            raise TypeError("%s must be True or False, not %r" % (parameter.name, value))
+        return bool(value)
+    if kind in (int, float):
+        if isinstance(value, (bool, np.bool_)) or not isinstance(value, numbers.Real):
+            raise TypeError("%s must be a number, not %r" % (parameter.name, value))
+        if kind is int and int(value) != value:
+            raise ValueError("%s must be a whole number, not %r" % (parameter.name, value))
+        return kind(value)
+    return value
+
+
+def gridIndices(rows, cols):
+    """Triangles covering a (rows+1) x (cols+1) grid of vertices stored row by row.
+       Counter-clockwise when rows run along the second direction of the
+       surface and columns along the first.
+    """
+    r, c = np.meshgrid(np.arange(rows), np.arange(cols), indexing="ij")
+    corner = (r * (cols + 1) + c).ravel()
+    right = corner + 1
+    up = corner + cols + 1
+    upRight = up + 1
+    return np.stack([corner, right, upRight, corner, upRight, up], axis=1).ravel()
+
+
+def gridLines(rows, cols):
+    """GL_LINES along the edges of the squares of a grid like gridIndices's:
+       every row and every column, without the squares' diagonals
+    """
+    grid = np.arange((rows + 1) * (cols + 1)).reshape(rows + 1, cols + 1)
+    across = np.stack([grid[:, :-1], grid[:, 1:]], axis=-1).reshape(-1, 2)
+    along = np.stack([grid[:-1], grid[1:]], axis=-1).reshape(-1, 2)
+    return np.concatenate([across, along]).ravel()
+
+
+@memoized
+def cube(size=1.0):
+    """A cube centered on the origin, size units on a side (like glutSolidCube)"""
+    half = size / 2
+    square = np.array([(-1, -1), (1, -1), (1, 1), (-1, 1)], dtype=np.float32)
+    vertices = []
+    normals = []
+    for normal, u, v in CUBE_FACES:
+        normal, u, v = np.array(normal), np.array(u), np.array(v)
+        vertices.append(half * (normal + square[:, :1] * u + square[:, 1:] * v))
+        normals.append(np.tile(normal, (4, 1)))
+    texcoords = np.tile((square + 1) / 2, (6, 1))
+    indices = (np.arange(6)[:, None] * 4 + [0, 1, 2, 0, 2, 3]).ravel()
+    return Mesh(np.concatenate(vertices), np.concatenate(normals), texcoords, indices)
+
+
+@memoized
+def sphere(radius=1.0, slices=20, stacks=20):
+    """A sphere centered on the origin with its poles on the z-axis (like gluSphere).
+       slices divide it around the z-axis, stacks along it.
+    """
+    theta = np.linspace(0, 2 * np.pi, slices + 1)
+    phi = np.linspace(np.pi, 0, stacks + 1)   # from the -z pole up to the +z pole
+    sinPhi = np.sin(phi)[:, None]
+    normals = np.stack([sinPhi * np.cos(theta),
+                        sinPhi * np.sin(theta),
+                        np.cos(phi)[:, None] * np.ones_like(theta)], axis=-1).reshape(-1, 3)
+    s, t = np.meshgrid(np.linspace(0, 1, slices + 1), np.linspace(0, 1, stacks + 1))
+    texcoords = np.stack([s, t], axis=-1).reshape(-1, 2)
+    return Mesh(radius * normals, normals, texcoords, gridIndices(stacks, slices))
+
+
+@memoized
+def cylinder(base=1.0, top=1.0, height=1.0, slices=20, stacks=1, capped=False):
+    """A cylinder (or cone, when top is 0) standing on the z=0 plane along +z,
+       with radius base at z=0 and top at z=height (like gluCylinder).
+       capped adds disks closing both ends; gluCylinder has none.
+    """
+    theta = np.linspace(0, 2 * np.pi, slices + 1)
+    cos, sin = np.cos(theta), np.sin(theta)
+    t = np.linspace(0, 1, stacks + 1)[:, None]
+    radius = base + (top - base) * t
+    vertices = np.stack([radius * cos, radius * sin, height * t * np.ones_like(theta)], axis=-1).reshape(-1, 3)
+    # The side slopes inward by (base - top) over height
+    slope = (base - top) / height if height else 0.0
+    normal = np.stack([cos, sin, np.full_like(theta, slope)], axis=-1)
+    normal /= np.linalg.norm(normal, axis=1, keepdims=True)
+    normals = np.tile(normal, (stacks + 1, 1))
+    s, tt = np.meshgrid(np.linspace(0, 1, slices + 1), t.ravel())
+    texcoords = np.stack([s, tt], axis=-1).reshape(-1, 2)
+    side = Mesh(vertices, normals, texcoords, gridIndices(stacks, slices))
+    if not capped:
+        return side
+    meshes = [side]
+    for z, r, facing in ((0.0, base, -1.0), (height, top, 1.0)):
+        if r <= 0:
+            continue
+        rim = np.stack([r * cos[:-1], r * sin[:-1], np.full(slices, z)], axis=1)
+        center = np.array([[0.0, 0.0, z]])
+        ring = np.arange(1, slices + 1)
+        fan = np.stack([np.zeros(slices, dtype=int), ring, np.roll(ring, -1)], axis=1)
+        if facing < 0:
+            fan = fan[:, ::-1]
+        capTexcoords = np.concatenate([[(0.5, 0.5)], 0.5 + 0.5 * np.stack([cos[:-1], sin[:-1]], axis=1)])
+        meshes.append(Mesh(np.concatenate([center, rim]), [(0, 0, facing)] * (slices + 1),
+                           capTexcoords, fan.ravel()))
+    return Mesh.merge(meshes)
+
+
+@memoized
+def wireCylinder(base=1.0, top=1.0, height=1.0, slices=20, stacks=1):
+    """The outline of cylinder(base, top, height, slices, stacks): its rings
+       and the lines between its slices, drawn as GL_LINES (like gluCylinder
+       with a GLU_LINE draw style)
+    """
+    side = cylinder(base, top, height, slices, stacks)
+    return Mesh(side.vertices, side.normals, side.texcoords, gridLines(stacks, slices), GL_LINES)
+
+
+@memoized
+def cone(base=1.0, height=1.0, slices=20, stacks=1, capped=False):
+    """A cone standing on the z=0 plane with its tip at z=height (like
+       gluCylinder with a top radius of 0); capped closes the base
+    """
+    return cylinder(base, 0.0, height, slices, stacks, capped)
+
+
+@memoized
+def plane(width=1.0, depth=1.0, rows=1, cols=1):
+    """A flat width x depth plane in the y=0 plane, centered on the origin and
+       facing +y, divided into rows x cols squares (more vertices light better
+       per vertex).  Texture coordinates run 0 to 1 across it.
+    """
+    s, t = np.meshgrid(np.linspace(0, 1, cols + 1), np.linspace(0, 1, rows + 1))
+    vertices = np.stack([(s - 0.5) * width, np.zeros_like(s), (0.5 - t) * depth], axis=-1).reshape(-1, 3)
+    normals = np.tile((0.0, 1.0, 0.0), (len(vertices), 1))
+    texcoords = np.stack([s, t], axis=-1).reshape(-1, 2)
+    return Mesh(vertices, normals, texcoords, gridIndices(rows, cols))
+
+
+@memoized
+def torus(inner=0.25, outer=1.0, sides=12, rings=24):
+    """A torus around the z-axis (like glutSolidTorus): a tube of radius inner
+       whose center circles the origin at radius outer.  sides divide the
+       tube around, rings divide it along.
+    """
+    theta = np.linspace(0, 2 * np.pi, rings + 1)       # along the ring
+    phi = np.linspace(0, 2 * np.pi, sides + 1)[:, None]  # around the tube
+    normals = np.stack([np.cos(phi) * np.cos(theta),
+                        np.cos(phi) * np.sin(theta),
+                        np.sin(phi) * np.ones_like(theta)], axis=-1).reshape(-1, 3)
+    centers = np.stack([outer * np.cos(theta), outer * np.sin(theta), np.zeros_like(theta)], axis=-1)
+    vertices = (centers[None] + inner * normals.reshape(sides + 1, rings + 1, 3)).reshape(-1, 3)
+    s, t = np.meshgrid(np.linspace(0, 1, rings + 1), np.linspace(0, 1, sides + 1))
+    texcoords = np.stack([s, t], axis=-1).reshape(-1, 2)
+    return Mesh(vertices, normals, texcoords, gridIndices(sides, rings))
+
+
+@memoized
+def wireCube(size=1.0):
+    """The twelve edges of a cube centered on the origin (like glutWireCube),
+       drawn as GL_LINES
+    """
+    # Corner i is on the high side of axis k when bit k of i is set
+    corners = np.where((np.arange(8)[:, None] >> np.arange(3)) & 1, 0.5, -0.5) * size
+    edges = [(i, i | bit) for i in range(8) for bit in (1, 2, 4) if not i & bit]
+    normals = corners / np.linalg.norm(corners, axis=1, keepdims=True)
+    return Mesh(corners, normals, np.zeros((8, 2)), edges, GL_LINES)
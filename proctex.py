@@ -0,0 +1,115 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# proctex.py module
+# Description:
+#   Procedural textures (checkerboards, gradients, grids and noise)
+#   built as (height, width, 4) RGBA uint8 NumPy arrays with whole-
+#   array operations, so even 4096x4096 textures take milliseconds.
+#   Results are memoized by their parameters and marked read-only;
+#   they are C-contiguous, so glTexImage2D reads them without a copy
+#   (see textures.uploadTexture).  Colors are RGBA tuples.
+# ==============================
+from functools import lru_cache
+import numpy as np
+
+WHITE = (255, 255, 255, 255)
+BLACK = (0, 0, 0, 255)
+
+# How many generated textures to keep around for reuse
+CACHE_SIZE = 32
+
+
+def _finish(pixels):
+    """Shared results must not be modified by callers"""
+    pixels.flags.writeable = False
+    return pixels
+
+
+def _ramp(color0, color1, steps=256):
+    """steps colors evenly spaced from color0 to color1, as a (steps, 4) palette"""
+    t = np.linspace(0, 1, steps, dtype=np.float32)[:, None]
+    c0 = np.array(color0, dtype=np.float32)
+    c1 = np.array(color1, dtype=np.float32)
+    return (c0 + t * (c1 - c0) + 0.5).astype(np.uint8)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def checkerboard(width, height, check=8, color0=(255, 255, 255, 150), color1=(135, 135, 135, 150)):
+    """Alternating squares check pixels wide, starting with color0 in the corner"""
+    palette = np.array([color0, color1], dtype=np.uint8)
+    cols = (np.arange(width) // check) & 1
+    oddRows = ((np.arange(height) // check) & 1).astype(bool)
+    # Only two distinct rows exist; broadcast them instead of indexing every pixel
+    pixels = np.empty((height, width, 4), dtype=np.uint8)
+    pixels[~oddRows] = palette[cols]
+    pixels[oddRows] = palette[cols ^ 1]
+    return _finish(pixels)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def gradient(width, height, color0=BLACK, color1=WHITE, vertical=True):
+    """A linear blend from color0 to color1 (bottom to top, or left to right)"""
+    pixels = np.empty((height, width, 4), dtype=np.uint8)
+    if vertical:
+        pixels[:] = _ramp(color0, color1, height)[:, None, :]
+    else:
+        pixels[:] = _ramp(color0, color1, width)[None, :, :]
+    return _finish(pixels)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def grid(width, height, spacing=32, lineWidth=2, background=WHITE, line=BLACK):
+    """Lines lineWidth pixels wide every spacing pixels in both directions"""
+    palette = np.array([background, line], dtype=np.uint8)
+    onRow = (np.arange(height) % spacing) < lineWidth
+    onCol = ((np.arange(width) % spacing) < lineWidth).astype(np.intp)
+    pixels = np.empty((height, width, 4), dtype=np.uint8)
+    pixels[onRow] = palette[1]
+    pixels[~onRow] = palette[onCol]
+    return _finish(pixels)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def noise(width, height, scale=32, octaves=4, seed=0, color0=BLACK, color1=WHITE):
+    """Fractal value noise: octaves of smoothly interpolated random lattices.
+       scale is the lattice spacing in pixels of the coarsest octave.
+    """
+    rng = np.random.default_rng(seed)
+    total = np.zeros((height, width), dtype=np.float32)
+    amplitude = 1.0
+    norm = 0.0
+    cell = float(scale)
+    for _ in range(octaves):
+        # Random values at the lattice points covering the image
+        latticeH = int(height / cell) + 2
+        latticeW = int(width / cell) + 2
+        lattice = rng.random((latticeH, latticeW), dtype=np.float32)
+
+        y = np.arange(height, dtype=np.float32) / cell
+        x = np.arange(width, dtype=np.float32) / cell
+        y0 = y.astype(np.intp)
+        x0 = x.astype(np.intp)
+        # Smoothstep weights avoid visible lattice creases
+        fy = y - y0
+        fx = x - x0
+        fy = (fy * fy * (3 - 2 * fy))[:, None]
+        fx = (fx * fx * (3 - 2 * fx))[None, :]
+
+        # Separable: interpolate the lattice rows across x, then those rows down y
+        rows = lattice[:, x0] * (1 - fx) + lattice[:, x0 + 1] * fx
+        rows *= amplitude
+        octave = rows[y0]
+        change = rows[y0 + 1]
+        change -= octave
+        change *= fy
+        octave += change
+        total += octave
+
+        norm += amplitude
+        amplitude *= 0.5
+        cell = max(cell / 2, 1.0)
+    # Quantize to 256 levels and look the colors up in a palette
+    total *= 255 / norm
+    total += 0.5
+    return _finish(_ramp(color0, color1)[total.astype(np.uint8)])
@@ -0,0 +1,184 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# profiler.py module
+# Description:
+#   Per-phase frame timing.  Code marks the phases of a frame with
+#   "with profiler.section(name):" blocks (which may nest); each one
+#   is timed on the CPU with perf_counter and on the GPU with a pair
+#   of GL timestamp queries.  GPU results are collected a frame or
+#   more later, once available, so timing never stalls the pipeline.
+#
+#   The last `window` samples of every phase are kept, giving rolling
+#   percentiles (p50/p95/p99) and histograms, which can be printed or
+#   exported to CSV or JSON.  A disabled profiler costs almost nothing.
+# ==============================
+import csv
+import ctypes
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+from OpenGL.GL import *
+# PyOpenGL's wrapper cannot return 64-bit query results, so call GL directly
+from OpenGL.raw.GL.VERSION.GL_3_3 import glGetQueryObjectui64v as _glGetQueryObjectui64v
+
+PERCENTILES = (50, 95, 99)
+HISTOGRAM_BINS = 20
+
+
+class FrameProfiler:
+    """Rolling CPU and GPU timings for the named phases of each frame"""
+
+    def __init__(self, window=300, gpu=True):
+        """A constructor for FrameProfiler class.
+           window is how many frames of samples to keep per phase;
+           gpu=False skips the GL timer queries.
+        """
+        self.window = window
+        self.enabled = False
+        self.useGpu = gpu
+        self.samples = {"cpu": {}, "gpu": {}}   # clock -> section path -> deque of ms
+        self.stack = []
+        self.frameQueries = []   # (path, start query, end query) for the current frame
+        self.pending = deque()   # earlier frames' queries, waiting for their results
+        self.freeQueries = []
+        self.frames = 0
+        self._result = ctypes.c_uint64()
+
+    def __str__(self):
+        """Basic string representation of this FrameProfiler"""
+        return "FrameProfiler (%s, %d frames)" % ("on" if self.enabled else "off", self.frames)
+
+    def start(self):
+        if self.useGpu and not bool(glQueryCounter):
+            self.useGpu = False   # No timer queries (needs GL 3.3 or ARB_timer_query)
+        self.enabled = True
+
+    def stop(self):
+        """Stop timing (collecting the GPU results still outstanding)"""
+        self._collect(wait=True)
+        self.enabled = False
+
+    def clear(self):
+        self.samples = {"cpu": {}, "gpu": {}}
+        self.frames = 0
+
+    def _timestamp(self):
+        if not self.useGpu:
+            return None
+        query = self.freeQueries.pop() if self.freeQueries else glGenQueries(1)[0]
+        glQueryCounter(query, GL_TIMESTAMP)
+        return query
+
+    def _add(self, clock, path, ms):
+        samples = self.samples[clock].get(path)
+        if samples is None:
+            samples = self.samples[clock][path] = deque(maxlen=self.window)
+        samples.append(ms)
+
+    @contextmanager
+    def section(self, name):
+        """Time the enclosed block as name (nested inside any enclosing sections)"""
+        if not self.enabled:
+            yield
+            return
+        self.stack.append(name)
+        path = "/".join(self.stack)
+        startQuery = self._timestamp()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            endQuery = self._timestamp()
+            self.stack.pop()
+            self._add("cpu", path, elapsed * 1000.0)
+            if startQuery is not None:
+                self.frameQueries.append((path, startQuery, endQuery))
+
+    def endFrame(self):
+        """Finish one frame: queue its GPU queries and collect any finished ones"""
+        if not self.enabled:
+            return
+        if self.frameQueries:
+            self.pending.append(self.frameQueries)
+            self.frameQueries = []
+        self.frames += 1
+        self._collect(wait=False)
+
+    def _queryResult(self, query):
+        _glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(self._result))
+        return self._result.value
+
+    def _collect(self, wait):
+        while self.pending:
+            queries = self.pending[0]
+            # The last query of a frame is the last one issued: once it is done, all are
+            if not wait and not glGetQueryObjectiv(queries[-1][2], GL_QUERY_RESULT_AVAILABLE):
+                break
+            self.pending.popleft()
+            for path, startQuery, endQuery in queries:
+                nanoseconds = self._queryResult(endQuery) - self._queryResult(startQuery)
+                self._add("gpu", path, nanoseconds / 1e6)
+                self.freeQueries.extend((startQuery, endQuery))
+
+    def statistics(self):
+        """{clock: {section: {"count", "mean", "p50", "p95", "p99", "max"}}} in milliseconds"""
+        stats = {}
+        for clock, sections in self.samples.items():
+            stats[clock] = {}
+            for path, samples in sections.items():
+                values = np.fromiter(samples, dtype=np.float64)
+                entry = {"count": len(values), "mean": float(values.mean())}
+                for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                    entry["p%d" % p] = float(value)
+                entry["max"] = float(values.max())
+                stats[clock][path] = entry
+        return stats
+
+    def histogram(self, clock, path, bins=HISTOGRAM_BINS):
+        """(counts, bin edges in ms) of one section's recent samples"""
+        values = np.fromiter(self.samples[clock][path], dtype=np.float64)
+        counts, edges = np.histogram(values, bins=bins)
+        return counts, edges
+
+    def report(self):
+        """A table of the rolling statistics, one line per section and clock"""
+        lines = ["%-40s %-4s %6s %8s %8s %8s %8s" % ("section", "", "count", "mean", "p50", "p95", "p99")]
+        stats = self.statistics()
+        for clock in ("cpu", "gpu"):
+            for path in sorted(stats[clock]):
+                entry = stats[clock][path]
+                lines.append("%-40s %-4s %6d %8.3f %8.3f %8.3f %8.3f" % (
+                    path, clock, entry["count"], entry["mean"], entry["p50"], entry["p95"], entry["p99"]))
+        return "\n".join(lines)
+
+    def exportCSV(self, filename):
+        stats = self.statistics()
+        with open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["section", "clock", "count", "mean_ms"]
+                            + ["p%d_ms" % p for p in PERCENTILES] + ["max_ms"])
+            for clock in ("cpu", "gpu"):
+                for path in sorted(stats[clock]):
+                    entry = stats[clock][path]
+                    writer.writerow([path, clock, entry["count"], entry["mean"]]
+                                    + [entry["p%d" % p] for p in PERCENTILES] + [entry["max"]])
+
+    def exportJSON(self, filename):
+        stats = self.statistics()
+        for clock, sections in stats.items():
+            for path, entry in sections.items():
+                counts, edges = self.histogram(clock, path)
+                entry["histogram"] = {"counts": counts.tolist(), "edges_ms": edges.tolist()}
+        with open(filename, "w") as f:
+            json.dump({"frames": self.frames, "window": self.window, "sections": stats}, f, indent=2)
+
+    def export(self, basename="profile"):
+        """Write basename.csv and basename.json, returning their names"""
+        names = (basename + ".csv", basename + ".json")
+        self.exportCSV(names[0])
+        self.exportJSON(names[1])
+        return names
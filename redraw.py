@@ -0,0 +1,69 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# redraw.py module
+# Description:
+#   On-demand redrawing for GLUT programs.  Instead of drawing from an
+#   idle callback or re-arming a timer forever, a program asks for a
+#   redraw whenever something changed and tells the scheduler how to
+#   find out whether anything is still animating.  Redraw requests are
+#   coalesced into one glutPostRedisplay per frame, and the animation
+#   timer runs only while something is active: a still scene uses no
+#   CPU at all until the next input event.
+# ==============================
+from OpenGL.GLUT import glutPostRedisplay, glutTimerFunc
+
+
+class RedrawScheduler:
+    """Draws frames only when needed and stops the timer when nothing moves"""
+
+    def __init__(self, delay, tick, active, idle=None):
+        """A constructor for RedrawScheduler class.
+           delay is the time between animation ticks in milliseconds;
+           tick() runs once per tick and returns True if the scene needs redrawing;
+           active() returns True while the timer should keep ticking;
+           idle(), if given, is called when the timer stops.
+        """
+        self.delay = delay
+        self.tick = tick
+        self.active = active
+        self.idle = idle
+        self.pending = False     # a redisplay is posted but not drawn yet
+        self.running = False     # the timer is armed
+        self.requests = 0
+        self.frames = 0
+        self.sleeps = 0
+
+    def __str__(self):
+        """Basic string representation of this RedrawScheduler"""
+        return "RedrawScheduler (%s): %d frames drawn for %d requests, idled %d times" % (
+            "ticking" if self.running else "idle", self.frames, self.requests, self.sleeps)
+
+    def request(self):
+        """Ask for the scene to be redrawn (any number of requests make one frame)"""
+        self.requests += 1
+        if not self.pending:
+            self.pending = True
+            glutPostRedisplay()
+
+    def drawn(self):
+        """Call at the start of the display callback"""
+        self.pending = False
+        self.frames += 1
+
+    def update(self):
+        """Start the timer if anything has become active (e.g. after a key press)"""
+        if not self.running and self.active():
+            self.running = True
+            glutTimerFunc(self.delay, self._timer, 0)
+
+    def _timer(self, value):
+        if self.tick():
+            self.request()
+        if self.active():
+            glutTimerFunc(self.delay, self._timer, 0)
+        else:
+            self.running = False
+            self.sleeps += 1
+            if self.idle is not None:
+                self.idle()
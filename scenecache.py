@@ -0,0 +1,70 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# scenecache.py module
+# Description:
+#   Records the static part of a scene into an OpenGL display list
+#   once and replays it every frame.  The recording is redone only
+#   when the cache is marked dirty or when the values it was built
+#   from (textures, sizes, ...) change.
+#
+#   Recording goes through the GL state cache (glstate) so that the
+#   state a replay leaves behind stays known to it.
+# ==============================
+from OpenGL.GL import *
+from glstate import state
+
+
+class CompiledScene:
+    """A drawing function compiled into a display list"""
+
+    def __init__(self, drawFunc, keyFunc=None):
+        """A constructor for CompiledScene class.
+           drawFunc issues the GL calls to record.
+           keyFunc (optional) returns the values the recording depends on;
+           whenever its result changes the scene is recorded again.
+        """
+        self.drawFunc = drawFunc
+        self.keyFunc = keyFunc
+        self.listName = None
+        self.key = None
+        self.dirty = True
+        self.recordCount = 0
+        self.touched = {}
+
+    def __str__(self):
+        """Basic string representation of this CompiledScene"""
+        return "CompiledScene list %s (%s, recorded %d times)" % (
+            self.listName, "dirty" if self.dirty else "clean", self.recordCount)
+
+    def invalidate(self):
+        """Force the scene to be recorded again on the next draw"""
+        self.dirty = True
+
+    def record(self, key=None):
+        """Record drawFunc into the display list (without drawing it)"""
+        if self.listName is None:
+            self.listName = glGenLists(1)
+        glNewList(self.listName, GL_COMPILE)
+        state.beginRecording()
+        self.drawFunc()
+        self.touched = state.endRecording()
+        glEndList()
+        self.key = key
+        self.dirty = False
+        self.recordCount += 1
+
+    def draw(self):
+        """Replay the recording, re-recording first if it is out of date"""
+        key = self.keyFunc() if self.keyFunc is not None else None
+        if self.dirty or key != self.key:
+            self.record(key)
+        glCallList(self.listName)
+        state.replayed(self.touched)
+
+    def delete(self):
+        """Release the display list"""
+        if self.listName is not None:
+            glDeleteLists(self.listName, 1)
+            self.listName = None
+        self.dirty = True
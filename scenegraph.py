@@ -0,0 +1,338 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# scenegraph.py module
+# Description:
+#   A scene graph: a tree of Nodes, each with a local transform (a
+#   4x4 NumPy matrix, see utils.translate/rotate/scale), a parent and
+#   children, and optionally something to draw.  A node's world
+#   matrix is its parent's world matrix times its local one; they are
+#   kept up to date incrementally, recomputing only the subtrees under
+#   a node whose transform changed, so a large static hierarchy costs
+#   nothing per frame.
+#
+#   Drawing loads each drawable node's final (view x world) matrix
+#   with one glLoadMatrix call, instead of rebuilding it every frame
+#   from glPushMatrix/glTranslate/glRotate/glPopMatrix chains.  Nodes
+#   with bounds are first culled against the view frustum: a bounding
+#   volume hierarchy over their world boxes (see bvh.py), refitted as
+#   nodes move, finds the ones that may be in view, and only those are
+#   tested exactly (see frustum.py).
+# ==============================
+import numpy as np
+from OpenGL.GL import *
+from bvh import BVH, rayBoxes, worldBoxes
+from frustum import boxFromCorners
+from picking import Pick
+
+
+class Node:
+    """One node of a scene graph"""
+
+    def __init__(self, name, transform=None, drawable=None, bounds=None, shape=None):
+        """A constructor for Node class.
+           transform is the 4x4 local matrix (default: identity).
+           drawable is drawn with this node's world matrix current: anything
+           with a draw() method (a Mesh, InstanceBatch, ...) or a function.
+           bounds is the drawable's (min corner, max corner) box in local
+           coordinates (e.g. Mesh.bounds()), or a function returning it, for
+           culling; nodes without bounds are always drawn.
+           shape is what picking tests the node's hits against: anything with
+           an intersect() method in local coordinates (see Mesh.intersect).
+           It defaults to the drawable if that has one; otherwise the bounds
+           are used.
+        """
+        self.name = name
+        self.local = np.identity(4) if transform is None else np.array(transform, dtype=np.float64)
+        self.world = self.local.copy()
+        self.drawable = drawable
+        self.shape = shape if shape is not None or not hasattr(drawable, "intersect") else drawable
+        self.visible = True
+        self.parent = None
+        self.children = []
+        self.graph = None
+        self.bounds = bounds
+        self.dirty = True            # world matrix needs recomputing
+        self.dirtyBelow = False      # some descendant's does
+
+    def __str__(self):
+        """Basic string representation of this Node"""
+        return "Node %s (%d children)" % (self.name, len(self.children))
+
+    @property
+    def bounds(self):
+        return self._bounds
+
+    @bounds.setter
+    def bounds(self, bounds):
+        self._bounds = bounds
+        if self.graph is not None:
+            self.graph.structureChanged()
+
+    def localBox(self):
+        """The (min corner, max corner) of this node's bounds now, or None"""
+        return self._bounds() if callable(self._bounds) else self._bounds
+
+    def add(self, child):
+        """Attach child (and its subtree) under this node; returns child"""
+        if child.parent is not None:
+            child.parent.remove(child)
+        child.parent = self
+        self.children.append(child)
+        child._attach(self.graph)
+        child._markDirty()
+        return child
+
+    def remove(self, child):
+        self.children.remove(child)
+        child.parent = None
+        child._attach(None)
+        if self.graph is not None:
+            self.graph.structureChanged()
+
+    def _attach(self, graph):
+        for node in self.walk():
+            node.graph = graph
+        if graph is not None:
+            graph.structureChanged()
+
+    def _markDirty(self):
+        self.dirty = True
+        node = self.parent
+        while node is not None and not node.dirtyBelow:
+            node.dirtyBelow = True
+            node = node.parent
+
+    def setTransform(self, matrix):
+        """Replace the local matrix (its subtree's world matrices follow on update)"""
+        if np.array_equal(matrix, self.local):
+            return
+        self.local[:] = matrix
+        self._markDirty()
+
+    def walk(self):
+        """This node and all its descendants, parents before children"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def find(self, name):
+        """The first node in this subtree called name (None if there is none)"""
+        for node in self.walk():
+            if node.name == name:
+                return node
+        return None
+
+    def update(self, parentChanged=False, moved=None):
+        """Recompute the world matrices that are out of date, adding the
+           nodes recomputed to the set moved if one is given.
+           Returns the number of nodes recomputed.
+        """
+        count = 0
+        if self.dirty or parentChanged:
+            if self.parent is None:
+                self.world[:] = self.local
+            else:
+                np.matmul(self.parent.world, self.local, out=self.world)
+            self.dirty = False
+            parentChanged = True
+            count += 1
+            if moved is not None:
+                moved.add(self)
+        if parentChanged or self.dirtyBelow:
+            for child in self.children:
+                count += child.update(parentChanged, moved)
+        self.dirtyBelow = False
+        return count
+
+
+class SceneGraph:
+    """The root of a tree of Nodes, drawn with one matrix load per drawable node"""
+
+    def __init__(self, name="root"):
+        """A constructor for SceneGraph class (with an empty root node)"""
+        self.root = Node(name)
+        self.root.graph = self
+        self.drawables = None    # drawable nodes in drawing order (rebuilt when the tree changes)
+        self.index = None        # BVH over the world boxes of the drawables with bounds
+        self.indexed = []        # ...those drawables, in the BVH's order
+        self.positions = {}      # ...their positions in indexed
+        self.dynamic = []        # ...and the positions of those with a bounds function
+        self.slots = None        # ...and their places in drawables
+        self.localLows = self.localHighs = None    # ...and their boxes in their own coordinates
+        self.unbounded = []      # drawables whose bounds function returned None
+        self.moved = set()       # nodes whose world matrix changed since the BVH was refitted
+        self.updated = 0         # world matrices recomputed by the last update
+        self.drawn = 0           # drawable nodes drawn and culled by the last draw
+        self.culled = 0
+
+    def __str__(self):
+        """Basic string representation of this SceneGraph"""
+        return "SceneGraph with %d nodes: %d drawn, %d culled, %d world matrices recomputed last frame" % (
+            sum(1 for _ in self.root.walk()), self.drawn, self.culled, self.updated)
+
+    def add(self, node):
+        return self.root.add(node)
+
+    def find(self, name):
+        return self.root.find(name)
+
+    def structureChanged(self):
+        self.drawables = None
+        self.index = None
+
+    def update(self):
+        """Bring every world matrix up to date (only what changed is recomputed)"""
+        self.updated = self._refresh()
+        return self.updated
+
+    def _refresh(self):
+        """update() without recording the count in updated, so a second
+           call in the same frame keeps the count draw() recorded
+        """
+        updated = self.root.update(moved=self.moved)
+        if self.drawables is None:
+            self.drawables = [node for node in self.root.walk() if node.drawable is not None]
+        return updated
+
+    def draw(self, view, *args, frustum=None, profiler=None):
+        """Draw every visible drawable node with the view matrix (the camera's,
+           see Camera.viewMatrix) times its world matrix as the modelview.
+           args are passed on to the drawables.  With a frustum (see
+           Camera.frustum), nodes whose bounds are out of view are skipped;
+           with a FrameProfiler, each node is timed as a section named after
+           it.  Leaves the modelview set to view.
+        """
+        self.update()
+        inView = self.cull(frustum) if frustum is not None else None
+        self.drawn = 0
+        self.culled = 0
+        glMatrixMode(GL_MODELVIEW)
+        for index, node in enumerate(self.drawables):
+            if not self.isVisible(node):
+                continue
+            if inView is not None and not inView[index]:
+                self.culled += 1
+                continue
+            self.drawn += 1
+            # Column-major, as GL expects
+            glLoadMatrixd((view @ node.world).T)
+            draw = getattr(node.drawable, "draw", node.drawable)
+            if profiler is None:
+                draw(*args)
+            else:
+                with profiler.section(node.name):
+                    draw(*args)
+        glLoadMatrixd(np.asarray(view, dtype=np.float64).T)
+
+    def refreshIndex(self):
+        """Build the BVH over the drawables' world boxes, or refit it to the
+           nodes that moved or whose bounds changed since the last call
+        """
+        self._refresh()
+        if self.index is not None:
+            changed = {self.positions[node] for node in self.moved if node in self.positions}
+            for position in self.dynamic:
+                box = self.indexed[position].localBox()
+                if box is None:
+                    self.index = None        # no longer has bounds
+                    break
+                if not (np.array_equal(box[0], self.localLows[position]) and
+                        np.array_equal(box[1], self.localHighs[position])):
+                    self.localLows[position], self.localHighs[position] = box
+                    changed.add(position)
+            if any(node.localBox() is not None for node in self.unbounded):
+                self.index = None            # has bounds now
+        if self.index is None:
+            boxes = [(slot, node, node.localBox()) for slot, node in enumerate(self.drawables)]
+            bounded = [(slot, node, box) for slot, node, box in boxes if box is not None]
+            self.indexed = [node for slot, node, box in bounded]
+            self.positions = {node: position for position, node in enumerate(self.indexed)}
+            self.slots = np.array([slot for slot, node, box in bounded], dtype=int)
+            self.dynamic = [position for position, node in enumerate(self.indexed) if callable(node.bounds)]
+            self.unbounded = [node for slot, node, box in boxes if box is None and callable(node.bounds)]
+            self.localLows = np.array([box[0] for slot, node, box in bounded], dtype=np.float64).reshape(-1, 3)
+            self.localHighs = np.array([box[1] for slot, node, box in bounded], dtype=np.float64).reshape(-1, 3)
+            self.index = BVH(*self.worldBoxes(range(len(self.indexed))))
+        elif changed:
+            changed = sorted(changed)
+            self.index.refit(changed, *self.worldBoxes(changed))
+        self.moved.clear()
+        return self.index
+
+    def worldBoxes(self, positions):
+        """World-axis-aligned (lows, highs) of the indexed nodes at positions"""
+        positions = np.asarray(positions, dtype=int)
+        matrices = np.array([self.indexed[position].world for position in positions]).reshape(-1, 4, 4)
+        return worldBoxes(matrices, self.localLows[positions], self.localHighs[positions])
+
+    def cull(self, frustum):
+        """Which drawable nodes are at least partly inside frustum (nodes
+           without bounds count as inside).  The BVH picks out the nodes that
+           may be in view; only those are tested in their own coordinates.
+        """
+        index = self.refreshIndex()
+        inView = np.ones(len(self.drawables), dtype=bool)
+        if not self.indexed:
+            return inView
+        candidates = index.queryFrustum(frustum)
+        # Nodes the BVH left out count as tested and culled
+        rejected = len(self.indexed) - len(candidates)
+        frustum.tested += rejected
+        frustum.culled += rejected
+        inView[self.slots] = False
+        if len(candidates):
+            centers, extents = boxFromCorners(self.localLows[candidates], self.localHighs[candidates])
+            matrices = np.array([self.indexed[position].world for position in candidates])
+            inView[self.slots[candidates]] = frustum.testOrientedBoxes(matrices, centers, extents)
+        return inView
+
+    def overlapping(self, low, high):
+        """The drawable nodes whose world boxes overlap the box from low to high"""
+        return [self.indexed[position] for position in self.refreshIndex().queryBox(low, high)]
+
+    def raycast(self, origin, direction, maxDistance=np.inf):
+        """The drawable nodes whose world boxes the ray from origin along direction
+           enters, nearest first, as (distance, node) pairs (see BVH.queryRay)
+        """
+        positions, distances = self.refreshIndex().queryRay(origin, direction, maxDistance)
+        return [(float(distance), self.indexed[position]) for position, distance in zip(positions, distances)]
+
+    def pick(self, origin, direction):
+        """The nearest visible drawable node the ray from origin along direction
+           hits, as a picking.Pick (None if it hits nothing).  Nodes are tested
+           exactly in the order the ray meets their boxes, until the boxes left
+           are all beyond the nearest hit.
+        """
+        origin = np.asarray(origin, dtype=np.float64)
+        direction = np.asarray(direction, dtype=np.float64)
+        best = None
+        for entry, node in self.raycast(origin, direction):
+            if best is not None and entry > best.distance:
+                break
+            if not self.isVisible(node):
+                continue
+            # The ray in the node's coordinates (distances along it are unchanged)
+            inverse = np.linalg.inv(node.world)
+            localOrigin = inverse[:3, :3] @ origin + inverse[:3, 3]
+            localDirection = inverse[:3, :3] @ direction
+            if node.shape is not None:
+                distance, triangle = node.shape.intersect(localOrigin, localDirection)
+            else:
+                low, high = node.localBox()
+                distance = float(rayBoxes(localOrigin, localDirection, np.reshape(low, (1, 3)),
+                                          np.reshape(high, (1, 3)))[0])
+                triangle = None
+            if distance < (np.inf if best is None else best.distance):
+                best = Pick(node, distance, origin + distance * direction, triangle)
+        return best
+
+    def isVisible(self, node):
+        """A node is drawn only if it and all its ancestors are visible"""
+        while node is not None:
+            if not node.visible:
+                return False
+            node = node.parent
+        return True
@@ -0,0 +1,257 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# shading.py module
+# Description:
+#   Optional per-pixel lighting with GLSL.  The fixed-function lights
+#   are evaluated per vertex and limited to GL_MAX_LIGHTS (usually 8);
+#   PixelLighting evaluates the same lighting equation per fragment
+#   for up to MAX_LIGHTS point and spot lights, passed in one uniform
+#   array packed from the Lights of a LightManager (see packLights).
+#
+#   Everything else still comes from the fixed-function state: the
+#   current material, the light model, GL_LIGHTING, GL_TEXTURE_2D and
+#   the texture environment mode.  The GL state cache reports changes
+#   to those (glstate.watch), so code drawing with the program active
+#   needs no changes.  GLSL 1.20 keeps it working on old drivers and
+#   on Mesa's software rasterizer.
+# ==============================
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+from glstate import state
+
+# The most lights one draw can use (each takes 6 vec4 uniforms)
+MAX_LIGHTS = 32
+VEC4S_PER_LIGHT = 6
+
+VERTEX_SHADER = """
+#version 120
+attribute mat4 instanceMatrix;
+attribute vec4 instanceColor;
+uniform bool instanced;
+
+varying vec3 position;
+varying vec3 normal;
+varying vec4 color;
+
+void main()
+{
+    vec4 vertex = gl_Vertex;
+    vec3 n = gl_Normal;
+    color = gl_Color;
+    if (instanced) {
+        // See instancing.py: normals use the cofactor (inverse transpose up to scale)
+        vertex = instanceMatrix * gl_Vertex;
+        mat3 m = mat3(instanceMatrix);
+        mat3 cofactor = mat3(cross(m[1], m[2]), cross(m[2], m[0]), cross(m[0], m[1]));
+        n = sign(dot(m[0], cofactor[0])) * cofactor * gl_Normal;
+        color = instanceColor;
+    }
+    position = vec3(gl_ModelViewMatrix * vertex);
+    normal = gl_NormalMatrix * n;
+    gl_TexCoord[0] = gl_TextureMatrix[0] * gl_MultiTexCoord0;
+    gl_Position = gl_ModelViewProjectionMatrix * vertex;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 120
+const int MAX_LIGHTS = %d;
+
+// Per light: eye-space position, ambient, diffuse, specular,
+// (eye-space spot direction, cos(cutoff) or -2 when not a spot),
+// (spot exponent, constant, linear, quadratic attenuation)
+uniform vec4 lights[MAX_LIGHTS * 6];
+uniform int lightCount;
+
+uniform bool lighting;
+uniform bool localViewer;
+uniform bool twoSide;
+uniform bool useColors;
+uniform bool texturing;
+uniform int texEnvMode;
+uniform sampler2D texture0;
+
+varying vec3 position;
+varying vec3 normal;
+varying vec4 color;
+
+vec4 shade(vec3 n, vec4 ambient, vec4 diffuse, vec4 specular, vec4 emission, float shininess)
+{
+    vec3 view = localViewer ? normalize(-position) : vec3(0.0, 0.0, 1.0);
+    vec3 total = emission.rgb + ambient.rgb * gl_LightModel.ambient.rgb;
+    for (int i = 0; i < MAX_LIGHTS; i++) {
+        if (i >= lightCount)
+            break;
+        vec4 lightPosition = lights[6 * i];
+        vec4 spot = lights[6 * i + 4];
+        vec4 factors = lights[6 * i + 5];
+        vec3 l;
+        float attenuation = 1.0;
+        if (lightPosition.w != 0.0) {
+            vec3 d = lightPosition.xyz / lightPosition.w - position;
+            float dist = length(d);
+            l = d / dist;
+            attenuation = 1.0 / (factors.y + factors.z * dist + factors.w * dist * dist);
+        } else {
+            l = normalize(lightPosition.xyz);
+        }
+        if (spot.w >= -1.0) {
+            float spotCos = dot(-l, normalize(spot.xyz));
+            if (spotCos < spot.w)
+                continue;
+            if (factors.x > 0.0)
+                attenuation *= pow(spotCos, factors.x);
+        }
+        float nDotL = max(dot(n, l), 0.0);
+        vec3 lit = ambient.rgb * lights[6 * i + 1].rgb + nDotL * diffuse.rgb * lights[6 * i + 2].rgb;
+        if (nDotL > 0.0) {
+            float nDotH = max(dot(n, normalize(l + view)), 0.0);
+            lit += pow(nDotH, shininess) * specular.rgb * lights[6 * i + 3].rgb;
+        }
+        total += attenuation * lit;
+    }
+    return vec4(clamp(total, 0.0, 1.0), diffuse.a);
+}
+
+void main()
+{
+    vec4 c = color;
+    if (lighting) {
+        vec3 n = normalize(normal);
+        if (twoSide && !gl_FrontFacing) {
+            n = -n;
+            c = shade(n, useColors ? color : gl_BackMaterial.ambient,
+                      useColors ? color : gl_BackMaterial.diffuse, gl_BackMaterial.specular,
+                      gl_BackMaterial.emission, gl_BackMaterial.shininess);
+        } else {
+            c = shade(n, useColors ? color : gl_FrontMaterial.ambient,
+                      useColors ? color : gl_FrontMaterial.diffuse, gl_FrontMaterial.specular,
+                      gl_FrontMaterial.emission, gl_FrontMaterial.shininess);
+        }
+    }
+    if (texturing) {
+        vec4 t = texture2D(texture0, gl_TexCoord[0].st);
+        if (texEnvMode == %d)            // GL_REPLACE
+            c = t;
+        else if (texEnvMode == %d)       // GL_DECAL
+            c = vec4(mix(c.rgb, t.rgb, t.a), c.a);
+        else                             // GL_MODULATE
+            c *= t;
+    }
+    gl_FragColor = c;
+}
+""" % (MAX_LIGHTS, GL_REPLACE, GL_DECAL)
+
+# Fixed-function state the fragment shader follows: (state cache key, uniform, default)
+MIRRORED_STATE = [
+    (("enable", GL_LIGHTING), "lighting", False),
+    (("enable", GL_TEXTURE_2D), "texturing", False),
+    (("texEnv", GL_TEXTURE_ENV_MODE), "texEnvMode", GL_MODULATE),
+    (("lightModel", GL_LIGHT_MODEL_LOCAL_VIEWER), "localViewer", GL_FALSE),
+    (("lightModel", GL_LIGHT_MODEL_TWO_SIDE), "twoSide", GL_FALSE),
+]
+
+
+def packLights(lights, view, maxLights=MAX_LIGHTS):
+    """The enabled lights as a (N, 6, 4) float32 array in the layout of the
+       fragment shader's lights uniform.  Positions and spot directions are
+       taken to eye coordinates by the 4x4 view matrix (see Camera.viewMatrix),
+       just as glLight does with the modelview matrix the camera set.
+    """
+    blocks = [light.params for light in lights if light.enabled][:maxLights]
+    params = np.array(blocks, dtype=np.float32).reshape(len(blocks), -1)
+    # Transposed, so row vectors times it are the transformed points
+    toEye = np.asarray(view, dtype=np.float32).T
+    packed = np.empty((len(blocks), VEC4S_PER_LIGHT, 4), dtype=np.float32)
+    if len(blocks) == 0:
+        return packed
+    packed[:, 0] = params[:, 0:4] @ toEye
+    packed[:, 1:4] = params[:, 4:16].reshape(-1, 3, 4)
+    packed[:, 4, :3] = params[:, 16:19] @ toEye[:3, :3]
+    cutoff = params[:, 19]
+    packed[:, 4, 3] = np.where(cutoff < 180.0, np.cos(np.radians(cutoff)), -2.0)
+    packed[:, 5] = params[:, 20:24]
+    return packed
+
+
+class PixelLighting:
+    """A GLSL program that lights every pixel with any number of lights"""
+
+    def __init__(self):
+        """A constructor for PixelLighting class (the program is built on first use)"""
+        self.program = None
+        self.locations = {}
+        self.lightData = None
+
+    def __str__(self):
+        """Basic string representation of this PixelLighting"""
+        count = 0 if self.lightData is None else len(self.lightData)
+        return "PixelLighting with %d lights" % count
+
+    def available(self):
+        """Build the program if needed; False if this GL cannot run it"""
+        if self.program is None:
+            try:
+                self.program = shaders.compileProgram(shaders.compileShader(VERTEX_SHADER, GL_VERTEX_SHADER),
+                                                      shaders.compileShader(FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+                                                      validate=False)
+            except (RuntimeError, GLError) as e:
+                print("Per-pixel lighting unavailable: {0}".format(e))
+                self.program = 0
+                return False
+            for name in ("instanceMatrix", "instanceColor"):
+                self.locations[name] = glGetAttribLocation(self.program, name)
+            for name in ("lights", "lightCount", "instanced", "useColors", "texture0"):
+                self.locations[name] = glGetUniformLocation(self.program, name)
+            for key, uniform, _ in MIRRORED_STATE:
+                self.locations[uniform] = glGetUniformLocation(self.program, uniform)
+                state.watch(key, self._mirror(uniform))
+        return self.program != 0
+
+    def _mirror(self, uniform):
+        """A state cache watcher copying a value into a uniform while the program is current"""
+        location = self.locations[uniform]
+
+        def update(value):
+            if state.known(("program",)) == self.program:
+                glUniform1i(location, int(value))
+        return update
+
+    def begin(self, lightData):
+        """Make the program current for the draws that follow.
+           lightData comes from packLights(); it is uploaded only when it changed.
+        """
+        if not self.available():
+            return False
+        state.useProgram(self.program)
+        # The watchers only see changes made while the program was current
+        for key, uniform, default in MIRRORED_STATE:
+            value = state.isEnabled(key[1]) if key[0] == "enable" else state.known(key, default)
+            glUniform1i(self.locations[uniform], int(value))
+        glUniform1i(self.locations["texture0"], 0)
+        glUniform1i(self.locations["instanced"], 0)
+        glUniform1i(self.locations["useColors"], 0)
+        if self.lightData is None or not np.array_equal(lightData, self.lightData):
+            self.lightData = np.array(lightData, dtype=np.float32)
+            glUniform1i(self.locations["lightCount"], len(self.lightData))
+            if len(self.lightData):
+                glUniform4fv(self.locations["lights"], len(self.lightData) * VEC4S_PER_LIGHT, self.lightData)
+        return True
+
+    def end(self):
+        """Go back to the fixed-function pipeline"""
+        state.useProgram(0)
+
+    def beginInstances(self, colored):
+        """Draw instanced geometry (see instancing.InstanceBatch.draw) with this program.
+           Returns the (instanceMatrix, instanceColor) attribute locations.
+        """
+        glUniform1i(self.locations["instanced"], 1)
+        glUniform1i(self.locations["useColors"], int(colored))
+        return self.locations["instanceMatrix"], self.locations["instanceColor"]
+
+    def endInstances(self):
+        glUniform1i(self.locations["instanced"], 0)
+        glUniform1i(self.locations["useColors"], 0)
@@ -3,7 +3,7 @@
 # CSC345: Computer Graphics
 #   Spring 2021
 # Description:
-#   Demonstrates use of gluCylinder and gluSphere to draw
+#   Demonstrates use of cylinder and sphere meshes (see primitives.py) to draw
 #   3-d objects.
 #
 # THIS FILE IS FOR REFERENCE/STUDY ONLY!!!
@@ -14,6 +14,10 @@ from OpenGL.GLU import *
 from OpenGL.GL import *
 from PIL import Image
 from camera import *
+from textures import loadImageTexture, uploadTexture
+import proctex
+from redraw import RedrawScheduler
+import primitives
 import sys
 from utils import *
 
@@ -96,7 +100,7 @@ def main():
     glutDisplayFunc(display)
     glutKeyboardFunc(keyboard)
     glutSpecialFunc(specialKeys)
-    glutTimerFunc(0, timer, DELAY)
+    redraw.update()
 
     # Enters the main loop.
     # Displays the window and starts listening for events.
@@ -106,15 +110,10 @@ def main():
 
 
 def init():
-    global cone, cone2, wheel, faceTextureName, woodTextureName
-    # Cones for 
-    cone = gluNewQuadric()
-    cone2 = gluNewQuadric()
-    wheel = gluNewQuadric()
-    
-    gluQuadricDrawStyle(cone, GLU_LINE)
-    gluQuadricDrawStyle(cone2, GLU_LINE)
-    gluQuadricDrawStyle(wheel, GLU_LINE)
+    global cone, wheel, faceTextureName, woodTextureName
+    # Wire cones and wheels for the car (see draw), built once (see primitives)
+    cone = primitives.wireCylinder(1, 0.25, 5, 10, 10)
+    wheel = primitives.wireCylinder(.5, .5, .5, 20, 5)
 
     glEnable(GL_LIGHTING)
     glEnable(GL_NORMALIZE)  # Inefficient...
@@ -131,6 +130,7 @@ def init():
 # Callback function used to display the scene
 # Currently it just draws a simple polyline (LINE_STRIP)
 def display():
+    redraw.drawn()
     # Set the viewport to the full screen
     # For Mac: Multiply window width & height by 2
     glViewport(0, 0, 2*winWidth, 2*winHeight)
@@ -167,12 +167,14 @@ def display():
 # Timer: Used to animate the scene when activated:
 
 
-def timer(alarm):
-    glutTimerFunc(0, timer, DELAY)   # Start alarm clock agani
+def timer():
     if animate:
         # Advance to the next frame
         advance()
-        glutPostRedisplay()
+    return animate
+
+# The timer runs only while animating (see redraw.py)
+redraw = RedrawScheduler(DELAY, timer, lambda: animate)
 
 # Controls the animation. Advances the scene by a single frame
 def advance():
@@ -205,69 +207,70 @@ def keyboard(key, x, y):
     elif key == b'a':
         # Go left
         camera.turn(1)
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'd':
         # Go right
         camera.turn(-1)
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'w':
         # Go forward
         camera.slide(0, 0, -1)
-        glutPostRedisplay()
+        redraw.request()
     elif key == b's':
         # Go backward
         camera.slide(0, 0, 1)
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'q':
         # Go up
         camera.slide(0, 1, 0)
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'e':
         # Go down
         camera.slide(0, -1, 0)
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'f':
         global fire
         fire = True
     elif key == b'l':
         global is_light_on
         is_light_on = not is_light_on
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'1':
         global use_smooth
         use_smooth = not use_smooth
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'2':
         global use_spotlight
         use_spotlight = not use_spotlight
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'3':
         global use_lv
         use_lv = GL_FALSE if use_lv == GL_TRUE else GL_TRUE
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'4':
         brightness = brightness * 0.9
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'5':
         brightness = brightness / 0.9
         if brightness > 1.0:
             brightness = 1.0
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'6':
         floor_option = floor_option + 1 if floor_option < 4 else 1
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'7':
         floor_option = floor_option - 1 if floor_option > 1 else 4
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'-':
         # Move light down
         global light_height
         light_height -= light_height_dy
-        glutPostRedisplay()
+        redraw.request()
     elif key == b'+':
         # Move light up
         light_height += light_height_dy
-        glutPostRedisplay()
+        redraw.request()
+    redraw.update()
 
 
 def drawPlane(width, height, texture):
@@ -450,7 +453,7 @@ def draw():
     glPushMatrix()
     glTranslated(0, 1, 0)
     glScaled(3, .5, 2)
-    glutWireCube(1.0)
+    primitives.wireCube().draw()
     glPopMatrix()
 
 
@@ -465,23 +468,9 @@ def generateCheckerBoardTexture():
     * Why?  Simple to do...
     """
     global checkerBoardName
-    texture = [0] * (NROWS * NCOLS * 4)
-    for i in range(NROWS):
-        for j in range(NCOLS):
-            c = 135 if ((i & 8) ^ (j & 8)) else 255
-            idx = (i * NCOLS + j) * 4
-            texture[idx] = c  # Red
-            texture[idx + 1] = c  # Green
-            texture[idx + 2] = c  # Blue
-            texture[idx + 3] = 150  # Alpha (transparency)
-
-    # Generate a "name" for the texture.
-    # Bind this texture as current active texture
-    # and sets the parameters for this texture.
-    checkerBoardName = glGenTextures(1)
-    glBindTexture(GL_TEXTURE_2D, checkerBoardName)
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, NCOLS, NROWS, 0, GL_RGBA,
-                 GL_UNSIGNED_BYTE, texture)
+    # Built as a NumPy array (see proctex) and handed to GL without a copy
+    texture = proctex.checkerboard(NCOLS, NROWS, 8)
+    checkerBoardName = uploadTexture([texture], wrap=GL_CLAMP_TO_EDGE, label="checkerboard")
 
 
 def loadConcreteTexture():
@@ -500,24 +489,6 @@ def loadConcreteTexture():
                  GL_UNSIGNED_BYTE, texture)
 
 
-def loadImageTexture(filename):
-    # Load the image from the file and return as a texture
-    im = Image.open(filename)
-    print("Concrete dimensions: {0}".format(im.size))  # If you want to see the image's original dimensions
-    # dim = 128
-    # size = (0,0,dim,dim)
-    # texture = im.crop(size).tobytes("raw")   # The cropped texture
-    texture = im.tobytes("raw")  # The cropped texture
-    dimX = im.size[0]
-    dimY = im.size[1]
-
-    returnTextureName = glGenTextures(1)
-    glBindTexture(GL_TEXTURE_2D, returnTextureName)
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, dimX, dimY, 0, GL_RGB,
-                 GL_UNSIGNED_BYTE, texture)
-    return returnTextureName
-
-
 def place_main_light():
     """Set up the main light."""
     glMatrixMode(GL_MODELVIEW)
@@ -562,7 +533,7 @@ def place_main_light():
     glTranslatef(lx, ly, lz)
     glDisable(GL_LIGHTING)
     glColor3f(0, 0, brightness)
-    glutSolidSphere(0.5, 20, 20)
+    primitives.sphere(0.5, 20, 20).draw()
     glEnable(GL_LIGHTING)
     glPopMatrix()
 
@@ -0,0 +1,115 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# simloop.py module
+# Description:
+#   A fixed-timestep simulation loop.  The scene's animations move a
+#   fixed amount per step, so running one step per timer tick makes
+#   their speed depend on the frame rate.  FixedStepLoop measures the
+#   real time that has passed instead and runs as many steps as fit
+#   into it (up to a cap, so a long stall cannot snowball), keeping
+#   the remainder for the next tick.
+#
+#   Rendering then shows the animated values blended between the last
+#   two steps, according to how far the clock is into the next one, so
+#   motion stays smooth and at the right speed whether frames come
+#   faster or slower than the steps.
+# ==============================
+import time
+
+
+class FixedStepLoop:
+    """Runs a simulation at a fixed rate, whatever the frame rate"""
+
+    def __init__(self, step, update, snapshot, periods=None, maxSteps=8, clock=time.perf_counter):
+        """A constructor for FixedStepLoop class.
+           step is the simulated time per step in seconds;
+           update() advances the simulation one step and returns True if anything moved;
+           snapshot() returns the animated values drawing uses, as a sequence of numbers;
+           periods gives the period of each value that wraps around (e.g. 360 for an
+           angle) or None, so they are blended the short way round;
+           maxSteps is the most steps run for one tick.
+        """
+        self.step = step
+        self.update = update
+        self.snapshot = snapshot
+        self.periods = periods
+        self.maxSteps = maxSteps
+        self.clock = clock
+        self.last = None
+        self.accumulator = 0.0
+        self.previous = None     # snapshot before the last step (None: draw the current values)
+        self.moving = False
+        self.steps = 0
+        self.dropped = 0         # ticks that gave up on catching up
+
+    def __str__(self):
+        """Basic string representation of this FixedStepLoop"""
+        return "FixedStepLoop at %g steps/s: %d steps, %d ticks too far behind" % (
+            1.0 / self.step, self.steps, self.dropped)
+
+    def tick(self):
+        """Run the steps due since the last tick.
+           Returns True if the drawn values changed (so the scene needs redrawing).
+        """
+        now = self.clock()
+        if self.last is None:
+            self.last = now
+            return False
+        self.accumulator += now - self.last
+        self.last = now
+        steps = 0
+        while self.accumulator >= self.step:
+            if steps == self.maxSteps:
+                # Too far behind to catch up: let the simulation slow down instead
+                self.accumulator %= self.step
+                self.dropped += 1
+                break
+            self.previous = self.snapshot()
+            self.moving = bool(self.update())
+            self.accumulator -= self.step
+            steps += 1
+        self.steps += steps
+        return self.moving
+
+    def advance(self):
+        """Run exactly one step and draw its result as is (no blending),
+           e.g. to render a fixed sequence of frames (see headless.py).
+           Returns True if anything moved.
+        """
+        self.moving = bool(self.update())
+        self.previous = None
+        self.steps += 1
+        return self.moving
+
+    def pause(self):
+        """Stop the clock while nothing animates; the next tick starts it again
+           (so the time spent paused is not simulated all at once)
+        """
+        self.last = None
+        self.accumulator = 0.0
+        self.previous = None
+
+    def sync(self):
+        """Draw the current values as they are (they were changed outside a step)"""
+        self.previous = None
+
+    @property
+    def alpha(self):
+        """How far the clock is from the last step to the next, 0 to 1"""
+        return min(self.accumulator / self.step, 1.0)
+
+    def interpolated(self):
+        """The snapshot values blended between the last two steps"""
+        current = self.snapshot()
+        if self.previous is None:
+            return list(current)
+        alpha = self.alpha
+        periods = self.periods or [None] * len(current)
+        values = []
+        for before, after, period in zip(self.previous, current, periods):
+            delta = after - before
+            if period:
+                delta = (delta + period / 2) % period - period / 2
+            values.append(before + alpha * delta)
+        return values
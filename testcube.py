@@ -2,6 +2,7 @@ from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
 from PIL import Image
+from redraw import RedrawScheduler
 
 ESCAPE = '\033'
 
@@ -15,6 +16,10 @@ Z_AXIS = 0.0
 
 DIRECTION = 1
 
+# Spin at a steady 60 frames per second instead of as fast as possible
+FPS = 60.0
+DELAY = int(1000.0 / FPS + 0.5)
+
 
 def InitGL(Width, Height):
     glClearColor(0.0, 0.0, 0.0, 0.0)
@@ -40,8 +45,7 @@ def keyPressed(*args):
 
 
 def DrawGLScene():
-    global X_AXIS, Y_AXIS, Z_AXIS
-    global DIRECTION
+    redraw.drawn()
 
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
@@ -106,10 +110,20 @@ def DrawGLScene():
     glVertex3f(-1.0, 1.0, -1.0);
     glEnd();
 
+    glutSwapBuffers()
+
+
+def spin():
+    global X_AXIS, Y_AXIS, Z_AXIS
+    global DIRECTION
+
     X_AXIS = X_AXIS - 0.30
     Z_AXIS = Z_AXIS - 0.30
+    return True
 
-    glutSwapBuffers()
+
+# The cube always spins, so the timer never stops
+redraw = RedrawScheduler(DELAY, spin, lambda: True)
 
 
 def loadImage():
@@ -142,7 +156,7 @@ def main():
     window = glutCreateWindow('OpenGL Python Textured Cube')
 
     glutDisplayFunc(DrawGLScene)
-    glutIdleFunc(DrawGLScene)
+    redraw.update()
     glutKeyboardFunc(keyPressed)
     InitGL(640, 480)
     loadImage()
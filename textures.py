@@ -0,0 +1,227 @@
+# ==============================
+# CSC345: Computer Graphics
+#
+# textures.py module
+# Description:
+#   Loads image files into OpenGL textures.  Images can be resized to
+#   power-of-two (or capped) dimensions and get a full mip chain,
+#   built on the CPU with a vectorized box filter (or Lanczos) or on
+#   the GPU with glGenerateMipmap.  Sampling parameters (wrap mode,
+#   trilinear filtering, anisotropy) are set once, when the texture
+#   is created, instead of every time it is drawn.
+#
+#   Decoded pixels and CPU mip levels are kept in an AssetCache
+#   (.texcache/ next to the images), so only the first launch pays
+#   for the JPEG decode; later launches upload straight from the
+#   memory-mapped cache files.
+#
+#   Every texture created here is recorded in `registry` so the GPU
+#   memory used by a scene can be reported with memoryReport().
+# ==============================
+import math
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GL.EXT.texture_filter_anisotropic import *
+from PIL import Image
+from assetcache import AssetCache
+from glstate import state
+
+cache = AssetCache(".texcache")
+
+# Mipmap generation choices for loadImageTexture
+MIP_NONE = None
+MIP_BOX = "box"          # CPU, vectorized 2x2 average
+MIP_LANCZOS = "lanczos"  # CPU, PIL Lanczos resampling
+MIP_GPU = "gpu"          # glGenerateMipmap after uploading level 0
+
+DEFAULT_ANISOTROPY = 8.0
+
+
+class TextureInfo:
+    """What was uploaded for one texture (for memory budgeting)"""
+
+    def __init__(self, label, width, height, channels, levels):
+        self.label = label
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.levels = levels
+
+    def __str__(self):
+        """Basic string representation of this TextureInfo"""
+        return "%-20s %5dx%-5d %d levels %10d bytes" % (
+            self.label, self.width, self.height, self.levels, self.gpuBytes())
+
+    def gpuBytes(self):
+        """Estimated GPU memory: drivers store RGB8 padded out to 4 bytes per texel"""
+        total = 0
+        w, h = self.width, self.height
+        for _ in range(self.levels):
+            total += w * h * 4
+            w = max(w // 2, 1)
+            h = max(h // 2, 1)
+        return total
+
+
+# Texture name -> TextureInfo for every texture uploaded through this module
+registry = {}
+
+
+def nearestPowerOfTwo(n):
+    return 1 << max(0, round(math.log2(n)))
+
+
+def fitSize(width, height, powerOfTwo=False, maxSize=None):
+    """The dimensions an image should be resized to before uploading"""
+    if maxSize is not None and max(width, height) > maxSize:
+        s = maxSize / max(width, height)
+        width = max(1, round(width * s))
+        height = max(1, round(height * s))
+    if powerOfTwo:
+        width = nearestPowerOfTwo(width)
+        height = nearestPowerOfTwo(height)
+        if maxSize is not None:
+            width = min(width, maxSize)
+            height = min(height, maxSize)
+    return width, height
+
+
+def mipLevelCount(width, height):
+    return int(math.floor(math.log2(max(width, height)))) + 1
+
+
+def boxMipChain(pixels):
+    """Every mip level of pixels, each the 2x2 average of the level above"""
+    levels = [pixels]
+    h, w = pixels.shape[:2]
+    while h > 1 or w > 1:
+        h2 = max(h // 2, 1)
+        w2 = max(w // 2, 1)
+        src = levels[-1].astype(np.float32)
+        # Odd dimensions drop their last row/column, as GL sizes levels with floor()
+        if h > 1:
+            src = src[0:2*h2:2] + src[1:2*h2:2]
+            src *= 0.5
+        if w > 1:
+            src = src[:, 0:2*w2:2] + src[:, 1:2*w2:2]
+            src *= 0.5
+        src += 0.5
+        levels.append(src.astype(np.uint8))
+        h, w = h2, w2
+    return levels
+
+
+def lanczosMipChain(pixels):
+    """Every mip level of pixels, each Lanczos-filtered from the level above"""
+    levels = [pixels]
+    h, w = pixels.shape[:2]
+    while h > 1 or w > 1:
+        h = max(h // 2, 1)
+        w = max(w // 2, 1)
+        im = Image.fromarray(np.asarray(levels[-1]))
+        levels.append(np.asarray(im.resize((w, h), Image.LANCZOS), dtype=np.uint8))
+    return levels
+
+
+def decodeImage(filename, mode="RGB", powerOfTwo=False, maxSize=None, mipmaps=MIP_NONE):
+    """The mip levels of an image file as (height, width, channels) uint8 arrays.
+       Only level 0 is returned unless mipmaps is MIP_BOX or MIP_LANCZOS.
+    """
+    cpuMips = mipmaps in (MIP_BOX, MIP_LANCZOS)
+    key = cache.key(filename, mode, powerOfTwo, maxSize, mipmaps if cpuMips else None)
+    levels = cache.load(filename, key)
+    if levels is not None:
+        return levels
+
+    im = Image.open(filename)
+    if im.mode != mode:
+        im = im.convert(mode)
+    size = fitSize(im.size[0], im.size[1], powerOfTwo, maxSize)
+    if size != im.size:
+        im = im.resize(size, Image.LANCZOS)
+    pixels = np.asarray(im, dtype=np.uint8)
+
+    if mipmaps == MIP_BOX:
+        levels = boxMipChain(pixels)
+    elif mipmaps == MIP_LANCZOS:
+        levels = lanczosMipChain(pixels)
+    else:
+        levels = [pixels]
+    cache.store(filename, key, levels, width=size[0], height=size[1], mode=mode)
+    return levels
+
+
+_maxAnisotropy = None
+
+def maxAnisotropy():
+    """The largest anisotropic filtering level supported (1.0 if none)"""
+    global _maxAnisotropy
+    if _maxAnisotropy is None:
+        _maxAnisotropy = 1.0
+        if glInitTextureFilterAnisotropicEXT():
+            _maxAnisotropy = float(glGetFloatv(GL_MAX_TEXTURE_MAX_ANISOTROPY_EXT))
+    return _maxAnisotropy
+
+
+def uploadTexture(levels, wrap=GL_REPEAT, textureName=None, generateMipmaps=False,
+                  anisotropy=DEFAULT_ANISOTROPY, label=None):
+    """Upload a list of mip levels (level 0 first) as a texture and
+       configure its sampling once.  Returns the texture name.
+    """
+    height, width, channels = levels[0].shape
+    fmt = GL_RGBA if channels == 4 else GL_RGB
+    if textureName is None:
+        textureName = glGenTextures(1)
+    state.bindTexture(GL_TEXTURE_2D, textureName)
+    # Rows of RGB pixels are not always a multiple of 4 bytes long
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    for level, pixels in enumerate(levels):
+        h, w = pixels.shape[:2]
+        glTexImage2D(GL_TEXTURE_2D, level, fmt, w, h, 0, fmt,
+                     GL_UNSIGNED_BYTE, np.ascontiguousarray(pixels))
+
+    levelCount = len(levels)
+    if generateMipmaps and levelCount == 1 and bool(glGenerateMipmap):
+        glGenerateMipmap(GL_TEXTURE_2D)
+        levelCount = mipLevelCount(width, height)
+    mipmapped = levelCount > 1
+
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, wrap)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, wrap)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER,
+                    GL_LINEAR_MIPMAP_LINEAR if mipmapped else GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, levelCount - 1)
+    if mipmapped and anisotropy > 1:
+        supported = maxAnisotropy()
+        if supported > 1:
+            glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAX_ANISOTROPY_EXT, min(anisotropy, supported))
+
+    registry[textureName] = TextureInfo(label or "texture %d" % textureName,
+                                        width, height, channels, levelCount)
+    return textureName
+
+
+def loadImageTexture(filename, mode="RGB", wrap=GL_REPEAT, powerOfTwo=False, maxSize=None,
+                     mipmaps=MIP_BOX, anisotropy=DEFAULT_ANISOTROPY):
+    """Load the image from the file and return it as a texture name"""
+    levels = decodeImage(filename, mode, powerOfTwo, maxSize, mipmaps)
+    return uploadTexture(levels, wrap, generateMipmaps=(mipmaps == MIP_GPU),
+                         anisotropy=anisotropy, label=filename)
+
+
+def deleteTexture(textureName):
+    glDeleteTextures([textureName])
+    state.forget(("texture", GL_TEXTURE_2D))
+    registry.pop(textureName, None)
+
+
+def totalGpuBytes():
+    return sum(info.gpuBytes() for info in registry.values())
+
+
+def memoryReport():
+    """A per-texture table of estimated GPU memory use"""
+    lines = [str(registry[name]) for name in sorted(registry)]
+    lines.append("%-20s %40d bytes" % ("total", totalGpuBytes()))
+    return "\n".join(lines)
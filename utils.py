@@ -5,16 +5,22 @@
 #
 # utils.py module
 # Description:
-#   Defines a few classes used for the sample programs.
-#   These classes are NOT COMPLETE but are shortened to 
-#   include mostly relevant material.
-#   For example, Vector class ideally would have ways to do
-#   dot product, cross product, normalization, etc.
-#   But those aren't needed here so they are left off.
+#   Defines the geometry classes used for the sample programs.
+#   Point and Vector are small single-value classes (with __slots__
+#   so they stay cheap to create) that support the usual arithmetic,
+#   dot/cross products, normalization and 4x4 matrix transforms.
+#   PointArray and VectorArray hold N points/vectors in one NumPy
+#   array so lerp, transform and normalize run over all of them in
+#   a single vectorized call.
+#   Matrices are 4x4 NumPy arrays acting on column vectors, built
+#   the same way glTranslate/glRotate/glScale would build them.
 #==============================
+import math
+import numpy as np
 
 class Point:
     """A simple 3D Point Class"""
+    __slots__ = ("x", "y", "z")
 
     def __init__(self, x=0, y=0, z=0):
         """A constructor for Point class using initial x,y values"""
@@ -24,20 +30,71 @@ class Point:
         """Basic string representation of this point"""
         return "(%s,%s,%s)"%(self.x,self.y,self.z)
 
-    def lerp(self, q, t):
-        """Linear interpolation between two points"""
-        return Point(self.x + t*(q.x - self.x),
-                     self.y + t*(q.y - self.y),
-                     self.z + t*(q.z - self.z))
+    def __repr__(self):
+        return "Point(%r, %r, %r)"%(self.x,self.y,self.z)
 
-    def lerpV(self, v, t):
-        """Linear interpolation between a point and a vector"""
-        return Point(self.x + t*v.dx,
-                     self.y + t*v.dy,
-                     self.z + t*v.dz)
+    def __iter__(self):
+        yield self.x; yield self.y; yield self.z
+
+    def __add__(self, v):
+        """Point + Vector is a Point"""
+        return Point(self.x + v.dx, self.y + v.dy, self.z + v.dz)
+
+    def __sub__(self, q):
+        """Point - Point is the Vector between them, Point - Vector is a Point"""
+        if isinstance(q, Vector):
+            return Point(self.x - q.dx, self.y - q.dy, self.z - q.dz)
+        return Vector(q, self)
+
+    def copy(self):
+        return Point(self.x, self.y, self.z)
+
+    def set(self, x, y, z):
+        """Move this point in place (avoids allocating a new Point)"""
+        self.x = x; self.y = y; self.z = z
+        return self
+
+    def lerp(self, q, t, out=None):
+        """Linear interpolation between two points
+           (stored into out, if given, instead of a new Point)"""
+        x = self.x + t*(q.x - self.x)
+        y = self.y + t*(q.y - self.y)
+        z = self.z + t*(q.z - self.z)
+        if out is None:
+            return Point(x, y, z)
+        return out.set(x, y, z)
+
+    def lerpV(self, v, t, out=None):
+        """Linear interpolation between a point and a vector
+           (stored into out, if given, instead of a new Point)"""
+        x = self.x + t*v.dx
+        y = self.y + t*v.dy
+        z = self.z + t*v.dz
+        if out is None:
+            return Point(x, y, z)
+        return out.set(x, y, z)
+
+    def distance(self, q):
+        return math.sqrt((q.x - self.x)**2 + (q.y - self.y)**2 + (q.z - self.z)**2)
+
+    def transform(self, m):
+        """Apply a 4x4 matrix to this point (w = 1), returning a new Point"""
+        x, y, z, w = np.dot(m, (self.x, self.y, self.z, 1.0))
+        if w != 1.0 and w != 0.0:
+            x /= w; y /= w; z /= w
+        return Point(float(x), float(y), float(z))
+
+    def toArray(self, dtype=np.float64):
+        return np.array((self.x, self.y, self.z), dtype=dtype)
+
+    @staticmethod
+    def fromArray(a):
+        return Point(float(a[0]), float(a[1]), float(a[2]))
 
 class Vector:
     """A simple 3D Vector Class"""
+    __slots__ = ("dx", "dy", "dz")
+
     def __init__(self, p=None, q=None):
         """A constructor for Vector class between two Points p and q"""
         if q is None:
@@ -48,6 +105,246 @@ class Vector:
         else:
             self.dx = q.x - p.x; self.dy = q.y - p.y; self.dz = q.z - p.z
 
+    @staticmethod
+    def of(dx, dy, dz):
+        """A Vector from its three components"""
+        v = Vector()
+        v.dx = dx; v.dy = dy; v.dz = dz
+        return v
+
     def __str__(self):
         """Basic string representation of this point"""
         return "<%s,%s,%s>"%(self.dx,self.dy,self.dz)
+
+    def __repr__(self):
+        return "Vector.of(%r, %r, %r)"%(self.dx,self.dy,self.dz)
+
+    def __iter__(self):
+        yield self.dx; yield self.dy; yield self.dz
+
+    def __add__(self, v):
+        return Vector.of(self.dx + v.dx, self.dy + v.dy, self.dz + v.dz)
+
+    def __sub__(self, v):
+        return Vector.of(self.dx - v.dx, self.dy - v.dy, self.dz - v.dz)
+
+    def __neg__(self):
+        return Vector.of(-self.dx, -self.dy, -self.dz)
+
+    def __mul__(self, s):
+        return Vector.of(self.dx*s, self.dy*s, self.dz*s)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, s):
+        return Vector.of(self.dx/s, self.dy/s, self.dz/s)
+
+    def dot(self, v):
+        return self.dx*v.dx + self.dy*v.dy + self.dz*v.dz
+
+    def cross(self, v):
+        return Vector.of(self.dy*v.dz - self.dz*v.dy,
+                         self.dz*v.dx - self.dx*v.dz,
+                         self.dx*v.dy - self.dy*v.dx)
+
+    def length(self):
+        return math.sqrt(self.dx*self.dx + self.dy*self.dy + self.dz*self.dz)
+
+    def normalize(self):
+        """A unit vector in the same direction (the zero vector stays zero)"""
+        n = self.length()
+        if n == 0:
+            return Vector()
+        return Vector.of(self.dx/n, self.dy/n, self.dz/n)
+
+    def transform(self, m):
+        """Apply a 4x4 matrix to this vector (w = 0, so no translation)"""
+        dx, dy, dz, _ = np.dot(m, (self.dx, self.dy, self.dz, 0.0))
+        return Vector.of(float(dx), float(dy), float(dz))
+
+    def toArray(self, dtype=np.float64):
+        return np.array((self.dx, self.dy, self.dz), dtype=dtype)
+
+    @staticmethod
+    def fromArray(a):
+        return Vector.of(float(a[0]), float(a[1]), float(a[2]))
+
+class PointArray:
+    """N 3D points stored as one (N,3) NumPy array"""
+
+    def __init__(self, data=0, dtype=np.float32):
+        """A constructor for PointArray from a count (all at the origin),
+           an (N,3) array, or a sequence of Points"""
+        if isinstance(data, int):
+            self.data = np.zeros((data, 3), dtype=dtype)
+        elif len(data) and isinstance(data[0], Point):
+            self.data = np.array([tuple(p) for p in data], dtype=dtype)
+        else:
+            self.data = np.array(data, dtype=dtype).reshape(-1, 3)
+
+    def __str__(self):
+        return "PointArray of %d points" % len(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            return Point.fromArray(self.data[i])
+        return _wrap(type(self), self.data[i])
+
+    def __add__(self, v):
+        """PointArray + VectorArray (or Vector) is a PointArray"""
+        return _wrap(PointArray, self.data + _asData(v))
+
+    def __sub__(self, q):
+        """PointArray - PointArray is a VectorArray, - VectorArray is a PointArray"""
+        if isinstance(q, (VectorArray, Vector)):
+            return _wrap(PointArray, self.data - _asData(q))
+        return _wrap(VectorArray, self.data - _asData(q))
+
+    def lerp(self, q, t, out=None):
+        """Interpolate every point toward q (a PointArray or Point).
+           t is a scalar or one value per point."""
+        return _wrap(PointArray, _lerp(self.data, _asData(q), t, out), out)
+
+    def lerpV(self, v, t, out=None):
+        """Move every point t along v (a VectorArray or Vector)"""
+        return _wrap(PointArray, _lerp(self.data, self.data + _asData(v), t, out), out)
+
+    def transform(self, m, out=None):
+        """Apply a 4x4 matrix to every point (w = 1)"""
+        m = np.asarray(m)
+        result = out.data if out is not None else None
+        result = np.matmul(self.data, m[:3, :3].T, out=result)
+        result += m[:3, 3]
+        return _wrap(PointArray, result, out)
+
+class VectorArray:
+    """N 3D vectors stored as one (N,3) NumPy array"""
+
+    def __init__(self, data=0, dtype=np.float32):
+        """A constructor for VectorArray from a count (all zero),
+           an (N,3) array, or a sequence of Vectors"""
+        if isinstance(data, int):
+            self.data = np.zeros((data, 3), dtype=dtype)
+        elif len(data) and isinstance(data[0], Vector):
+            self.data = np.array([tuple(v) for v in data], dtype=dtype)
+        else:
+            self.data = np.array(data, dtype=dtype).reshape(-1, 3)
+
+    def __str__(self):
+        return "VectorArray of %d vectors" % len(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            return Vector.fromArray(self.data[i])
+        return _wrap(type(self), self.data[i])
+
+    def __add__(self, v):
+        return _wrap(VectorArray, self.data + _asData(v))
+
+    def __sub__(self, v):
+        return _wrap(VectorArray, self.data - _asData(v))
+
+    def __neg__(self):
+        return _wrap(VectorArray, -self.data)
+
+    def __mul__(self, s):
+        """Scale by a scalar or by one value per vector"""
+        return _wrap(VectorArray, self.data * _column(s))
+
+    __rmul__ = __mul__
+
+    def dot(self, v):
+        """Per-vector dot product, an (N,) array"""
+        return np.einsum("ij,ij->i", self.data, np.broadcast_to(_asData(v), self.data.shape))
+
+    def cross(self, v):
+        return _wrap(VectorArray, np.cross(self.data, _asData(v)))
+
+    def lengths(self):
+        return np.linalg.norm(self.data, axis=1)
+
+    def lerp(self, v, t, out=None):
+        """Interpolate every vector toward v (a VectorArray or Vector).
+           t is a scalar or one value per vector."""
+        return _wrap(VectorArray, _lerp(self.data, _asData(v), t, out), out)
+
+    def normalize(self, out=None):
+        """Unit vectors in the same directions (zero vectors stay zero)"""
+        n = self.lengths()
+        n[n == 0] = 1
+        result = out.data if out is not None else None
+        result = np.divide(self.data, n[:, None], out=result)
+        return _wrap(VectorArray, result, out)
+
+    def transform(self, m, out=None):
+        """Apply a 4x4 matrix to every vector (w = 0, so no translation)"""
+        m = np.asarray(m)
+        result = out.data if out is not None else None
+        result = np.matmul(self.data, m[:3, :3].T, out=result)
+        return _wrap(VectorArray, result, out)
+
+def _asData(a):
+    """The raw array behind a Point/Vector/PointArray/VectorArray"""
+    if isinstance(a, (PointArray, VectorArray)):
+        return a.data
+    if isinstance(a, (Point, Vector)):
+        return a.toArray()
+    return np.asarray(a)
+
+def _column(t):
+    """Make a per-element parameter broadcast across the x,y,z columns"""
+    t = np.asarray(t)
+    return t[:, None] if t.ndim == 1 else t
+
+def _lerp(p, q, t, out):
+    if out is not None and out.data is p:
+        # Interpolating in place: p is also the destination
+        p += (q - p) * _column(t)
+        return p
+    result = out.data if out is not None else None
+    result = np.subtract(q, p, out=result)
+    result *= _column(t)
+    result += p
+    return result
+
+def _wrap(cls, data, out=None):
+    """Wrap an array in cls without copying it (or reuse out)"""
+    if out is not None:
+        return out
+    result = cls.__new__(cls)
+    result.data = data
+    return result
+
+# 4x4 matrices (column vectors, same conventions as the OpenGL matrix stack)
+
+def identity():
+    return np.identity(4)
+
+def translate(x, y, z):
+    """4x4 translation matrix (same as glTranslate)"""
+    m = np.identity(4)
+    m[:3, 3] = (x, y, z)
+    return m
+
+def scale(sx, sy, sz):
+    """4x4 scaling matrix (same as glScale)"""
+    return np.diag((sx, sy, sz, 1.0))
+
+def rotate(angle, x, y, z):
+    """4x4 rotation of angle degrees about the axis (x,y,z) (same as glRotate)"""
+    axis = np.array([x, y, z], dtype=np.float64)
+    x, y, z = axis / np.linalg.norm(axis)
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+    t = 1 - c
+    m = np.identity(4)
+    m[:3, :3] = [[t*x*x + c,   t*x*y - s*z, t*x*z + s*y],
+                 [t*x*y + s*z, t*y*y + c,   t*y*z - s*x],
+                 [t*x*z - s*y, t*y*z + s*x, t*z*z + c]]
+    return m